@@ -1,13 +1,12 @@
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi.exceptions import HTTPException, RequestValidationError
 from fastapi import FastAPI, Response, Request, status
-from fastapi_limiter import FastAPILimiter
 from starlette.middleware.gzip import GZipMiddleware
 from src.monitor import periodic_update, get_monitor
 from fastapi.middleware.cors import CORSMiddleware
 from src.cloudflare import CloudflareR2Bucket
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from src.exceptions import DatabaseError
 from src.constants import Constants
 from src.routes import auth
@@ -23,7 +22,13 @@ from src.routes import monitor
 from src.routes import logs
 from src.model import log as log_model
 from src.db.db import db
+from src.db import query_stats
+from src.db.listener import listener as invalidation_listener
 from src.services.redis_client import RedisService
+from src.services.password_hasher import password_hasher
+from src.services import rate_limiter
+from src.services import ncm_index
+from src.services.token_cleanup import periodic_token_cleanup
 import uvicorn
 import contextlib
 import asyncio
@@ -40,19 +45,41 @@ async def lifespan(app: FastAPI):
     # [PostgreSql INIT]
     await db.connect()
     
+    # [NCM Index]
+    if Constants.NCM_INDEX_ENABLED and not await ncm_index.load_index():
+        # Falhou no startup: tenta de novo em background (busca no SQL até lá)
+        ncm_index.schedule_reload()
+    
     # [System Monitor]
     task = asyncio.create_task(periodic_update())
     
+    # [Refresh Tokens Cleanup]
+    cleanup_task = None
+    if Constants.REFRESH_TOKEN_PURGE_INTERVAL_MINUTES > 0:
+        cleanup_task = asyncio.create_task(periodic_token_cleanup())
+    
     # [Cloudflare]
     app.state.r2 = await CloudflareR2Bucket.get_instance()
     
     # [Limiter]
-    await FastAPILimiter.init(RedisService.get_client())
+    rate_limiter.backend.start()
+    
+    # [Cache Invalidation]
+    invalidation_listener.start()
 
     print(f"[API] [{Constants.API_NAME} STARTED]")
 
     yield
     
+    # [Limiter]
+    await rate_limiter.backend.stop()
+    
+    # [Cache Invalidation]
+    await invalidation_listener.stop()
+    
+    # [NCM Index]
+    await ncm_index.stop()
+    
     # [Redis]
     await RedisService.close()
     
@@ -61,9 +88,18 @@ async def lifespan(app: FastAPI):
     with contextlib.suppress(asyncio.CancelledError):
         await task
     
+    # [Refresh Tokens Cleanup]
+    if cleanup_task:
+        cleanup_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await cleanup_task
+    
     # [PostgreSql CLOSE]
     await db.disconnect()
     
+    # [Argon2 Workers]
+    password_hasher.shutdown()
+    
     # [Cloudflare CLOSE]
     if hasattr(app.state.r2, "close"):
         await app.state.r2.close()
@@ -75,7 +111,8 @@ app = FastAPI(
     title=Constants.API_NAME, 
     description=Constants.API_DESCR,
     version=Constants.API_VERSION,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -126,6 +163,14 @@ app.include_router(logs.router, prefix='/api/v1/admin/logs', tags=['logs'])
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
 
+async def _finish_after_body(body_iterator, method: str, route: str, stats: query_stats.QueryStats):
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        query_stats.finish_request(method, route, stats)
+
+
 @app.middleware("http")
 async def security_middleware(request: Request, call_next):
     start_time = time.perf_counter()
@@ -153,7 +198,25 @@ async def security_middleware(request: Request, call_next):
         request._body = b"".join(chunks)
     
     # 2. Process request
-    response: Response = await call_next(request)
+    stats = query_stats.start_request()
+    try:
+        response: Response = await call_next(request)
+    except Exception:
+        # Requisições que estouram costumam ser justamente as descontroladas
+        route = request.scope.get("route")
+        query_stats.finish_request(request.method, getattr(route, "path", request.url.path), stats)
+        raise
+    
+    # O call_next retorna no início da resposta; corpos em streaming (ex.:
+    # export de logs) ainda fazem queries, então as estatísticas só fecham
+    # depois do último chunk.
+    route = request.scope.get("route")
+    response.body_iterator = _finish_after_body(
+        response.body_iterator,
+        request.method,
+        getattr(route, "path", request.url.path),
+        stats
+    )
     
     # 3. Security headers (sempre aplicar)
     response.headers["X-Content-Type-Options"] = "nosniff"
@@ -0,0 +1,94 @@
+"""
+Compara o formato antigo do cache (texto: cabeçalho + model_dump_json) com o
+codec binário (JSON do pydantic em bytes, zstd acima de
+CACHE_COMPRESSION_MIN_BYTES) em páginas de NCM de tamanhos variados.
+
+Mostra bytes no Redis e o custo de codificar/decodificar (µs por operação).
+
+Uso: python scripts/bench_cache_codec.py [--rows 10 64 200] [--iterations 2000]
+"""
+import argparse
+import random
+import time
+import sys
+import os
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src.services.cache_codec import encode_cache_entry, decode_cache_entry
+from src.schemas.general import Pagination
+from src.schemas.ncm import NcmResponse
+from src.constants import Constants
+
+
+WORDS = (
+    "animais vivos carnes miudezas comestíveis peixes crustáceos moluscos leite laticínios "
+    "ovos de aves mel natural produtos de origem animal plantas vivas produtos de floricultura "
+    "outros exceto reprodutores de raça pura frescos ou refrigerados congelados"
+).split()
+
+
+def build_page(rows: int) -> Pagination[NcmResponse]:
+    rng = random.Random(rows)
+    results = [
+        NcmResponse(
+            code=f"{rng.randint(1000, 9999)}.{rng.randint(10, 99)}.{rng.randint(10, 99)}",
+            description=" ".join(rng.choices(WORDS, k=rng.randint(6, 24))).capitalize(),
+            federal_national_rate=round(rng.uniform(0, 30), 2),
+            federal_import_rate=round(rng.uniform(0, 40), 2),
+            state_rate=round(rng.uniform(0, 20), 2),
+            municipal_rate=0.0
+        )
+        for _ in range(rows)
+    ]
+    return Pagination[NcmResponse](total=10000, limit=rows, offset=0, results=results)
+
+
+def per_op_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def bench(rows: int, iterations: int):
+    model_class = Pagination[NcmResponse]
+    page = build_page(rows)
+    soft_expires_at = time.time() + 3600
+
+    # Formato anterior: "<soft_expires_at>:<delta>|<json>" em str (decode_responses=True)
+    legacy = f"{soft_expires_at:.3f}:0.0100|{page.model_dump_json()}"
+    legacy_bytes = legacy.encode()
+    binary, raw_size = encode_cache_entry(page, soft_expires_at, 0.01)
+
+    legacy_encode = per_op_us(lambda: f"{soft_expires_at:.3f}:0.0100|{page.model_dump_json()}".encode(), iterations)
+    legacy_decode = per_op_us(lambda: decode_cache_entry(legacy_bytes, model_class), iterations)
+    binary_encode = per_op_us(lambda: encode_cache_entry(page, soft_expires_at, 0.01), iterations)
+    binary_decode = per_op_us(lambda: decode_cache_entry(binary, model_class), iterations)
+
+    print(f"{rows:>5} linhas | JSON {raw_size:>7} B")
+    print(f"        texto   {len(legacy_bytes):>7} B | encode {legacy_encode:>8.1f} µs | decode {legacy_decode:>8.1f} µs")
+    print(
+        f"        binário {len(binary):>7} B | encode {binary_encode:>8.1f} µs | decode {binary_decode:>8.1f} µs"
+        f" | {len(binary) / len(legacy_bytes):.1%} do tamanho"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do codec do cache.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 64, 200], help="linhas por página")
+    parser.add_argument("--iterations", type=int, default=2000, help="repetições por medida")
+    args = parser.parse_args()
+
+    print(
+        f"zstd nível {Constants.CACHE_COMPRESSION_LEVEL}, "
+        f"a partir de {Constants.CACHE_COMPRESSION_MIN_BYTES} B\n"
+    )
+    for rows in args.rows:
+        bench(rows, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark de rajada de logins (troca de turno) e latência do event loop.
+
+Dispara N verificações argon2 concorrentes de duas formas:
+  - inline: security.verify_password chamado direto no handler (antigo)
+  - pool:   password_hasher.verify_password (workers dedicados)
+
+Enquanto isso, um "ticker" acorda a cada 5ms e mede o atraso do loop, que é
+o que todas as outras requisições do worker sentem durante a rajada.
+
+Uso: python scripts/bench_login_burst.py [logins]
+"""
+import statistics
+import asyncio
+import time
+import sys
+import os
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src import security
+from src.services.password_hasher import password_hasher, verify_password
+
+
+TICK_S = 0.005
+
+
+async def ticker(lags: list[float], stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_S)
+        lags.append((time.perf_counter() - start - TICK_S) * 1000)
+
+
+async def login_inline(password: str, password_hash: str):
+    await asyncio.sleep(0)
+    return security.verify_password(password, password_hash)
+
+
+async def login_pool(password: str, password_hash: str):
+    await asyncio.sleep(0)
+    return await verify_password(password, password_hash)
+
+
+async def run_burst(label: str, login_fn, logins: int, password: str, password_hash: str):
+    lags: list[float] = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login_fn(password, password_hash) for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await tick_task
+    assert all(results)
+
+    lags.sort()
+    p99 = lags[int(len(lags) * 0.99) - 1] if len(lags) > 1 else lags[0]
+    print(f"\n{label}")
+    print(f"  vazão:            {logins / elapsed:>8.1f} logins/s ({elapsed:.2f}s)")
+    print(f"  ticks do loop:    {len(lags):>8}")
+    print(f"  atraso p50:       {statistics.median(lags):>8.2f} ms")
+    print(f"  atraso p99:       {p99:>8.2f} ms")
+    print(f"  atraso máximo:    {lags[-1]:>8.2f} ms")
+
+
+async def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    password = "senha-do-caixa-123"
+    password_hash = security.hash_password(password)
+
+    await run_burst("inline (bloqueia o loop)", login_inline, logins, password, password_hash)
+    await run_burst(
+        f"pool argon2 ({password_hasher.max_workers} workers)",
+        login_pool,
+        logins,
+        password,
+        password_hash
+    )
+    print(f"\n{password_hasher.get_stats()}")
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
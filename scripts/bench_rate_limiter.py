@@ -0,0 +1,96 @@
+"""
+Benchmark do custo por requisição do rate limiter.
+
+  - local:  RateLimiter (src/services/rate_limiter.py), decisão em memória
+  - redis:  um EVAL por requisição, como o fastapi_limiter fazia
+            (só roda se REDIS_URL estiver configurada)
+
+Uso: python scripts/bench_rate_limiter.py [requisições]
+"""
+from dotenv import load_dotenv
+from starlette.requests import Request
+from starlette.responses import Response
+import redis.asyncio as redis
+import asyncio
+import time
+import sys
+import os
+
+
+load_dotenv()
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src.services.rate_limiter import RateLimiter, backend
+
+
+FASTAPI_LIMITER_LUA = """local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local expire_time = ARGV[2]
+local current = tonumber(redis.call('get', key) or "0")
+if current > 0 then
+ if current + 1 > limit then
+ return redis.call("PTTL",key)
+ else
+        redis.call("INCR", key)
+ return 0
+ end
+else
+    redis.call("SET", key, 1,"px",expire_time)
+ return 0
+end"""
+
+
+def make_request(i: int) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/api/v1/ncm/",
+        "headers": [(b"x-forwarded-for", f"10.0.{i % 250}.{i % 200}".encode())],
+        "client": ("127.0.0.1", 5000),
+        "query_string": b""
+    })
+
+
+async def bench_local(requests: list[Request]) -> float:
+    limiter = RateLimiter(times=10**9, seconds=60)
+    response = Response()
+    start = time.perf_counter()
+    for request in requests:
+        await limiter(request, response)
+    return (time.perf_counter() - start) / len(requests) * 1_000_000
+
+
+async def bench_redis(requests: list[Request], url: str) -> float:
+    client = redis.from_url(url)
+    sha = await client.script_load(FASTAPI_LIMITER_LUA)
+    start = time.perf_counter()
+    for i, request in enumerate(requests):
+        await client.evalsha(sha, 1, f"bench-limiter:{i % 500}", str(10**9), "60000")
+    elapsed = (time.perf_counter() - start) / len(requests) * 1_000_000
+    await client.aclose()
+    return elapsed
+
+
+async def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    requests = [make_request(i) for i in range(total)]
+
+    local_us = await bench_local(requests)
+    print(f"{'local':<8} {local_us:>9.2f} µs/requisição")
+    print(backend.get_stats())
+
+    url = os.getenv("REDIS_URL")
+    if not url:
+        print("REDIS_URL não configurada: comparação com o EVAL por requisição ignorada")
+        return
+
+    redis_us = await bench_redis(requests[:min(total, 5000)], url)
+    print(f"{'redis':<8} {redis_us:>9.2f} µs/requisição")
+    print(f"{'ganho':<8} {redis_us / local_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+"""
+Benchmark do caminho linha -> resposta de get_staff_members e get_logs.
+
+Compara o caminho antigo (Model(**dict(row)) + revalidação/serialização do
+response_model pelo FastAPI + JSONResponse) com o caminho confiável
+(model_construct + ModelResponse). As linhas são sintéticas, com os mesmos
+tipos que o asyncpg entrega, então o banco não entra na medição.
+
+Uso: python scripts/bench_rows.py [linhas] [repetições]
+"""
+from fastapi.routing import serialize_response
+from fastapi.responses import JSONResponse
+from fastapi.utils import create_model_field
+from datetime import datetime, timedelta
+from uuid import uuid4
+import asyncio
+import json
+import time
+import sys
+import os
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src.schemas.general import Pagination
+from src.schemas.user import UserResponse
+from src.schemas.log import Log
+from src.db.rows import ModelResponse
+from src.model import user as user_model
+from src.model import log as log_model
+
+
+class RowsConnection:
+    """Conexão em memória: devolve sempre as mesmas linhas sintéticas."""
+
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+
+    async def fetchval(self, *args):
+        return len(self.rows)
+
+    async def fetch(self, query, limit, offset):
+        return self.rows[offset:offset + limit]
+
+
+def generate_user_rows(count: int) -> list[dict]:
+    tenant_id = uuid4()
+    now = datetime.now()
+    return [
+        {
+            "id": uuid4(),
+            "name": f"Funcionário {i}",
+            "tenant_id": tenant_id,
+            "nickname": None,
+            "email": f"func{i}@empresa.com.br",
+            "notes": "Turno da manhã",
+            "state_tax_indicator": 9,
+            "created_at": now - timedelta(days=i),
+            "updated_at": now,
+            "created_by": None,
+            "roles": ["CAIXA", "ESTOQUISTA"],
+            "max_privilege_level": 30
+        }
+        for i in range(count)
+    ]
+
+
+def generate_log_rows(count: int) -> list[dict]:
+    now = datetime.now()
+    metadata = {
+        "client_ip": "10.0.0.1",
+        "user_agent": "Mozilla/5.0",
+        "exception_type": "ValueError",
+        "timestamp_ms": 1700000000000
+    }
+    return [
+        {
+            "id": i,
+            "level": "ERROR",
+            "message": "invalid literal for int() with base 10",
+            "path": "/api/v1/products",
+            "method": "GET",
+            "status_code": 500,
+            "stacktrace": "Traceback (most recent call last):\n  ...\nValueError",
+            "metadata": metadata,
+            "created_at": now - timedelta(minutes=i)
+        }
+        for i in range(count)
+    ]
+
+
+async def validated_path(model_class, rows: list[dict], total: int) -> bytes:
+    page = Pagination[model_class](
+        total=total,
+        limit=len(rows),
+        offset=0,
+        results=[model_class(**dict(row)) for row in rows]
+    )
+    field = create_model_field(name="Response", type_=Pagination[model_class])
+    content = await serialize_response(field=field, response_content=page)
+    return JSONResponse(content).body
+
+
+async def bench(name: str, run, repeat: int) -> float:
+    await run()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await run()
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    print(f"{name:<32} {elapsed:>9.3f} ms/req")
+    return elapsed
+
+
+async def run_case(label: str, model_class, rows: list[dict], trusted_fn, repeat: int):
+    conn = RowsConnection(rows)
+
+    async def old():
+        return await validated_path(model_class, [dict(r) for r in rows], len(rows))
+
+    async def new():
+        return ModelResponse(await trusted_fn(conn, len(rows))).body
+
+    assert json.loads(await old()) == json.loads(await new()), f"{label}: respostas divergentes"
+
+    print(f"\n{label} ({len(rows)} linhas)")
+    t_old = await bench("validado (antigo)", old, repeat)
+    t_new = await bench("confiável (model_construct)", new, repeat)
+    print(f"{'ganho':<32} {t_old / t_new:>9.2f}x")
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    await run_case(
+        "get_staff_members",
+        UserResponse,
+        generate_user_rows(count),
+        lambda conn, limit: user_model.get_staff_members(conn, limit, 0),
+        repeat
+    )
+    await run_case(
+        "get_logs",
+        Log,
+        generate_log_rows(count),
+        lambda conn, limit: log_model.get_logs(limit, 0, conn),
+        repeat
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
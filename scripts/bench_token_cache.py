@@ -0,0 +1,54 @@
+"""
+Benchmark do decode_access_token com e sem o cache de tokens.
+
+Simula terminais PDV reenviando o mesmo cookie: cada um dos N tokens é
+decodificado R vezes. "sem cache" chama o caminho original (jwt.decode +
+HMAC + pydantic a cada requisição).
+
+Uso: python scripts/bench_token_cache.py [terminais] [requisições_por_terminal]
+"""
+from uuid import uuid4
+import time
+import sys
+import os
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+os.environ.setdefault("SECRET_KEY", "bench-secret-key-bench-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+
+from src import security
+
+
+def bench(name: str, fn, tokens: list[str], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for token in tokens:
+            fn(token)
+    total = len(tokens) * repeat
+    per_call_us = (time.perf_counter() - start) / total * 1_000_000
+    print(f"{name:<12} {per_call_us:>8.2f} µs/requisição")
+    return per_call_us
+
+
+def main():
+    terminals = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    tokens = [
+        security.create_access_token(uuid4(), uuid4()).jwt_token
+        for _ in range(terminals)
+    ]
+
+    print(f"{terminals} terminais x {repeat} requisições")
+    before = bench("sem cache", security._decode_access_token_uncached, tokens, repeat)
+    after = bench("com cache", security.decode_access_token, tokens, repeat)
+    print(f"{'ganho':<12} {before / after:>8.2f}x")
+    print(security._access_token_cache.get_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Calibra os parâmetros argon2 para o hardware atual.
+
+Para cada memory_cost (até --max-memory-mib), aumenta o time_cost até a
+verificação de uma senha atingir a latência alvo. O paralelismo do argon2
+é fixado no orçamento de núcleos por login (--cores). Sugere a combinação
+com mais memória que cabe no alvo e estima a vazão de logins do worker com
+PASSWORD_HASH_WORKERS threads.
+
+O resultado vai para o .env; hashes antigos são refeitos no próximo login.
+
+Uso: python scripts/calibrate_argon2.py [--target-ms 250] [--cores 2] [--max-memory-mib 256] [--samples 5]
+"""
+from passlib.hash import argon2
+import statistics
+import argparse
+import time
+import sys
+import os
+
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+from src.constants import Constants
+
+
+PASSWORD = "senha-de-calibracao-123"
+MAX_TIME_COST = 20
+
+
+def measure_verify_ms(time_cost: int, memory_kib: int, parallelism: int, samples: int) -> float:
+    hasher = argon2.using(rounds=time_cost, memory_cost=memory_kib, parallelism=parallelism)
+    password_hash = hasher.hash(PASSWORD)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        hasher.verify(PASSWORD, password_hash)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(target_ms: float, cores: int, max_memory_mib: int, samples: int) -> list[tuple[int, int, float]]:
+    results = []
+    memory_mib = 16
+    while memory_mib <= max_memory_mib:
+        memory_kib = memory_mib * 1024
+        best = None
+        for time_cost in range(1, MAX_TIME_COST + 1):
+            elapsed = measure_verify_ms(time_cost, memory_kib, cores, samples)
+            if elapsed > target_ms:
+                break
+            best = (time_cost, memory_kib, elapsed)
+        if best is None:
+            # Nem time_cost=1 cabe no alvo: memórias maiores também não cabem
+            break
+        print(f"  m={memory_mib:>4} MiB  t={best[0]:>2}  p={cores}  -> {best[2]:>7.1f} ms")
+        results.append(best)
+        memory_mib *= 2
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibra os parâmetros argon2.")
+    parser.add_argument("--target-ms", type=float, default=250, help="latência alvo de uma verificação")
+    parser.add_argument("--cores", type=int, default=2, help="núcleos usados por verificação (parallelism)")
+    parser.add_argument("--max-memory-mib", type=int, default=256, help="memória máxima por verificação")
+    parser.add_argument("--samples", type=int, default=5, help="verificações por combinação")
+    args = parser.parse_args()
+
+    print(f"CPUs: {os.cpu_count()} | alvo: {args.target_ms:.0f} ms | parallelism: {args.cores}")
+    print(
+        f"Atual: t={Constants.ARGON2_TIME_COST} "
+        f"m={Constants.ARGON2_MEMORY_COST_KIB // 1024} MiB "
+        f"p={Constants.ARGON2_PARALLELISM} -> "
+        f"{measure_verify_ms(Constants.ARGON2_TIME_COST, Constants.ARGON2_MEMORY_COST_KIB, Constants.ARGON2_PARALLELISM, args.samples):.1f} ms\n"
+    )
+
+    results = calibrate(args.target_ms, args.cores, args.max_memory_mib, args.samples)
+    if not results:
+        print("\nNenhuma combinação cabe no alvo; aumente --target-ms ou reduza --cores.")
+        return
+
+    time_cost, memory_kib, elapsed = results[-1]
+    workers = Constants.PASSWORD_HASH_WORKERS
+    # Cada verificação ocupa até `cores` núcleos; o pool não passa dos núcleos da máquina
+    concurrent = max(1, min(workers, (os.cpu_count() or 1) // args.cores))
+    print(f"\nSugestão ({elapsed:.1f} ms por verificação):")
+    print(f"  ARGON2_TIME_COST={time_cost}")
+    print(f"  ARGON2_MEMORY_COST_KIB={memory_kib}")
+    print(f"  ARGON2_PARALLELISM={args.cores}")
+    print(f"  vazão estimada: ~{concurrent * 1000 / elapsed:.0f} logins/s por worker ({concurrent} verificações simultâneas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,99 +1,274 @@
+"""
+Carrega uma versão da tabela IBPT em fiscal_ncms aplicando só a diferença.
+
+O CSV vai por COPY para uma tabela temporária; depois, numa única transação,
+são aplicados apenas os INSERTs, UPDATEs (linhas que mudaram) e DELETEs
+(códigos que saíram da tabela). Linhas iguais não são reescritas, então a
+tabela e o índice GIN do fts_vector não incham a cada versão.
+
+Os caches da API (índice de NCM em memória e chaves com a tag "ncm") são
+atualizados pelo NOTIFY 'tag:ncm@<txid>' entregue no COMMIT, só quando algo mudou.
+
+Uso: python scripts/populate_ncm.py ARQUIVO.csv --version 25.2.H --valid-from 2025-11-20 --valid-until 2026-01-31 [--source ...] [--keep-missing] [--dry-run]
+"""
 from datetime import date
 from dotenv import load_dotenv
+import argparse
 import psycopg
-import os
+import time
 import csv
+import os
+
 
 load_dotenv()
 
 
-VERSION = "25.2.H"
-SOURCE = "IBPT/empresometro.com.br"
-DATA_INICIO = date(2025, 11, 20)
-DATA_FIM = date(2026, 1, 31)
-FILE = "/mnt/HD/54717619000140/TabelaIBPTaxSC25.2.H.csv"
-
-
-def stream_csv_ibpt_as_tuple():
-    try:
-        with open(FILE, mode='r', encoding='latin1') as csvfile:
-            reader = csv.DictReader(csvfile, delimiter=';')
-            for row in reader:
-                try:
-                    yield (
-                        row['codigo'].replace('.', ''),          # code
-                        row['descricao'][:255],                  # description (safe truncate)
-                        float(row['nacionalfederal'].replace(',', '.')), # federal_national
-                        float(row['importadosfederal'].replace(',', '.')), # federal_import
-                        float(row['estadual'].replace(',', '.')),        # state
-                        float(row['municipal'].replace(',', '.'))        # municipal
-                    )
-                except ValueError:
-                    print(f"Erro ao converter linha no arquivo {FILE}: {row.get('codigo')}")
-                    continue
-    except FileNotFoundError as e:
-        print(f"ERRO CRÍTICO: Arquivo não encontrado: {FILE}")
-        raise e
+DEFAULT_SOURCE = "IBPT/empresometro.com.br"
+CACHE_INVALIDATION_CHANNEL = "cache_invalidation"
+
+
+def parse_ibpt_csv(path: str, encoding: str) -> tuple[dict[str, tuple], int]:
+    """Retorna ({código: linha}, linhas inválidas). Código repetido: vale a última."""
+    rows: dict[str, tuple] = {}
+    invalid = 0
+    with open(path, mode='r', encoding=encoding) as csvfile:
+        reader = csv.DictReader(csvfile, delimiter=';')
+        for row in reader:
+            try:
+                code = row['codigo'].replace('.', '').strip()
+                rows[code] = (
+                    code,
+                    row['descricao'][:255],
+                    float(row['nacionalfederal'].replace(',', '.')),
+                    float(row['importadosfederal'].replace(',', '.')),
+                    float(row['estadual'].replace(',', '.')),
+                    float(row['municipal'].replace(',', '.'))
+                )
+            except (ValueError, AttributeError):
+                invalid += 1
+                print(f"Linha inválida em {path}: {row.get('codigo')}")
+    return rows, invalid
+
+
+class Timer:
+
+    def __init__(self):
+        self.steps: list[tuple[str, float]] = []
+        self._last = time.perf_counter()
+
+    def mark(self, step: str):
+        now = time.perf_counter()
+        self.steps.append((step, (now - self._last) * 1000))
+        self._last = now
+
+    def report(self):
+        for step, elapsed in self.steps:
+            print(f"  {step:<12} {elapsed:>9.1f} ms")
+        print(f"  {'total':<12} {sum(e for _, e in self.steps):>9.1f} ms")
+
+
+DIFF_SQL = """
+    SELECT
+        (
+            SELECT COUNT(*) FROM ncm_staging s
+            WHERE NOT EXISTS (SELECT 1 FROM fiscal_ncms f WHERE f.code = s.code)
+        ) AS inserts,
+        (
+            SELECT COUNT(*) FROM ncm_staging s JOIN fiscal_ncms f ON f.code = s.code
+            WHERE (
+                f.description,
+                f.federal_national_rate,
+                f.federal_import_rate,
+                f.state_rate,
+                f.municipal_rate
+            ) IS DISTINCT FROM (
+                s.description,
+                s.federal_national_rate,
+                s.federal_import_rate,
+                s.state_rate,
+                s.municipal_rate
+            )
+        ) AS updates,
+        (
+            SELECT COUNT(*) FROM fiscal_ncms f
+            WHERE NOT EXISTS (SELECT 1 FROM ncm_staging s WHERE s.code = f.code)
+        ) AS deletes
+"""
+
+
+def apply_diff(cur, inserts: int, updates: int, deletes: int):
+    # Só executa o que tem linhas: cada statement dispara o trigger de NOTIFY
+    if deletes:
+        cur.execute(
+            """
+            DELETE FROM
+                fiscal_ncms f
+            WHERE
+                NOT EXISTS (SELECT 1 FROM ncm_staging s WHERE s.code = f.code)
+            """
+        )
+    if updates:
+        cur.execute(
+            """
+            UPDATE
+                fiscal_ncms f
+            SET
+                description = s.description,
+                federal_national_rate = s.federal_national_rate,
+                federal_import_rate = s.federal_import_rate,
+                state_rate = s.state_rate,
+                municipal_rate = s.municipal_rate
+            FROM
+                ncm_staging s
+            WHERE
+                f.code = s.code
+                AND (
+                    f.description,
+                    f.federal_national_rate,
+                    f.federal_import_rate,
+                    f.state_rate,
+                    f.municipal_rate
+                ) IS DISTINCT FROM (
+                    s.description,
+                    s.federal_national_rate,
+                    s.federal_import_rate,
+                    s.state_rate,
+                    s.municipal_rate
+                )
+            """
+        )
+    if inserts:
+        cur.execute(
+            """
+            INSERT INTO fiscal_ncms (
+                code,
+                description,
+                federal_national_rate,
+                federal_import_rate,
+                state_rate,
+                municipal_rate
+            )
+            SELECT
+                s.code,
+                s.description,
+                s.federal_national_rate,
+                s.federal_import_rate,
+                s.state_rate,
+                s.municipal_rate
+            FROM
+                ncm_staging s
+            WHERE
+                NOT EXISTS (SELECT 1 FROM fiscal_ncms f WHERE f.code = s.code)
+            """
+        )
+
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Carrega uma versão da tabela IBPT em fiscal_ncms.")
+    parser.add_argument("file", help="CSV do IBPT (separado por ';')")
+    parser.add_argument("--version", required=True, help="versão da tabela, ex.: 25.2.H")
+    parser.add_argument("--valid-from", required=True, type=date.fromisoformat, help="início da vigência (AAAA-MM-DD)")
+    parser.add_argument("--valid-until", required=True, type=date.fromisoformat, help="fim da vigência (AAAA-MM-DD)")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="origem da tabela")
+    parser.add_argument("--encoding", default="latin1", help="encoding do CSV")
+    parser.add_argument("--keep-missing", action="store_true", help="não apaga códigos ausentes do CSV (arquivo parcial)")
+    parser.add_argument("--dry-run", action="store_true", help="só mostra a diferença; nada é gravado")
+    args = parser.parse_args()
+
     db_url = os.getenv("DATABASE_URL_POSTGRES")
     if not db_url:
         print("Erro: DATABASE_URL não definida.")
         return
-    
+
+    timer = Timer()
+    rows, invalid = parse_ibpt_csv(args.file, args.encoding)
+    timer.mark("leitura")
+    print(f"Versão {args.version}: {len(rows)} NCMs no arquivo ({invalid} linhas inválidas)")
+    if not rows:
+        print("Erro: nenhum NCM válido no arquivo.")
+        return
+
     with psycopg.connect(db_url) as conn:
         with conn.cursor() as cur:
-            
-            print(f"Inserindo versão {VERSION}...")
-            
             cur.execute(
                 """
-                INSERT INTO ibpt_versions (
-                    version, 
-                    valid_from, 
-                    valid_until, 
-                    source
-                )
-                VALUES 
-                    (%s, %s, %s, %s)
-                ON CONFLICT 
-                    (version)
-                DO UPDATE SET
-                    valid_from = EXCLUDED.valid_from,
-                    valid_until = EXCLUDED.valid_until;
-                """,
-                (VERSION, DATA_INICIO, DATA_FIM, SOURCE)
+                CREATE TEMP TABLE ncm_staging (
+                    code TEXT PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    federal_national_rate NUMERIC(5, 2),
+                    federal_import_rate NUMERIC(5, 2),
+                    state_rate NUMERIC(5, 2),
+                    municipal_rate NUMERIC(5, 2)
+                ) ON COMMIT DROP
+                """
             )
-                        
-            print(f"Processando...")                
-            iterador_dados = stream_csv_ibpt_as_tuple()
-            cur.executemany(
+            with cur.copy(
                 """
-                INSERT INTO fiscal_ncms (
+                COPY ncm_staging (
                     code,
                     description,
-                    federal_national_rate, 
+                    federal_national_rate,
                     federal_import_rate,
-                    state_rate, 
+                    state_rate,
                     municipal_rate
+                ) FROM STDIN
+                """
+            ) as copy:
+                for row in rows.values():
+                    copy.write_row(row)
+            timer.mark("copy")
+
+            cur.execute(DIFF_SQL)
+            inserts, updates, deletes = cur.fetchone()
+            if args.keep_missing:
+                deletes = 0
+            timer.mark("diff")
+            print(f"Inserir: {inserts} | atualizar: {updates} | remover: {deletes}")
+
+            if args.dry_run:
+                conn.rollback()
+                print("Dry run: nada foi gravado.")
+                timer.report()
+                return
+
+            cur.execute(
+                """
+                INSERT INTO ibpt_versions (
+                    version,
+                    valid_from,
+                    valid_until,
+                    source
                 )
-                VALUES 
-                    (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT 
-                    (code)
+                VALUES
+                    (%s, %s, %s, %s)
+                ON CONFLICT
+                    (version)
                 DO UPDATE SET
-                    description = EXCLUDED.description,
-                    federal_national_rate = EXCLUDED.federal_national_rate,
-                    federal_import_rate = EXCLUDED.federal_import_rate,
-                    state_rate = EXCLUDED.state_rate,
-                    municipal_rate = EXCLUDED.municipal_rate
+                    valid_from = EXCLUDED.valid_from,
+                    valid_until = EXCLUDED.valid_until,
+                    source = EXCLUDED.source
                 """,
-                iterador_dados
+                (args.version, args.valid_from, args.valid_until, args.source)
             )
-            print(f"Processamento concluido.")
-            
-            conn.commit()
-            print("Sucesso! Todos os dados foram commitados.")
+
+            changed = inserts + updates + deletes
+            apply_diff(cur, inserts, updates, deletes)
+            if changed:
+                # O trigger de fiscal_ncms já notifica; explícito para bancos sem
+                # o trigger. Notificações iguais na mesma transação viram uma só.
+                cur.execute("SELECT pg_notify(%s, 'tag:ncm@' || txid_current())", (CACHE_INVALIDATION_CHANNEL,))
+            timer.mark("aplicação")
+
+        conn.commit()
+        timer.mark("commit")
+
+        if changed:
+            conn.execute("ANALYZE fiscal_ncms")
+            timer.mark("analyze")
+
+    print(f"Sucesso! {changed} NCMs alterados na versão {args.version}.")
+    timer.report()
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -14,6 +14,13 @@ class Constants:
 
     REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
+    ACCESS_TOKEN_CACHE_SIZE = int(os.getenv("ACCESS_TOKEN_CACHE_SIZE", 10_000))
+    
+    # Limpeza de refresh_tokens (0 desliga a tarefa periódica da API)
+    REFRESH_TOKEN_PURGE_INTERVAL_MINUTES = int(os.getenv("REFRESH_TOKEN_PURGE_INTERVAL_MINUTES", 360))
+    REFRESH_TOKEN_PURGE_BATCH_SIZE = int(os.getenv("REFRESH_TOKEN_PURGE_BATCH_SIZE", 1000))
+    REFRESH_TOKEN_PURGE_PAUSE_MS = int(os.getenv("REFRESH_TOKEN_PURGE_PAUSE_MS", 50))
+    REFRESH_TOKEN_REVOKED_GRACE_HOURS = int(os.getenv("REFRESH_TOKEN_REVOKED_GRACE_HOURS", 24))
     FERNET_KEY = os.getenv("FERNET_KEY")
     SECRET_KEY = os.getenv("SECRET_KEY")
     ALGORITHM = os.getenv("ALGORITHM")
@@ -23,6 +30,99 @@ class Constants:
     
     NUVEM_FISCAL_API = os.getenv("NUVEM_FISCAL_TOKEN")
 
+    # Orçamento de banco por requisição (sobrescrito por rota com QueryBudget)
+    DB_QUERY_BUDGET_MAX_QUERIES = int(os.getenv("DB_QUERY_BUDGET_MAX_QUERIES", 12))
+    DB_QUERY_BUDGET_MAX_TIME_MS = float(os.getenv("DB_QUERY_BUDGET_MAX_TIME_MS", 500))
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS")) if os.getenv("DB_STATEMENT_TIMEOUT_MS") else None
+    DB_N_PLUS_ONE_THRESHOLD = int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", 5))
+
+    # Pool dedicado ao argon2 (hash/verificação de senha)
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 256))
+
+    # Parâmetros argon2 (calibrar com scripts/calibrate_argon2.py). Hashes com
+    # parâmetros diferentes são refeitos de forma transparente no login.
+    ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", 3))
+    ARGON2_MEMORY_COST_KIB = int(os.getenv("ARGON2_MEMORY_COST_KIB", 65536))
+    ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", 4))
+
+    # Cache do perfil (/auth/me) no get_or_set_cache (chaves "user:profile:<id>").
+    # O TTL local é curto porque só protege contra NOTIFYs perdidos (listener reconectando).
+    USER_PROFILE_LOCAL_TTL_SECONDS = int(os.getenv("USER_PROFILE_LOCAL_TTL_SECONDS", 60))
+    USER_PROFILE_REDIS_TTL_SECONDS = int(os.getenv("USER_PROFILE_REDIS_TTL_SECONDS", 900))
+
+    # Cache de slug -> loja (/auth/resolve-store, chaves "tenant:slug:<slug>").
+    # Slugs quase nunca mudam; slugs inexistentes ficam em cache negativo por pouco tempo.
+    TENANT_SLUG_LOCAL_TTL_SECONDS = int(os.getenv("TENANT_SLUG_LOCAL_TTL_SECONDS", 3600))
+    TENANT_SLUG_REDIS_TTL_SECONDS = int(os.getenv("TENANT_SLUG_REDIS_TTL_SECONDS", 86400))
+    TENANT_SLUG_NEGATIVE_TTL_SECONDS = int(os.getenv("TENANT_SLUG_NEGATIVE_TTL_SECONDS", 60))
+
+    # L1 (memória do worker) na frente do get_or_set_cache (Redis).
+    # TTL por prefixo da chave (texto antes do primeiro ':'), ex.: "ncm=600,cnpjs=3600".
+    CACHE_L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", 20_000))
+    CACHE_L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", 64 * 1024 * 1024))
+    CACHE_L1_DEFAULT_TTL_SECONDS = int(os.getenv("CACHE_L1_DEFAULT_TTL_SECONDS", 300))
+    CACHE_L1_TTLS = {
+        "user": USER_PROFILE_LOCAL_TTL_SECONDS,
+        "tenant": TENANT_SLUG_LOCAL_TTL_SECONDS,
+        **{
+            prefix.strip(): int(ttl)
+            for prefix, ttl in (
+                item.split("=", 1) 
+                for item in os.getenv("CACHE_L1_TTLS", "ncm=600,cnpjs=3600").split(",") 
+                if "=" in item
+            )
+        }
+    }
+
+    # Lock entre workers no cache miss: só um busca (ex.: Nuvem Fiscal), os
+    # demais esperam o valor no Redis até CACHE_FILL_LOCK_WAIT_MS.
+    CACHE_FILL_LOCK_ENABLED = os.getenv("CACHE_FILL_LOCK_ENABLED", "true").lower() in ("1", "true", "yes")
+    CACHE_FILL_LOCK_LEASE_MS = int(os.getenv("CACHE_FILL_LOCK_LEASE_MS", 10_000))
+    CACHE_FILL_LOCK_WAIT_MS = int(os.getenv("CACHE_FILL_LOCK_WAIT_MS", 5_000))
+    CACHE_FILL_LOCK_POLL_MS = int(os.getenv("CACHE_FILL_LOCK_POLL_MS", 50))
+
+    # Stale-while-revalidate: depois do ttl o valor ainda é servido por até
+    # CACHE_STALE_TTL_SECONDS enquanto uma única atualização roda em background.
+    # Beta do XFetch (atualização antecipada probabilística); 0 desliga.
+    CACHE_STALE_TTL_SECONDS = int(os.getenv("CACHE_STALE_TTL_SECONDS", 6 * 3600))
+    CACHE_EARLY_REFRESH_BETA = float(os.getenv("CACHE_EARLY_REFRESH_BETA", 1.0))
+
+    # NOTIFY de tag: só o primeiro worker apaga as chaves no Redis. O marcador
+    # (SET NX por notificação) precisa durar mais que o atraso entre workers.
+    CACHE_TAG_NOTIFY_GUARD_SECONDS = int(os.getenv("CACHE_TAG_NOTIFY_GUARD_SECONDS", 300))
+
+    # Codec binário do cache: valores a partir deste tamanho (bytes de JSON)
+    # são comprimidos com zstd no nível indicado.
+    CACHE_COMPRESSION_MIN_BYTES = int(os.getenv("CACHE_COMPRESSION_MIN_BYTES", 1024))
+    CACHE_COMPRESSION_LEVEL = int(os.getenv("CACHE_COMPRESSION_LEVEL", 3))
+
+    # Métricas do cache: fração dos lookups amostrada para o ranking de chaves
+    # quentes e quantas chaves distintas o ranking mantém.
+    CACHE_HOT_KEY_SAMPLE_RATE = float(os.getenv("CACHE_HOT_KEY_SAMPLE_RATE", 0.01))
+    CACHE_HOT_KEY_MAX_TRACKED = int(os.getenv("CACHE_HOT_KEY_MAX_TRACKED", 1000))
+
+    # Índice de NCM em memória (busca sem banco). Recarregado pelo NOTIFY
+    # "tag:ncm" do trigger em fiscal_ncms; desligado, a busca volta ao SQL + Redis.
+    NCM_INDEX_ENABLED = os.getenv("NCM_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+    # Intervalo entre tentativas enquanto o índice nunca carregou
+    NCM_INDEX_RETRY_SECONDS = int(os.getenv("NCM_INDEX_RETRY_SECONDS", 30))
+    # Buscas recentes já ranqueadas (a paginação não refaz o ranking)
+    NCM_INDEX_QUERY_CACHE_SIZE = int(os.getenv("NCM_INDEX_QUERY_CACHE_SIZE", 2048))
+    NCM_INDEX_QUERY_CACHE_MAX_BYTES = int(os.getenv("NCM_INDEX_QUERY_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+
+    # Máximo de códigos por POST /ncm/lookup
+    NCM_LOOKUP_MAX_CODES = int(os.getenv("NCM_LOOKUP_MAX_CODES", 5000))
+    # TTL dos NCMs por código no Redis (lookup sem o índice em memória)
+    NCM_CODE_CACHE_TTL_SECONDS = int(os.getenv("NCM_CODE_CACHE_TTL_SECONDS", 24 * 3600))
+
+    # Importação em lote de funcionários (POST /staff/users/bulk)
+    STAFF_IMPORT_MAX_ROWS = int(os.getenv("STAFF_IMPORT_MAX_ROWS", 500))
+
+    # LISTEN precisa de uma conexão de sessão: não pode passar por pooler em
+    # modo transação. Sem DATABASE_URL_LISTEN, usa a conexão privilegiada.
+    DATABASE_URL_LISTEN = os.getenv("DATABASE_URL_LISTEN") or os.getenv("DATABASE_URL_POSTGRES")
+
     MAX_BODY_SIZE = 20 * 1024 * 1024
     MAX_REQUESTS = 120 if os.getenv("ENV", "DEV") == "PROD" else 999_999_999
     WINDOW = 30
@@ -1,23 +1,69 @@
 from fastapi.exceptions import HTTPException
-from fastapi import status
+from fastapi import status, Depends
 from dotenv import load_dotenv
 from typing import TypeVar, Awaitable, Optional
 from src.exceptions import DatabaseError
-from psycopg.rows import dict_row
-from typing import Generator, Any
-import psycopg
+from src.db import query_stats
+from typing import AsyncGenerator
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from uuid import UUID
 import asyncpg
+import orjson
 import os
 
 
 load_dotenv()
 
 
+def orjson_default(obj):
+    # O UUID do asyncpg (pgproto.UUID) herda de uuid.UUID, mas o orjson só serializa o tipo exato
+    if isinstance(obj, UUID):
+        return str(obj)
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError
+
+
+def dumps_json(value) -> bytes:
+    return orjson.dumps(value, default=orjson_default)
+
+
+def _encode_jsonb(value) -> bytes:
+    # Formato binário do jsonb: byte de versão (1) + texto JSON
+    return b"\x01" + orjson.dumps(value, default=orjson_default)
+
+
+def _decode_jsonb(data: bytes):
+    return orjson.loads(data[1:])
+
+
+async def init_connection(conn: asyncpg.Connection):
+    query_stats.track_connection(conn)
+    # json/jsonb entram e saem como objetos Python, codificados pelo orjson
+    await conn.set_type_codec(
+        "jsonb",
+        encoder=_encode_jsonb,
+        decoder=_decode_jsonb,
+        schema="pg_catalog",
+        format="binary"
+    )
+    await conn.set_type_codec(
+        "json",
+        encoder=dumps_json,
+        decoder=orjson.loads,
+        schema="pg_catalog",
+        format="binary"
+    )
+
+
 class Database:
 
     
     def __init__(self):
         self.pool: Optional[asyncpg.Pool] = None
+        # Pool privilegiado (DATABASE_URL_POSTGRES), usado apenas pelas rotas de administração
+        self.admin_pool: Optional[asyncpg.Pool] = None
     
     async def version(self, conn: asyncpg.Connection) -> str:
         return await conn.fetchval("SELECT version()")
@@ -33,7 +79,8 @@ class Database:
                 command_timeout=60,
                 statement_cache_size=0,
                 timeout=30,
-                max_inactive_connection_lifetime=300
+                max_inactive_connection_lifetime=300,
+                init=init_connection
             )                    
 
             print("[DB] [INFO]", "[CONEXÃO ABERTA]")
@@ -41,6 +88,25 @@ class Database:
         except Exception as e:
             print("[DB] [ERROR]", f"[FALHA AO CONECTAR: {e}]")
             raise
+        
+        try:
+            # Pool pequeno e separado: ações administrativas não disputam slots com o PDV
+            self.admin_pool = await asyncpg.create_pool(
+                dsn=os.getenv("DATABASE_URL_POSTGRES"),
+                min_size=0,
+                max_size=4,
+                command_timeout=60,
+                statement_cache_size=0,
+                timeout=30,
+                max_inactive_connection_lifetime=60,
+                init=init_connection
+            )
+            
+            print("[DB] [INFO]", "[CONEXÃO ADMIN ABERTA]")
+            
+        except Exception as e:
+            print("[DB] [ERROR]", f"[FALHA AO CONECTAR (ADMIN): {e}]")
+            raise
     
     async def disconnect(self):        
         if self.pool:
@@ -49,6 +115,13 @@ class Database:
             except Exception as e:
                 print("[DB] [ERROR]", f"[ERRO AO ENCERRAR CONEXÃO: {e}]")
             print("[DB] [INFO]", "[CONEXÃO ENCERRADA]")
+        
+        if self.admin_pool:
+            try:
+                await self.admin_pool.close()
+            except Exception as e:
+                print("[DB] [ERROR]", f"[ERRO AO ENCERRAR CONEXÃO ADMIN: {e}]")
+            print("[DB] [INFO]", "[CONEXÃO ADMIN ENCERRADA]")
     
     async def health_check(self) -> bool:
         if not self.pool: return False        
@@ -77,21 +150,49 @@ async def get_db_pool() -> asyncpg.Pool:
     return db.pool
 
 
+@asynccontextmanager
+async def acquire_connection() -> AsyncGenerator[asyncpg.Connection, None]:
+    """
+    Conexão fora do ciclo de dependências da rota: para buscas que só
+    acontecem em cache miss ou em atualizações em background.
+    """
+    pool = await get_db_pool()
+    async with pool.acquire() as connection:
+        yield query_stats.with_statement_timeout(connection)
+
+
+async def get_admin_pool() -> asyncpg.Pool:
+    """
+    Retorna o Pool privilegiado (DATABASE_URL_POSTGRES).
+    Deve ser usado apenas por rotas protegidas por API Key de administrador.
+    """
+    if db.admin_pool is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="O Pool de conexão administrativo não foi inicializado."
+        )
+    return db.admin_pool
+
+
+async def get_admin_connection(
+    pool: asyncpg.Pool = Depends(get_admin_pool)
+) -> AsyncGenerator[asyncpg.Connection, None]:
+    async with pool.acquire() as connection:
+        yield query_stats.with_statement_timeout(connection)
+
+
+async def get_admin_transaction(
+    pool: asyncpg.Pool = Depends(get_admin_pool)
+) -> AsyncGenerator[asyncpg.Connection, None]:
+    async with pool.acquire() as connection:
+        async with connection.transaction():
+            await query_stats.apply_statement_timeout(connection)
+            yield connection
+
+
 async def log_rls(conn: asyncpg.Connection) -> None:
     row = await conn.fetchrow("SELECT get_session_context_log()")
     print(row)
-    
-
-def get_db_cursor() -> Generator[psycopg.Cursor, Any, None]:
-    with psycopg.connect(os.getenv("DATABASE_URL_POSTGRES"), row_factory=dict_row) as conn:
-        with conn.cursor() as cur:
-            try:
-                yield cur
-                conn.commit()
-            except Exception as e:
-                conn.rollback()
-                print(f"Erro na transação: {e}")
-                raise e
             
 
 T = TypeVar("T")
@@ -126,40 +227,49 @@ ERROR_MAP = {
     
     "companies_unique_cnpj": "CNPJ já cadastrado.",
     
+    "tenants_unique_cnpj": "CNPJ já cadastrado.",
+    "idx_users_email_unique": "Email já cadastrado.",
+    "idx_users_cpf_unique": "CPF já cadastrado.",
+    
 }
 
 
-async def _handle_asyncpg_errors(operation: Awaitable[T]) -> T:    
-    try:
-        return await operation
-    except asyncpg.exceptions.UniqueViolationError as e:
+def to_database_error(e: Exception) -> Exception:
+    """Traduz um erro do asyncpg para DatabaseError usando o ERROR_MAP."""
+    if isinstance(e, asyncpg.exceptions.UniqueViolationError):
         detail = ERROR_MAP.get(e.constraint_name, "Conflito de dados únicos.")
-        raise DatabaseError(code=status.HTTP_409_CONFLICT, detail=detail)
-    except asyncpg.exceptions.CheckViolationError as e:
+        return DatabaseError(code=status.HTTP_409_CONFLICT, detail=detail)
+    if isinstance(e, asyncpg.exceptions.CheckViolationError):
         detail = ERROR_MAP.get(e.constraint_name, "Dados inválidos.")
-        raise DatabaseError(code=status.HTTP_400_BAD_REQUEST, detail=detail)
-    except asyncpg.exceptions.InvalidTextRepresentationError as e:
+        return DatabaseError(code=status.HTTP_400_BAD_REQUEST, detail=detail)
+    if isinstance(e, asyncpg.exceptions.InvalidTextRepresentationError):
         msg = e.as_dict()['message']
         role = msg.split(":")[1].strip()
         if 'user_role_enum' in msg:
             detail = ERROR_MAP.get(e.constraint_name, f"Função de usuário inválida ({role}).")
         else:
             detail = ERROR_MAP.get(e.constraint_name, "Dados inválidos.")
-        raise DatabaseError(code=status.HTTP_400_BAD_REQUEST, detail=detail)
-    except asyncpg.exceptions.NoDataFoundError as e:
-        raise DatabaseError(
+        return DatabaseError(code=status.HTTP_400_BAD_REQUEST, detail=detail)
+    if isinstance(e, asyncpg.exceptions.NoDataFoundError):
+        return DatabaseError(
             code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail=f"{e}", 
             log_msg=f"{e}"
         )
-    except HTTPException as e:
-        raise e
+    if isinstance(e, HTTPException):
+        return e
+    return DatabaseError(
+        code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+        detail="Erro interno ao processar operação.", 
+        log_msg=f"{e}"
+    )
+
+
+async def _handle_asyncpg_errors(operation: Awaitable[T]) -> T:    
+    try:
+        return await operation
     except Exception as e:
-        raise DatabaseError(
-            code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
-            detail="Erro interno ao processar operação.", 
-            log_msg=f"{e}"
-        )
+        raise to_database_error(e)
 
 
 async def _execute_sequence(operations):
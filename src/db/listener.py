@@ -0,0 +1,133 @@
+from src.constants import Constants
+from typing import Callable, Dict, Iterable, List, Optional
+import contextlib
+import asyncpg
+import asyncio
+
+
+CACHE_INVALIDATION_CHANNEL = "cache_invalidation"
+
+
+InvalidationHandler = Callable[[Optional[str]], None]
+
+
+async def notify_cache_tags(conn: asyncpg.Connection, tags: Iterable[str]):
+    """
+    Publica "tag:<tag>@<txid>" para scripts/rotas que alteram dados sem trigger.
+    Dentro de uma transação, só é entregue no COMMIT.
+    """
+    for tag in tags:
+        await conn.execute(
+            "SELECT pg_notify($1, 'tag:' || $2 || '@' || txid_current())",
+            CACHE_INVALIDATION_CHANNEL,
+            tag
+        )
+
+
+def split_tag_notification(key: str) -> tuple[str, Optional[str]]:
+    """"<tag>@<txid>" -> (tag, id da notificação). Payloads antigos vêm sem id."""
+    tag, sep, notification_id = key.rpartition("@")
+    if not sep:
+        return key, None
+    return tag, notification_id
+
+
+class InvalidationListener:
+    """
+    Conexão dedicada com LISTEN no canal cache_invalidation.
+
+    Os triggers publicam payloads "<tipo>:<id>" e cada worker repassa o id aos
+    handlers registrados para o tipo. O NOTIFY só é entregue no COMMIT, então um
+    cache nunca é limpo antes da escrita ficar visível.
+
+    Se a conexão cair, notificações podem ter sido perdidas: ao reconectar,
+    todos os handlers recebem None (limpar tudo).
+    """
+
+    def __init__(self, dsn: Optional[str], reconnect_delay: float = 5.0):
+        self.dsn = dsn
+        self.reconnect_delay = reconnect_delay
+        self._handlers: Dict[str, List[InvalidationHandler]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._connected = False
+        self._received = 0
+        self._unknown = 0
+        self._reconnects = 0
+        self._errors = 0
+
+    def register(self, kind: str, handler: InvalidationHandler):
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def _dispatch(self, kind: str, key: Optional[str]):
+        handlers = self._handlers.get(kind)
+        if not handlers:
+            self._unknown += 1
+            return
+        for handler in handlers:
+            try:
+                handler(key)
+            except Exception as e:
+                self._errors += 1
+                print(f"[DB] [ERROR] [INVALIDATION {kind}] {e}")
+
+    def _on_notification(self, conn, pid, channel: str, payload: str):
+        self._received += 1
+        kind, _, key = payload.partition(":")
+        self._dispatch(kind, key or None)
+
+    def _invalidate_all(self):
+        for kind in list(self._handlers):
+            self._dispatch(kind, None)
+
+    async def _run(self):
+        while True:
+            conn: Optional[asyncpg.Connection] = None
+            try:
+                conn = await asyncpg.connect(dsn=self.dsn, statement_cache_size=0)
+                await conn.add_listener(CACHE_INVALIDATION_CHANNEL, self._on_notification)
+                if self._reconnects:
+                    self._invalidate_all()
+                self._connected = True
+                print("[DB] [INFO]", f"[LISTEN {CACHE_INVALIDATION_CHANNEL}]")
+
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _: closed.set())
+                await closed.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._errors += 1
+                print("[DB] [ERROR]", f"[LISTEN {CACHE_INVALIDATION_CHANNEL}: {e}]")
+            finally:
+                self._connected = False
+                if conn is not None and not conn.is_closed():
+                    with contextlib.suppress(Exception):
+                        await conn.close()
+
+            self._reconnects += 1
+            await asyncio.sleep(self.reconnect_delay)
+
+    def start(self):
+        if self._task is None and self.dsn:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def get_stats(self) -> dict:
+        return {
+            "channel": CACHE_INVALIDATION_CHANNEL,
+            "connected": self._connected,
+            "handlers": sorted(self._handlers),
+            "received": self._received,
+            "unknown_kind": self._unknown,
+            "reconnects": self._reconnects,
+            "errors": self._errors
+        }
+
+
+listener = InvalidationListener(Constants.DATABASE_URL_LISTEN)
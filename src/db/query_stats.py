@@ -0,0 +1,234 @@
+from contextvars import ContextVar
+from collections import Counter
+from src.constants import Constants
+from typing import Dict, Optional
+import asyncpg
+import threading
+
+
+class QueryStats:
+    """Contador de queries e tempo de banco de uma única requisição."""
+
+    __slots__ = (
+        "count",
+        "total_ms",
+        "statements",
+        "max_queries",
+        "max_time_ms",
+        "statement_timeout_ms"
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements: Counter = Counter()
+        self.max_queries: int = Constants.DB_QUERY_BUDGET_MAX_QUERIES
+        self.max_time_ms: float = Constants.DB_QUERY_BUDGET_MAX_TIME_MS
+        self.statement_timeout_ms: Optional[int] = Constants.DB_STATEMENT_TIMEOUT_MS
+
+    def add(self, query: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements[query] += 1
+
+    def repeated_statements(self) -> Dict[str, int]:
+        threshold = Constants.DB_N_PLUS_ONE_THRESHOLD
+        return {q: n for q, n in self.statements.items() if n >= threshold}
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+class QueryBudgetMetrics:
+    """Agregado global das violações, exposto em /admin/monitor/db."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._queries = 0
+        self._db_time_ms = 0.0
+        self._violations: Counter = Counter()
+        self._n_plus_one: Counter = Counter()
+        self._worst: Dict[str, dict] = {}
+
+    def record(self, route: str, stats: QueryStats, violations: list[str], repeated: Dict[str, int]):
+        with self._lock:
+            self._requests += 1
+            self._queries += stats.count
+            self._db_time_ms += stats.total_ms
+            if violations:
+                self._violations[route] += 1
+            if repeated:
+                self._n_plus_one[route] += 1
+            worst = self._worst.get(route)
+            if worst is None or stats.count > worst["queries"]:
+                self._worst[route] = {
+                    "queries": stats.count,
+                    "db_time_ms": round(stats.total_ms, 2)
+                }
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "queries": self._queries,
+                "avg_queries_per_request": round(self._queries / self._requests, 2) if self._requests else 0,
+                "avg_db_time_ms": round(self._db_time_ms / self._requests, 2) if self._requests else 0,
+                "budget_violations": dict(self._violations),
+                "n_plus_one_suspects": dict(self._n_plus_one),
+                "worst_by_route": dict(self._worst),
+                "defaults": {
+                    "max_queries": Constants.DB_QUERY_BUDGET_MAX_QUERIES,
+                    "max_time_ms": Constants.DB_QUERY_BUDGET_MAX_TIME_MS,
+                    "statement_timeout_ms": Constants.DB_STATEMENT_TIMEOUT_MS,
+                    "n_plus_one_threshold": Constants.DB_N_PLUS_ONE_THRESHOLD
+                }
+            }
+
+    def reset(self):
+        with self._lock:
+            self._requests = 0
+            self._queries = 0
+            self._db_time_ms = 0.0
+            self._violations.clear()
+            self._n_plus_one.clear()
+            self._worst.clear()
+
+
+metrics = QueryBudgetMetrics()
+
+
+def _query_logger(record: asyncpg.connection.LoggedQuery):
+    # O asyncpg agenda o callback com call_soon, que preserva o contexto da
+    # requisição: o ContextVar aponta para as estatísticas certas.
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.add(record.query, record.elapsed * 1000)
+
+
+def track_connection(conn: asyncpg.Connection):
+    """Registrado no init dos pools; os loggers sobrevivem ao release."""
+    conn.add_query_logger(_query_logger)
+
+
+def start_request() -> QueryStats:
+    stats = QueryStats()
+    _current_stats.set(stats)
+    return stats
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+def finish_request(method: str, route: str, stats: QueryStats):
+    violations = []
+    if stats.max_queries and stats.count > stats.max_queries:
+        violations.append(f"{stats.count} queries (limite {stats.max_queries})")
+    if stats.max_time_ms and stats.total_ms > stats.max_time_ms:
+        violations.append(f"{stats.total_ms:.1f}ms no banco (limite {stats.max_time_ms}ms)")
+
+    repeated = stats.repeated_statements()
+    metrics.record(route, stats, violations, repeated)
+
+    if violations:
+        print("[DB] [WARN]", f"[QUERY BUDGET] {method} {route}: {', '.join(violations)}")
+    for query, n in repeated.items():
+        print("[DB] [WARN]", f"[N+1] {method} {route}: {n}x {' '.join(query.split())[:160]}")
+
+
+def statement_timeout_sql() -> str:
+    """SET LOCAL statement_timeout da rota atual, ou string vazia."""
+    stats = _current_stats.get()
+    if stats is None or not stats.statement_timeout_ms:
+        return ""
+    return f"SET LOCAL statement_timeout = {int(stats.statement_timeout_ms)}"
+
+
+async def apply_statement_timeout(conn: asyncpg.Connection):
+    """Só dentro de uma transação: o SET LOCAL termina no COMMIT/ROLLBACK."""
+    sql = statement_timeout_sql()
+    if sql:
+        await conn.execute(sql)
+
+
+_TIMED_METHODS = frozenset((
+    "execute",
+    "executemany",
+    "fetch",
+    "fetchrow",
+    "fetchval",
+    "fetchmany",
+    "cursor",
+    "prepare",
+    "copy_from_query",
+    "copy_from_table",
+    "copy_to_table",
+    "copy_records_to_table"
+))
+
+
+class TimedConnection:
+    """
+    Conexão em autocommit com o statement_timeout da rota aplicado por
+    chamada (timeout= do asyncpg, que cancela a query no servidor ao estourar).
+
+    Um SET de sessão não serve aqui: atrás do pooler em modo transação cada
+    statement pode cair em outro backend, então o valor vazaria para outros
+    clientes e nem garantiria a próxima query desta requisição.
+    """
+
+    __slots__ = ("_conn", "_timeout")
+
+    def __init__(self, conn: asyncpg.Connection, timeout: float):
+        self._conn = conn
+        self._timeout = timeout
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._conn, name)
+        if name not in _TIMED_METHODS:
+            return attr
+        timeout = self._timeout
+
+        def timed(*args, **kwargs):
+            if kwargs.get("timeout") is None:
+                kwargs["timeout"] = timeout
+            return attr(*args, **kwargs)
+        return timed
+
+
+def with_statement_timeout(conn: asyncpg.Connection) -> asyncpg.Connection:
+    """Conexão fora de transação com o timeout da rota atual (ou a própria conexão)."""
+    stats = _current_stats.get()
+    if stats is None or not stats.statement_timeout_ms:
+        return conn
+    return TimedConnection(conn, stats.statement_timeout_ms / 1000)
+
+
+class QueryBudget:
+    """
+    Dependência de rota (no mesmo formato do RateLimiter) que ajusta o
+    orçamento de queries/tempo e o statement_timeout da requisição.
+    Deve ser declarada em `dependencies=[...]` para rodar antes da conexão.
+    """
+
+    def __init__(
+        self,
+        max_queries: Optional[int] = None,
+        max_time_ms: Optional[float] = None,
+        statement_timeout_ms: Optional[int] = None
+    ):
+        self.max_queries = max_queries
+        self.max_time_ms = max_time_ms
+        self.statement_timeout_ms = statement_timeout_ms
+
+    async def __call__(self):
+        stats = _current_stats.get()
+        if stats is None:
+            return
+        if self.max_queries is not None:
+            stats.max_queries = self.max_queries
+        if self.max_time_ms is not None:
+            stats.max_time_ms = self.max_time_ms
+        if self.statement_timeout_ms is not None:
+            stats.statement_timeout_ms = self.statement_timeout_ms
@@ -0,0 +1,57 @@
+from fastapi import Response
+from pydantic import BaseModel
+from src.schemas.general import Pagination
+from typing import Any, Iterable, List, Mapping, Type, TypeVar
+
+
+T = TypeVar("T", bound=BaseModel)
+
+
+# Camada de construção "confiável" para dados vindos do banco.
+# As linhas do asyncpg já chegam tipadas (UUID, datetime, int...) e com as
+# constraints garantidas pelo schema, então validar cada linha com pydantic
+# só repete trabalho. model_construct monta a instância sem validação.
+
+
+def from_row(model_class: Type[T], row: Mapping[str, Any], **overrides) -> T:
+    values = dict(row)
+    if overrides:
+        values.update(overrides)
+    return model_class.model_construct(**values)
+
+
+def from_rows(model_class: Type[T], rows: Iterable[Mapping[str, Any]]) -> List[T]:
+    return [model_class.model_construct(**dict(row)) for row in rows]
+
+
+def build_page(
+    model_class: Type[T],
+    results: List[T],
+    total: int,
+    limit: int,
+    offset: int
+) -> Pagination[T]:
+    # Mesmo cálculo de Pagination.compute_pages, que não roda no model_construct
+    return Pagination[model_class].model_construct(
+        total=total,
+        limit=limit,
+        offset=offset,
+        page=(offset // limit) + 1 if limit else 1,
+        pages=(total + limit - 1) // limit if limit else 0,
+        results=results
+    )
+
+
+class ModelResponse(Response):
+    """
+    Serializa o modelo direto para bytes com o serializer do pydantic (Rust).
+    Ao retornar uma Response o FastAPI não revalida o objeto contra o
+    response_model, que continua valendo apenas para a documentação.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: BaseModel) -> bytes:
+        # Campos enum chegam do banco como str; o JSON gerado é o mesmo,
+        # então os avisos de serialização são descartados.
+        return content.__pydantic_serializer__.to_json(content, warnings=False)
@@ -443,6 +443,25 @@ CREATE TABLE IF NOT EXISTS fiscal_ncms (
 CREATE INDEX IF NOT EXISTS idx_fiscal_ncms_fts ON fiscal_ncms USING GIN (fts_vector);
 
 
+-- Nova tabela IBPT (populate_ncm.py) ou correção manual: invalida todas as
+-- páginas de NCM em cache (tag "ncm"). Por statement: um COPY/TRUNCATE gera
+-- uma única notificação.
+-- Payload das tags: "tag:<tag>@<txid>". O txid identifica a notificação, para
+-- que só um worker apague as chaves no Redis (os demais limpam o próprio L1).
+CREATE OR REPLACE FUNCTION trg_notify_ncm_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('cache_invalidation', 'tag:ncm@' || txid_current());
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE TRIGGER trg_fiscal_ncms_notify_change
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON fiscal_ncms
+FOR EACH STATEMENT EXECUTE FUNCTION trg_notify_ncm_change();
+
+
 CREATE OR REPLACE FUNCTION search_ncms_optimized(
     search_term TEXT, 
     p_limit INTEGER DEFAULT 64, 
@@ -554,6 +573,33 @@ CREATE TABLE IF NOT EXISTS cnpjs (
     last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+
+-- Invalida o cache de /companies/<cnpj> (tag "cnpj:<cnpj>"). INSERT não
+-- notifica: sem linha não há resposta em cache.
+-- O upsert do create_company (atualização a partir da origem) que não muda
+-- nenhum dado servido também não: senão cada atualização invalidaria a
+-- entrada que a própria busca acabou de gravar.
+CREATE OR REPLACE FUNCTION trg_notify_cnpj_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' 
+       AND to_jsonb(OLD) - 'last_update' - 'raw_source_cnpj' = to_jsonb(NEW) - 'last_update' - 'raw_source_cnpj' THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM pg_notify('cache_invalidation', 'tag:cnpj:' || OLD.cnpj || '@' || txid_current());
+    IF TG_OP = 'UPDATE' AND NEW.cnpj IS DISTINCT FROM OLD.cnpj THEN
+        PERFORM pg_notify('cache_invalidation', 'tag:cnpj:' || NEW.cnpj || '@' || txid_current());
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE TRIGGER trg_cnpjs_notify_change
+AFTER UPDATE OR DELETE ON cnpjs
+FOR EACH ROW EXECUTE FUNCTION trg_notify_cnpj_change();
+
 -- ============================================================================
 -- TENANTS
 -- ============================================================================
@@ -637,6 +683,56 @@ BEFORE INSERT ON tenants
 FOR EACH ROW
 EXECUTE FUNCTION generate_unique_tenant_code();
 
+
+-- Invalida o cache de resolução de slug (/auth/resolve-store, tag "tenant_slug:<slug>").
+-- INSERT também notifica: o slug pode estar em cache negativo ("não existe").
+CREATE OR REPLACE FUNCTION trg_notify_tenant_slug_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND (
+        OLD.slug, 
+        OLD.name, 
+        OLD.is_active
+    ) IS NOT DISTINCT FROM (
+        NEW.slug, 
+        NEW.name, 
+        NEW.is_active
+    ) THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.slug IS NOT NULL THEN
+        PERFORM pg_notify('cache_invalidation', 'tag:tenant_slug:' || OLD.slug || '@' || txid_current());
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.slug IS NOT NULL AND NEW.slug IS DISTINCT FROM OLD.slug THEN
+        PERFORM pg_notify('cache_invalidation', 'tag:tenant_slug:' || NEW.slug || '@' || txid_current());
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE TRIGGER trg_tenants_notify_slug_change
+AFTER INSERT OR UPDATE OR DELETE ON tenants
+FOR EACH ROW EXECUTE FUNCTION trg_notify_tenant_slug_change();
+
+
+-- Invalida o que estiver em cache sob a tag "tenant:<id>" (get_or_set_cache).
+CREATE OR REPLACE FUNCTION trg_notify_tenant_tag_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('cache_invalidation', 'tag:tenant:' || OLD.id::TEXT || '@' || txid_current());
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE TRIGGER trg_tenants_notify_tag_change
+AFTER UPDATE OR DELETE ON tenants
+FOR EACH ROW EXECUTE FUNCTION trg_notify_tenant_tag_change();
+
 -- ============================================================================
 -- ROLE CONFIG
 -- ============================================================================
@@ -848,6 +944,47 @@ CREATE OR REPLACE TRIGGER trg_users_updated_at
 BEFORE UPDATE ON users
 FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+
+-- Invalida o cache de perfil (/auth/me, tag "user:<id>") em todos os workers.
+-- Entregue só no COMMIT. Ignora updates que não mudam o perfil (ex.: last_login_at no login);
+-- max_privilege_level cobre as mudanças em role_configs.
+CREATE OR REPLACE FUNCTION trg_notify_user_profile_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND (
+        OLD.name, 
+        OLD.nickname, 
+        OLD.email, 
+        OLD.notes, 
+        OLD.state_tax_indicator, 
+        OLD.tenant_id, 
+        OLD.roles, 
+        OLD.max_privilege_level, 
+        OLD.is_active
+    ) IS NOT DISTINCT FROM (
+        NEW.name, 
+        NEW.nickname, 
+        NEW.email, 
+        NEW.notes, 
+        NEW.state_tax_indicator, 
+        NEW.tenant_id, 
+        NEW.roles, 
+        NEW.max_privilege_level, 
+        NEW.is_active
+    ) THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM pg_notify('cache_invalidation', 'tag:user:' || COALESCE(NEW.id, OLD.id)::TEXT || '@' || txid_current());
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE TRIGGER trg_users_notify_profile_change
+AFTER UPDATE OR DELETE ON users
+FOR EACH ROW EXECUTE FUNCTION trg_notify_user_profile_change();
+
 -- ============================================================================
 -- CATEGORIES
 -- ============================================================================
@@ -1397,22 +1534,321 @@ CREATE TABLE IF NOT EXISTS refresh_tokens (
     expires_at TIMESTAMPTZ NOT NULL,
     created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
     revoked BOOLEAN DEFAULT FALSE,
+    revoked_at TIMESTAMPTZ,
     family_id UUID NOT NULL,
-    replaced_by UUID REFERENCES refresh_tokens(id),
+    replaced_by UUID REFERENCES refresh_tokens(id) ON DELETE SET NULL,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE ON UPDATE CASCADE
 );
 
+-- Bancos criados antes da limpeza em lotes: o token sucessor pode ser apagado antes do antecessor.
+-- Só recria a FK quando ela ainda não é ON DELETE SET NULL (o ADD valida a tabela inteira).
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT FROM pg_catalog.pg_constraint
+        WHERE conname = 'refresh_tokens_replaced_by_fkey'
+          AND conrelid = 'refresh_tokens'::regclass
+          AND confdeltype = 'n'
+    ) THEN
+        ALTER TABLE refresh_tokens DROP CONSTRAINT IF EXISTS refresh_tokens_replaced_by_fkey;
+        ALTER TABLE refresh_tokens 
+            ADD CONSTRAINT refresh_tokens_replaced_by_fkey 
+            FOREIGN KEY (replaced_by) REFERENCES refresh_tokens(id) ON DELETE SET NULL;
+    END IF;
+END $$;
+
+-- Carência da limpeza conta a partir da revogação. Tokens revogados antes da
+-- coluna existir recebem a data da migração (carência inteira, a favor da detecção de reuso).
+ALTER TABLE refresh_tokens ADD COLUMN IF NOT EXISTS revoked_at TIMESTAMPTZ;
+UPDATE refresh_tokens SET revoked_at = CURRENT_TIMESTAMP WHERE revoked = TRUE AND revoked_at IS NULL;
+
 
 CREATE INDEX IF NOT EXISTS idx_refresh_token_users ON refresh_tokens(user_id);
 CREATE INDEX IF NOT EXISTS idx_refresh_token_family ON refresh_tokens(family_id);
 CREATE INDEX IF NOT EXISTS idx_refresh_tokens_active_family ON refresh_tokens(family_id) WHERE revoked = FALSE;
 CREATE INDEX IF NOT EXISTS idx_refresh_tokens_expires_at ON refresh_tokens (expires_at);
+-- Parcial: logins inserem tokens não revogados, então não pagam por este índice
+DROP INDEX IF EXISTS idx_refresh_tokens_revoked_created;
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_revoked_at ON refresh_tokens (revoked_at) WHERE revoked = TRUE;
+
+
+-- Login: revoga a família do token anterior, atualiza last_login_at (e o
+-- hash da senha, quando os parâmetros argon2 mudaram) e registra o novo
+-- refresh token em uma única chamada.
+-- SECURITY DEFINER: ainda não há contexto RLS no momento do login.
+DROP FUNCTION IF EXISTS auth_register_login(UUID, UUID, UUID, TIMESTAMPTZ, UUID);
+CREATE OR REPLACE FUNCTION auth_register_login(
+    p_user_id UUID,
+    p_old_token_id UUID,
+    p_new_token_id UUID,
+    p_expires_at TIMESTAMPTZ,
+    p_family_id UUID,
+    p_new_password_hash TEXT DEFAULT NULL
+)
+RETURNS VOID
+SET search_path = public, pg_temp AS $$
+BEGIN
+    IF p_old_token_id IS NOT NULL THEN
+        UPDATE 
+            refresh_tokens rt
+        SET 
+            revoked = TRUE,
+            revoked_at = CURRENT_TIMESTAMP
+        WHERE 
+            rt.family_id = (
+                SELECT 
+                    old.family_id 
+                FROM 
+                    refresh_tokens old 
+                WHERE 
+                    old.id = p_old_token_id
+            )
+            AND rt.revoked = FALSE;
+    END IF;
+
+    UPDATE 
+        users u
+    SET 
+        last_login_at = CURRENT_TIMESTAMP,
+        password_hash = COALESCE(p_new_password_hash, u.password_hash)
+    WHERE 
+        u.id = p_user_id;
+
+    INSERT INTO refresh_tokens (
+        id,
+        user_id,
+        expires_at,
+        revoked,
+        family_id
+    ) VALUES (
+        p_new_token_id,
+        p_user_id,
+        p_expires_at,
+        FALSE,
+        p_family_id
+    );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+
+-- Refresh: busca (FOR UPDATE), valida, rotaciona e revoga atomicamente.
+-- status:
+--   'OK'      -> novo token criado, colunas do usuário preenchidas
+--   'INVALID' -> token inexistente
+--   'REVOKED' -> token revogado/expirado ou usuário inexistente; a família inteira é revogada
+CREATE OR REPLACE FUNCTION auth_rotate_refresh_token(
+    p_token_id UUID,
+    p_new_token_id UUID,
+    p_expires_at TIMESTAMPTZ
+)
+RETURNS TABLE (
+    status TEXT,
+    family_id UUID,
+    id UUID,
+    name TEXT,
+    nickname TEXT,
+    email TEXT,
+    notes TEXT,
+    state_tax_indicator INTEGER,
+    created_at TIMESTAMP,
+    created_by UUID,
+    updated_at TIMESTAMP,
+    tenant_id UUID,
+    roles user_role_enum[],
+    max_privilege_level INTEGER
+)
+SET search_path = public, pg_temp AS $$
+DECLARE
+    v_token refresh_tokens%ROWTYPE;
+BEGIN
+    SELECT 
+        rt.* INTO v_token
+    FROM 
+        refresh_tokens rt
+    WHERE 
+        rt.id = p_token_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RETURN QUERY SELECT 'INVALID'::TEXT, NULL::UUID, NULL::UUID, NULL::TEXT, NULL::TEXT, NULL::TEXT, NULL::TEXT,
+            NULL::INTEGER, NULL::TIMESTAMP, NULL::UUID, NULL::TIMESTAMP, NULL::UUID, NULL::user_role_enum[], NULL::INTEGER;
+        RETURN;
+    END IF;
+
+    IF v_token.revoked OR v_token.expires_at < CURRENT_TIMESTAMP 
+       OR NOT EXISTS (SELECT 1 FROM users u WHERE u.id = v_token.user_id) THEN
+        -- Reuso de token revogado: possível roubo, derruba a família inteira
+        UPDATE 
+            refresh_tokens rt
+        SET 
+            revoked = TRUE,
+            revoked_at = CURRENT_TIMESTAMP
+        WHERE 
+            rt.family_id = v_token.family_id
+            AND rt.revoked = FALSE;
+
+        RETURN QUERY SELECT 'REVOKED'::TEXT, v_token.family_id, NULL::UUID, NULL::TEXT, NULL::TEXT, NULL::TEXT, NULL::TEXT,
+            NULL::INTEGER, NULL::TIMESTAMP, NULL::UUID, NULL::TIMESTAMP, NULL::UUID, NULL::user_role_enum[], NULL::INTEGER;
+        RETURN;
+    END IF;
+
+    INSERT INTO refresh_tokens (
+        id,
+        user_id,
+        expires_at,
+        revoked,
+        family_id
+    ) VALUES (
+        p_new_token_id,
+        v_token.user_id,
+        p_expires_at,
+        FALSE,
+        v_token.family_id
+    );
+
+    UPDATE 
+        refresh_tokens rt
+    SET 
+        revoked = TRUE,
+        revoked_at = CURRENT_TIMESTAMP,
+        replaced_by = p_new_token_id
+    WHERE 
+        rt.id = p_token_id;
+
+    RETURN QUERY
+    SELECT 
+        'OK'::TEXT,
+        v_token.family_id,
+        u.id,
+        u.name,
+        u.nickname,
+        u.email::TEXT,
+        u.notes,
+        u.state_tax_indicator,
+        u.created_at,
+        u.created_by,
+        u.updated_at,
+        u.tenant_id,
+        u.roles,
+        u.max_privilege_level
+    FROM 
+        users u
+    WHERE 
+        u.id = v_token.user_id;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+
+-- Reuso detectado pelo Redis antes de chegar ao banco: revoga a família.
+-- SECURITY DEFINER: o refresh roda sem contexto RLS (como o auth_rotate_refresh_token).
+CREATE OR REPLACE FUNCTION auth_revoke_token_family(
+    p_family_id UUID
+)
+RETURNS VOID
+SET search_path = public, pg_temp AS $$
+BEGIN
+    UPDATE 
+        refresh_tokens rt
+    SET 
+        revoked = TRUE,
+        revoked_at = CURRENT_TIMESTAMP
+    WHERE 
+        rt.family_id = p_family_id
+        AND rt.revoked = FALSE;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+
+-- Remove um lote de tokens expirados ou revogados há mais de p_revoked_grace.
+-- Cada lote segue a ordem do índice (expires_at / revoked_at) a partir da menor
+-- chave restante e pula linhas travadas por logins/refreshes em andamento,
+-- então nunca espera nem segura locks por muito tempo.
+-- O período de carência mantém tokens rotacionados por um tempo para que o
+-- reuso ainda seja detectado (e a família revogada) em auth_rotate_refresh_token.
+CREATE OR REPLACE FUNCTION purge_refresh_tokens_batch(
+    p_batch_size INTEGER DEFAULT 1000,
+    p_revoked_grace INTERVAL DEFAULT INTERVAL '1 day'
+)
+RETURNS INTEGER
+SET search_path = public, pg_temp AS $$
+DECLARE
+    v_deleted INTEGER;
+BEGIN
+    WITH expired AS (
+        SELECT 
+            rt.id 
+        FROM 
+            refresh_tokens rt
+        WHERE 
+            rt.expires_at < CURRENT_TIMESTAMP
+        ORDER BY 
+            rt.expires_at
+        LIMIT 
+            p_batch_size
+        FOR UPDATE SKIP LOCKED
+    ),
+    revoked AS (
+        SELECT 
+            rt.id 
+        FROM 
+            refresh_tokens rt
+        WHERE 
+            rt.revoked = TRUE
+            AND rt.revoked_at < CURRENT_TIMESTAMP - p_revoked_grace
+        ORDER BY 
+            rt.revoked_at
+        LIMIT 
+            p_batch_size
+        FOR UPDATE SKIP LOCKED
+    ),
+    deleted AS (
+        DELETE FROM 
+            refresh_tokens rt
+        WHERE 
+            rt.id IN (SELECT id FROM expired UNION SELECT id FROM revoked)
+        RETURNING 
+            1
+    )
+    SELECT COUNT(*) INTO v_deleted FROM deleted;
+
+    RETURN v_deleted;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Versão para pg_cron: COMMIT a cada lote e pausa entre lotes.
+-- Sem SET search_path: procedures com cláusula SET não podem executar COMMIT.
+CREATE OR REPLACE PROCEDURE purge_refresh_tokens(
+    p_batch_size INTEGER DEFAULT 1000,
+    p_revoked_grace INTERVAL DEFAULT INTERVAL '1 day',
+    p_pause_ms INTEGER DEFAULT 50,
+    p_max_batches INTEGER DEFAULT 1000
+)
+AS $$
+DECLARE
+    v_deleted INTEGER;
+    v_total BIGINT := 0;
+    v_batches INTEGER := 0;
+BEGIN
+    LOOP
+        v_deleted := public.purge_refresh_tokens_batch(p_batch_size, p_revoked_grace);
+        v_total := v_total + v_deleted;
+        v_batches := v_batches + 1;
+        COMMIT;
+
+        EXIT WHEN v_deleted = 0 OR v_batches >= p_max_batches;
+        PERFORM pg_sleep(p_pause_ms / 1000.0);
+    END LOOP;
+
+    RAISE NOTICE 'purge_refresh_tokens: % tokens removidos em % lotes', v_total, v_batches;
+END;
+$$ LANGUAGE plpgsql;
 
 
 -- SELECT cron.schedule(
---     'delete_revoked_tokens',
---     '0 6 * * 0',
---     $$DELETE FROM refresh_tokens WHERE revoked = TRUE$$
+--     'purge_refresh_tokens',
+--     '15 4 * * *',
+--     $$CALL purge_refresh_tokens()$$
 -- );
 -- SELECT * FROM cron.job;
 
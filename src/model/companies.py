@@ -1,7 +1,6 @@
 from asyncpg import Connection
 from src.schemas.companies import CompanyResponse, AddressSchema
 from typing import Optional
-import json
 
 
 CACHE_TTL_DAYS = 30
@@ -114,7 +113,7 @@ async def create_company(data: dict, raw_data: dict, conn: Connection) -> Compan
         data["state"],
         data["email"],
         data["phone"],
-        json.dumps(raw_data)
+        raw_data
     )
     
     return CompanyResponse(
@@ -10,14 +10,14 @@ from src.schemas.log import (
     LogStatusStat
 )
 from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from src.schemas.general import Pagination
 from src.monitor import get_monitor
 from src.db.db import db
+from src.db import rows as rows_util
 from asyncpg import Connection
 from datetime import datetime
 from typing import Literal, Optional
-import json
 import traceback
 
 
@@ -60,7 +60,7 @@ async def add_log_error(
                 method,
                 status_code,
                 stacktrace,
-                json.dumps(metadata)
+                metadata
             )        
     except Exception as e:
         print(
@@ -118,9 +118,9 @@ async def log_and_build_response(
     error_level: Literal['DEBUG', 'INFO', 'WARN', 'ERROR', 'FATAL'],
     status_code: int,
     detail: dict | str    
-) -> JSONResponse:
+) -> ORJSONResponse:
     await log_error(request, exc, error_level, status_code, detail)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status_code,
         content={
             "detail": str(detail),
@@ -161,12 +161,8 @@ async def get_logs(
         limit,
         offset
     )
-    return Pagination(
-        total=total,
-        limit=limit,
-        offset=offset,
-        results=[Log(**dict(i)) for i in rows]
-    )
+    results = [rows_util.from_row(Log, i, metadata=i["metadata"] or {}) for i in rows]
+    return rows_util.build_page(Log, results, total, limit, offset)
 
 
 async def delete_logs(interval_minutes: Optional[int], method: Optional[str], conn: Connection) -> DeletedLogs:
@@ -42,4 +42,24 @@ async def get_ncm_by_code(code: str, conn: Connection) -> NcmResponse:
         clean_code
     )
     
-    return NcmResponse(**dict(row)) if row else None
\ No newline at end of file
+    return NcmResponse(**dict(row)) if row else None
+
+
+async def get_ncms_by_codes(codes: list[str], conn: Connection) -> list[NcmResponse]:
+    rows = await conn.fetch(
+        """
+        SELECT 
+            code,
+            description,
+            federal_national_rate,
+            federal_import_rate,
+            state_rate,
+            municipal_rate
+        FROM 
+            fiscal_ncms 
+        WHERE 
+            code = ANY($1::TEXT[])
+        """,
+        codes
+    )
+    return [NcmResponse(**dict(row)) for row in rows]
@@ -1,107 +1,71 @@
-from src.schemas.token import RefreshTokenCreate, RefreshToken
-from asyncpg import Connection
+from src.schemas.token import RefreshTokenCreate
+from asyncpg import Connection, Record
+from typing import Optional
+from datetime import datetime, timedelta
 from uuid import UUID
 
 
-async def create_refresh_token(token: RefreshTokenCreate, conn: Connection) -> None:
-    await conn.execute(
-        """
-            INSERT INTO refresh_tokens (
-                id,
-                user_id,
-                expires_at,
-                revoked,
-                family_id                
-            )
-            VALUES
-                ($1, $2, $3, $4, $5)
-            RETURNING
-                id
-        """,
-        token.token_id,
-        token.user_id,
-        token.expires_at,
-        token.revoked,
-        token.family_id        
-    )
-    
-    
-async def invalidate_token(token_id: UUID, replaced_by: UUID, conn: Connection) -> None:
-    await conn.execute(
-        """
-            UPDATE 
-                refresh_tokens 
-            SET 
-                revoked = TRUE, 
-                replaced_by = $1
-            WHERE 
-                id = $2
-        """, 
-        replaced_by,
-        token_id
-    )
-    
-    
 async def revoke_token_family(family_id: UUID, conn: Connection):
+    # Função SECURITY DEFINER: o refresh não tem contexto RLS
     await conn.execute(
-        """
-            UPDATE 
-                refresh_tokens
-            SET
-                revoked = TRUE
-            WHERE
-                family_id = $1
-                AND revoked = FALSE
-        """,
+        "SELECT auth_revoke_token_family($1)",
         family_id
     )
     
-async def revoke_token_family_by_token_id(token_id: UUID, conn: Connection):    
-    await conn.execute(
-        """
-        UPDATE 
-            refresh_tokens
-        SET
-            revoked = TRUE
-        WHERE
-            family_id = (
-                SELECT 
-                    family_id 
-                FROM 
-                    refresh_tokens 
-                WHERE 
-                    id = $1
-            )
-            AND revoked = FALSE
-        """,
-        token_id
-    )
-    
 async def revoke_token_by_user_id(user_id: UUID, conn: Connection):    
     await conn.execute(
         """
         UPDATE 
             refresh_tokens
         SET
-            revoked = TRUE
+            revoked = TRUE,
+            revoked_at = CURRENT_TIMESTAMP
         WHERE
             user_id = $1
+            AND revoked = FALSE
         """,
         user_id
     )
     
     
-async def get_refresh_token_by_id(token_id: UUID | str, conn: Connection) -> RefreshToken:
-    row = await conn.fetchrow(
-        """
-            SELECT 
-                * 
-            FROM 
-                refresh_tokens 
-            WHERE 
-                id = $1
-        """,
-        token_id
+async def register_login(
+    token: RefreshTokenCreate,
+    old_token_id: Optional[UUID | str],
+    new_password_hash: Optional[str],
+    conn: Connection
+) -> None:
+    await conn.execute(
+        "SELECT auth_register_login($1, $2, $3, $4, $5, $6)",
+        token.user_id,
+        old_token_id,
+        token.token_id,
+        token.expires_at,
+        token.family_id,
+        new_password_hash
+    )
+
+
+async def rotate_refresh_token(
+    token_id: UUID | str,
+    new_token_id: UUID,
+    expires_at: datetime,
+    conn: Connection
+) -> Optional[Record]:
+    return await conn.fetchrow(
+        "SELECT * FROM auth_rotate_refresh_token($1, $2, $3)",
+        token_id,
+        new_token_id,
+        expires_at
+    )
+
+
+async def purge_refresh_tokens_batch(
+    batch_size: int,
+    revoked_grace: timedelta,
+    conn: Connection
+) -> int:
+    return await conn.fetchval(
+        "SELECT purge_refresh_tokens_batch($1, $2)",
+        batch_size,
+        revoked_grace
     )
-    
-    return RefreshToken(**dict(row)) if row else None
@@ -0,0 +1,78 @@
+from src.schemas.tenant import TenantCreate
+from src.schemas.user import UserResponse
+from asyncpg import Connection
+from typing import Optional
+from uuid import UUID
+
+
+async def create_tenant(tenant: TenantCreate, conn: Connection) -> Optional[UUID]:
+    return await conn.fetchval(
+        """
+            INSERT INTO tenants (
+                name, 
+                cnpj,
+                notes
+            )    
+            VALUES 
+                ($1, $2, $3)
+            RETURNING 
+                id
+        """,
+        tenant.tenant_name,
+        tenant.tenant_cnpj,
+        tenant.tenant_notes
+    )
+
+
+async def create_tenant_admin(
+    tenant: TenantCreate,
+    password_hash: str,
+    tenant_id: UUID,
+    conn: Connection
+) -> Optional[UserResponse]:
+    row = await conn.fetchrow(
+        """
+            INSERT INTO users (
+                name,
+                email,
+                password_hash,
+                phone,
+                cpf,
+                tenant_id,
+                roles,
+                is_active,
+                created_by
+            )
+            VALUES (
+                TRIM($1),
+                LOWER(TRIM($2)),
+                $3,
+                $4,
+                $5,
+                $6,
+                '{ADMIN}'::user_role_enum[],
+                TRUE,
+                NULL
+            )
+            RETURNING
+                id,
+                name,
+                tenant_id,
+                nickname,
+                email,
+                notes,
+                state_tax_indicator,
+                created_at,
+                updated_at,
+                created_by,
+                roles,
+                max_privilege_level
+        """,
+        tenant.name,
+        tenant.email,
+        password_hash,
+        tenant.phone,
+        tenant.cpf,
+        tenant_id
+    )
+    return UserResponse(**dict(row)) if row else None
@@ -3,6 +3,7 @@ from src.schemas.user import LoginData, UserResponse, UserCreate, UserManagement
 from src.schemas.auth import LoginRequest
 from asyncpg import Connection, Record
 from src.schemas.general import Pagination
+from src.db import rows as rows_util
 from typing import Optional
 from uuid import UUID
 
@@ -183,9 +184,174 @@ async def get_staff_members(conn: Connection, limit: int = 64, offset: int = 0)
         offset
     )
     
-    return Pagination(
-        total=total,
-        limit=limit,
-        offset=offset,
-        results=[UserResponse(**dict(row)) for row in rows]
-    )
\ No newline at end of file
+    return rows_util.build_page(UserResponse, rows_util.from_rows(UserResponse, rows), total, limit, offset)
+
+async def get_role_levels(conn: Connection) -> dict[str, int]:
+    rows = await conn.fetch("SELECT role_name::TEXT, level_weight FROM role_configs")
+    return {row["role_name"]: row["level_weight"] for row in rows}
+
+
+STAFF_IMPORT_COLUMNS = (
+    "row_no",
+    "id",
+    "name",
+    "nickname",
+    "email",
+    "notes",
+    "state_tax_indicator",
+    "password_hash",
+    "quick_access_pin_hash",
+    "phone",
+    "cpf",
+    "roles"
+)
+
+
+_STAFF_IMPORT_INSERT = """
+    INSERT INTO users (
+        id,
+        name,
+        nickname,
+        tenant_id,
+        email,
+        notes,
+        state_tax_indicator,
+        password_hash,
+        quick_access_pin_hash,
+        phone,
+        cpf,
+        roles,
+        created_by
+    )
+    SELECT
+        s.id,
+        s.name,
+        s.nickname,
+        $1,
+        s.email,
+        s.notes,
+        s.state_tax_indicator,
+        s.password_hash,
+        s.quick_access_pin_hash,
+        s.phone,
+        s.cpf,
+        s.roles::user_role_enum[],
+        $2
+    FROM
+        staff_import s
+    WHERE
+        {where}
+    ORDER BY
+        s.row_no
+    RETURNING
+        id,
+        name,
+        tenant_id,
+        nickname,
+        email,
+        notes,
+        state_tax_indicator,
+        created_at,
+        updated_at,
+        created_by,
+        roles,
+        max_privilege_level
+"""
+
+
+async def stage_staff_import(records: list[tuple], conn: Connection) -> None:
+    """
+    Carrega as linhas já validadas/hasheadas numa tabela temporária via COPY
+    (um único round trip, protocolo binário). A tabela some no fim da transação.
+    """
+    await conn.execute(
+        """
+            CREATE TEMP TABLE staff_import (
+                row_no INTEGER PRIMARY KEY,
+                id UUID NOT NULL,
+                name TEXT,
+                nickname TEXT,
+                email TEXT,
+                notes TEXT,
+                state_tax_indicator INTEGER,
+                password_hash TEXT,
+                quick_access_pin_hash TEXT,
+                phone TEXT,
+                cpf TEXT,
+                roles TEXT[]
+            ) ON COMMIT DROP
+        """
+    )
+    await conn.copy_records_to_table(
+        "staff_import",
+        records=records,
+        columns=STAFF_IMPORT_COLUMNS
+    )
+
+
+async def get_staff_import_conflicts(tenant_id: str | UUID, conn: Connection) -> list[Record]:
+    """Email/CPF já cadastrados no tenant ou repetidos dentro do próprio arquivo."""
+    return await conn.fetch(
+        """
+            SELECT
+                s.row_no,
+                'idx_users_email_unique' AS constraint_name
+            FROM
+                staff_import s
+            WHERE
+                s.email IS NOT NULL
+                AND (
+                    EXISTS (
+                        SELECT 1 FROM users u WHERE u.tenant_id = $1 AND u.email = s.email::CITEXT
+                    )
+                    OR EXISTS (
+                        SELECT 1 FROM staff_import d WHERE d.row_no < s.row_no AND d.email::CITEXT = s.email::CITEXT
+                    )
+                )
+            UNION ALL
+            SELECT
+                s.row_no,
+                'idx_users_cpf_unique' AS constraint_name
+            FROM
+                staff_import s
+            WHERE
+                s.cpf IS NOT NULL
+                AND (
+                    EXISTS (
+                        SELECT 1 FROM users u WHERE u.tenant_id = $1 AND u.cpf = s.cpf
+                    )
+                    OR EXISTS (
+                        SELECT 1 FROM staff_import d WHERE d.row_no < s.row_no AND d.cpf = s.cpf
+                    )
+                )
+        """,
+        tenant_id
+    )
+
+
+async def insert_staged_users(
+    tenant_id: str | UUID,
+    created_by: str | UUID,
+    skip_rows: list[int],
+    conn: Connection
+) -> list[Record]:
+    return await conn.fetch(
+        _STAFF_IMPORT_INSERT.format(where="NOT (s.row_no = ANY($3::INTEGER[]))"),
+        tenant_id,
+        created_by,
+        skip_rows
+    )
+
+
+async def insert_staged_user(
+    tenant_id: str | UUID,
+    created_by: str | UUID,
+    row_no: int,
+    conn: Connection
+) -> Optional[Record]:
+    return await conn.fetchrow(
+        _STAFF_IMPORT_INSERT.format(where="s.row_no = $3"),
+        tenant_id,
+        created_by,
+        row_no
+    )
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, status, Path
-from fastapi_limiter.depends import RateLimiter
+from src.services.rate_limiter import RateLimiter
 from src.schemas.address import AddressResponse, UserAddressCreate
 from src.schemas.rls import RLSConnection
 from src.model import address as address_model
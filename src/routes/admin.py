@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from fastapi.exceptions import HTTPException
 from src.services.admin_auth import AdminAPIKeyAuth
 from src.schemas.user import UserResponse
 from src.schemas.tenant import TenantCreate
-from src.db.db import get_db_cursor
-from src import security
-from psycopg import Cursor
-import psycopg
+from src.schemas.token import RefreshTokenPurgeResult
+from src.model import tenant as tenant_model
+from src.db.db import get_admin_transaction, get_admin_pool, db_safe_exec
+from src.services import password_hasher
+from src.services import token_cleanup
+from src.constants import Constants
+from datetime import timedelta
+from asyncpg import Connection, Pool
 
 
 api_key_auth = AdminAPIKeyAuth()
@@ -21,98 +25,44 @@ router = APIRouter(
 )
 
 
-@router.post("/tenant")
-async def create_tenant_admin(payload: TenantCreate, cur: Cursor = Depends(get_db_cursor)):
-    try:
-        
-        cur.execute(
-            """
-            INSERT INTO tenants (
-                name, 
-                cnpj,
-                notes
-            )    
-            VALUES (
-                %s, 
-                %s,
-                %s
-            ) 
-            RETURNING 
-                id
-            """,
-            (
-                payload.tenant_name,
-                payload.tenant_cnpj, 
-                payload.tenant_notes 
-            )
-        )
-        
-        tenant = cur.fetchone()
+@router.post("/tenant", response_model=UserResponse)
+async def create_tenant_admin(
+    payload: TenantCreate,
+    conn: Connection = Depends(get_admin_transaction)
+):
+    # argon2 é CPU-bound: roda fora do event loop
+    password_hash: str = await password_hasher.hash_password(payload.password)
     
-        if not tenant:
-            raise HTTPException(status_code=500, detail="Falha ao criar tenant")
+    tenant_id = await db_safe_exec(tenant_model.create_tenant(payload, conn))
+    
+    if not tenant_id:
+        raise HTTPException(status_code=500, detail="Falha ao criar tenant")
+    
+    user: UserResponse = await db_safe_exec(
+        tenant_model.create_tenant_admin(payload, password_hash, tenant_id, conn)
+    )
+    
+    if not user:
+        raise HTTPException(status_code=500, detail="Falha ao criar administrador do tenant")
+    
+    return user
+
 
-        tenant_id = tenant['id']
-        
-        cur.execute(
-            """
-            INSERT INTO users (
-                name,
-                email,
-                password_hash,
-                phone,
-                cpf,
-                tenant_id,
-                roles,
-                is_active,
-                created_by
-            )
-            VALUES (
-                TRIM(%s),
-                LOWER(TRIM(%s)),
-                %s,
-                %s,
-                %s,
-                %s,
-                '{ADMIN}'::user_role_enum[],
-                TRUE,
-                NULL
-            )
-            RETURNING
-                id,
-                name,
-                tenant_id,
-                nickname,
-                email,
-                notes,
-                state_tax_indicator,
-                created_at,
-                updated_at,
-                created_by,
-                roles;
-            """,
-            (
-                payload.name,
-                payload.email, 
-                security.hash_password(payload.password),
-                payload.phone,
-                payload.cpf,
-                tenant_id
-            )
-        )
-        row = cur.fetchone()
-        if not row:
-            raise ValueError("[ERRO] O banco não retornou o ID. Algo estranho aconteceu.")
-        
-        return UserResponse(**row)
-    except psycopg.errors.UniqueViolation:
-        print("[ERRO DE DUPLICIDADE] Já existe um usuário com este Email ou CPF neste Tenant.")
-        raise e
-    except psycopg.errors.ForeignKeyViolation:
-        print("[ERRO DE VÍNCULO] O Tenant ID informado não existe.")
-        raise e
-    except Exception as e:
-        print(f"[ERRO FATAL] {e}")
-        raise e
-            
-                
\ No newline at end of file
+@router.post(
+    "/maintenance/refresh-tokens/purge",
+    response_model=RefreshTokenPurgeResult,
+    summary="Limpar Refresh Tokens",
+    description="Remove, em lotes, refresh tokens expirados ou revogados há mais que o período de carência"
+)
+async def purge_refresh_tokens(
+    batch_size: int = Query(default=Constants.REFRESH_TOKEN_PURGE_BATCH_SIZE, ge=1, le=10_000),
+    revoked_grace_hours: int = Query(default=Constants.REFRESH_TOKEN_REVOKED_GRACE_HOURS, ge=0),
+    max_batches: int = Query(default=1000, ge=1),
+    pool: Pool = Depends(get_admin_pool)
+):
+    return await token_cleanup.purge_refresh_tokens(
+        pool,
+        batch_size=batch_size,
+        revoked_grace=timedelta(hours=revoked_grace_hours),
+        max_batches=max_batches
+    )
@@ -3,14 +3,14 @@ from fastapi import APIRouter, Depends, Query
 from fastapi.exceptions import HTTPException
 from datetime import datetime
 from fastapi.responses import StreamingResponse
-from src.security import get_rls_connection
+from src.security import get_rls_read_connection
+from src.db.query_stats import QueryBudget
 from src.schemas.rls import RLSConnection
 from asyncpg import Connection
 from uuid import UUID
 import orjson
 import csv
 import io
-import json
 
 
 router = APIRouter()
@@ -29,36 +29,30 @@ async def json_generator(sql: str, conn: Connection):
     
     is_first = True
         
-    async with conn.transaction():
-        async for row in conn.cursor(sql):                
-            if not is_first:
-                yield b","
-            else:
-                is_first = False            
+    # O cursor roda dentro da transação aberta por get_rls_read_connection
+    async for row in conn.cursor(sql):                
+        if not is_first:
+            yield b","
+        else:
+            is_first = False            
 
-            row_dict = dict(row)
-                        
-            if isinstance(row_dict.get('old_values'), str):
-                row_dict['old_values'] = orjson.loads(row_dict['old_values'])
-            
-            if isinstance(row_dict.get('new_values'), str):
-                row_dict['new_values'] = orjson.loads(row_dict['new_values'])
-            
-            chunk = orjson.dumps(row_dict, default=str)
-                        
-            yield chunk
+        # old_values/new_values já chegam como dict (codec jsonb do pool)
+        chunk = orjson.dumps(dict(row), default=fast_serializer)
+                    
+        yield chunk
         
     yield b"]"
         
 
 @router.get(
     "/logs",
-    summary="Recupera logs de auditoria dos últimos n dias"
+    summary="Recupera logs de auditoria dos últimos n dias",
+    dependencies=[Depends(QueryBudget(statement_timeout_ms=30000))]
 )
 async def get_audit_logs(
     format: Literal['csv', 'json'] = Query(default='json', description="Formato de saída: 'json' ou 'csv'"),
     days: int = Query(default=15, ge=1, le=365),
-    rls: RLSConnection = Depends(get_rls_connection)
+    rls: RLSConnection = Depends(get_rls_read_connection)
 ):
     if not isinstance(days, int):
         raise HTTPException(detail="Inválida configuração de dias.", status_code=422)
@@ -93,26 +87,25 @@ async def get_audit_logs(
             output.seek(0)
             output.truncate(0)
             
-            async with rls.conn.transaction():
-                async for row in rls.conn.cursor(sql):
-                    old_v = json.dumps(row['old_values'], ensure_ascii=False) if row['old_values'] else ""
-                    new_v = json.dumps(row['new_values'], ensure_ascii=False) if row['new_values'] else ""
-                    
-                    writer.writerow([
-                        row['id'],
-                        row['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
-                        str(row['user_id']) if row['user_id'] else "Sistema",
-                        row['operation'],
-                        row['table_name'],
-                        str(row['record_id']) if row['record_id'] else "",
-                        old_v,
-                        new_v
-                    ])
-                                        
-                    yield output.getvalue()
-                    output.seek(0)
-                    output.truncate(0)
-        
+            async for row in rls.conn.cursor(sql):
+                old_v = orjson.dumps(row['old_values']).decode() if row['old_values'] else ""
+                new_v = orjson.dumps(row['new_values']).decode() if row['new_values'] else ""
+                
+                writer.writerow([
+                    row['id'],
+                    row['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
+                    str(row['user_id']) if row['user_id'] else "Sistema",
+                    row['operation'],
+                    row['table_name'],
+                    str(row['record_id']) if row['record_id'] else "",
+                    old_v,
+                    new_v
+                ])
+                                    
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate(0)
+    
         filename = f"auditoria_usuarios_{datetime.now().strftime('%Y%m%d')}.csv"
         return StreamingResponse(
             csv_generator(),
@@ -1,14 +1,17 @@
 from fastapi import APIRouter, Depends, status, Response, Cookie
-from fastapi_limiter.depends import RateLimiter
-from src.security import get_postgres_connection, get_rls_connection
+from src.services.rate_limiter import RateLimiter
+from src.db.query_stats import QueryBudget
+from src.security import get_postgres_connection, get_rls_connection, get_access_token_data
 from src.schemas.tenant import TenantPublicInfo
 from src.schemas.auth import LoginRequest
 from src.schemas.user import UserResponse
 from src.schemas.rls import RLSConnection
-from src.model import user as user_model
+from src.schemas.token import DecodedAccessToken
 from src.services import auth as auth_service
+from src.services import user_profile_cache
 from typing import Optional
-from asyncpg import Connection
+from src.db.db import get_db_pool
+from asyncpg import Connection, Pool
 
 
 router = APIRouter(dependencies=[Depends(RateLimiter(times=16, seconds=60))])
@@ -19,19 +22,20 @@ router = APIRouter(dependencies=[Depends(RateLimiter(times=16, seconds=60))])
     status_code=status.HTTP_200_OK,
     response_model=UserResponse
 )
-async def get_me(rls: RLSConnection = Depends(get_rls_connection)):
-    return await user_model.get_user_by_id(rls.user.user_id, rls.conn)
+async def get_me(user: DecodedAccessToken = Depends(get_access_token_data)):
+    return await user_profile_cache.get_user_profile(user)
 
 
 @router.get("/resolve-store/{slug}", response_model=TenantPublicInfo)
-async def resolve_store_by_slug(slug: str, conn: Connection = Depends(get_postgres_connection)):
-    return await auth_service.resolve_tenant_slug(slug, conn)
+async def resolve_store_by_slug(slug: str, pool: Pool = Depends(get_db_pool)):
+    return await auth_service.resolve_tenant_slug(slug, pool)
 
 
 @router.post(
     "/login", 
     status_code=status.HTTP_200_OK, 
-    response_model=UserResponse
+    response_model=UserResponse,
+    dependencies=[Depends(QueryBudget(max_queries=3))]
 )
 async def login(
     login_req: LoginRequest,
@@ -45,7 +49,8 @@ async def login(
 @router.post(
     "/refresh",
     status_code=status.HTTP_200_OK, 
-    response_model=UserResponse
+    response_model=UserResponse,
+    dependencies=[Depends(QueryBudget(max_queries=2))]
 )
 async def refresh(
     response: Response,
@@ -1,11 +1,10 @@
 from fastapi import APIRouter, Depends, Path
-from fastapi_limiter.depends import RateLimiter
+from src.services.rate_limiter import RateLimiter
 from src.schemas.companies import CompanyResponse
-from src.security import get_postgres_connection
+from src.db.db import acquire_connection
 from src.services import companies as companies_service
 from src.services.redis_client import RedisService
 from src.util import remove_non_digits
-from asyncpg import Connection
 
 
 TTL = 3600 * 3
@@ -16,12 +15,18 @@ router = APIRouter(dependencies=[Depends(RateLimiter(times=32, seconds=60))])
 
 @router.get("/{cnpj:path}", response_model=CompanyResponse)
 async def get_company(    
-    cnpj: str = Path(..., title="CNPJ", description="CNPJ somente números"),
-    conn: Connection = Depends(get_postgres_connection)
+    cnpj: str = Path(..., title="CNPJ", description="CNPJ somente números")
 ) -> CompanyResponse:
+    # Conexão só em cache miss/atualização (que pode rodar após a resposta)
+    async def fetch_company() -> CompanyResponse:
+        async with acquire_connection() as conn:
+            return await companies_service.get_company(cnpj, conn)
+    
+    cnpj_digits = remove_non_digits(cnpj)
     return await RedisService.get_or_set_cache(
-        f"cnpjs:{remove_non_digits(cnpj)}", 
+        f"cnpjs:{cnpj_digits}", 
         CompanyResponse, 
-        lambda : companies_service.get_company(cnpj, conn),
-        ttl=TTL
+        fetch_company,
+        ttl=TTL,
+        tags=(f"cnpj:{cnpj_digits}",)
     )
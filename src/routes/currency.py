@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, status
-from fastapi_limiter.depends import RateLimiter
+from src.services.rate_limiter import RateLimiter
 from src.schemas.currency import Currency
 from src.security import get_postgres_connection
 from asyncpg import Connection
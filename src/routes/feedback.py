@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, status
-from fastapi_limiter.depends import RateLimiter
+from src.services.rate_limiter import RateLimiter
 from src.schemas.user_feedback import UserFeedbackCreate
 from asyncpg import Connection
 from src.model import user_feedback as user_feedback_model
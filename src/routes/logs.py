@@ -4,16 +4,23 @@ from typing import Optional, Literal
 from datetime import datetime
 from src.services.admin_auth import AdminAPIKeyAuth
 from src.model import log as log_model
-from src.security import get_postgres_connection
+from src.db.db import get_admin_connection
+from src.db.query_stats import QueryBudget
+from src.db.rows import ModelResponse
+from src.schemas.general import Pagination
+from src.schemas.log import Log
 from asyncpg import Connection
-import json
 
 
 api_key_auth = AdminAPIKeyAuth()
 
 
 router = APIRouter(
-    dependencies=[Depends(api_key_auth.verify_api_key)],
+    dependencies=[
+        Depends(api_key_auth.verify_api_key),
+        # Relatórios pesados: cancela no banco em vez de segurar a conexão até o command_timeout
+        Depends(QueryBudget(max_time_ms=5000, statement_timeout_ms=15000))
+    ],
     responses={
         401: {"description": "API Key não fornecida"},
         403: {"description": "API Key inválida"}
@@ -21,25 +28,23 @@ router = APIRouter(
 )
 
 @router.get("/db")
-async def get_db_info(conn: Connection = Depends(get_postgres_connection)):
-    raw_json = await conn.fetchval("SELECT get_database_health_check()")    
-    if raw_json:
-        return json.loads(raw_json)
-    return {}
+async def get_db_info(conn: Connection = Depends(get_admin_connection)):
+    return await conn.fetchval("SELECT get_database_health_check()") or {}
 
 
 @router.get(
     "/",
     summary="Listar Logs",
-    description="Retorna logs paginados do sistema"
+    description="Retorna logs paginados do sistema",
+    response_model=Pagination[Log]
 )
 async def list_logs(
     limit: int = Query(default=64, ge=0, le=64),
     offset: int = Query(default=0, ge=0),
-    conn = Depends(get_postgres_connection)
+    conn = Depends(get_admin_connection)
 ):    
     try:
-        return await log_model.get_logs(limit, offset, conn)
+        return ModelResponse(await log_model.get_logs(limit, offset, conn))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -61,7 +66,7 @@ async def search_logs(
     date_to: Optional[datetime] = Query(None, description="Data final (ISO format)"),
     limit: int = Query(default=64, ge=0, le=64),
     offset: int = Query(default=0, ge=0),
-    conn = Depends(get_postgres_connection)
+    conn = Depends(get_admin_connection)
 ):    
     query_parts = ["SELECT id, level, message, path, method, status_code, stacktrace, metadata, created_at FROM logs WHERE TRUE"]
     params = []
@@ -142,7 +147,7 @@ async def search_logs(
     description="Retorna estatísticas agregadas dos logs"
 )
 async def get_logs_statistics(
-    conn = Depends(get_postgres_connection)    
+    conn = Depends(get_admin_connection)    
 ):
     try:
         stats = await log_model.get_log_stats(conn)
@@ -160,7 +165,7 @@ async def get_logs_statistics(
     description="Resumo executivo das estatísticas de logs"
 )
 async def get_logs_overview(
-    conn = Depends(get_postgres_connection)    
+    conn = Depends(get_admin_connection)    
 ):
     """Overview rápido para dashboards"""
     try:
@@ -231,7 +236,7 @@ async def get_logs_overview(
 async def get_logs_timeline(
     period: str = Query("hour", regex="^(hour|day|week)$", description="Período de agregação"),
     hours: int = Query(24, ge=1, le=168, description="Últimas N horas (máx: 168 = 7 dias)"),
-    conn = Depends(get_postgres_connection)
+    conn = Depends(get_admin_connection)
 ):
     """
     Timeline de logs agregados
@@ -309,7 +314,7 @@ async def remove_logs(
         False,
         description="Confirmação obrigatória para deletar"
     ),
-    conn = Depends(get_postgres_connection)    
+    conn = Depends(get_admin_connection)    
 ):
     """
     Deleta logs com base em filtros
@@ -383,7 +388,7 @@ async def remove_logs(
 async def cleanup_old_logs(
     days: int = Query(default=15, ge=1, le=365, description="Manter logs dos últimos N dias"),
     confirm: bool = Query(False, description="Confirmação obrigatória"),
-    conn = Depends(get_postgres_connection)    
+    conn = Depends(get_admin_connection)    
 ):
     """
     Limpeza automática de logs antigos
@@ -427,7 +432,7 @@ async def cleanup_old_logs(
 )
 async def vacuum_logs_table(
     full: bool = Query(False, description="VACUUM FULL (mais lento mas mais efetivo)"),
-    conn = Depends(get_postgres_connection)    
+    conn = Depends(get_admin_connection)    
 ):
     """
     Otimiza a tabela de logs no PostgreSQL
@@ -477,7 +482,7 @@ async def export_logs(
     level: Optional[str] = Query(None, description="Filtrar por nível"),
     date_from: Optional[datetime] = Query(None, description="Data inicial"),
     date_to: Optional[datetime] = Query(None, description="Data final"),
-    conn = Depends(get_postgres_connection)    
+    conn = Depends(get_admin_connection)    
 ):
     """
     Exporta logs filtrados
@@ -507,8 +512,8 @@ async def export_logs(
         rows = await conn.fetch(query, *params)
         
         if format == "json":
-            from fastapi.responses import JSONResponse
-            return JSONResponse(
+            from fastapi.responses import ORJSONResponse
+            return ORJSONResponse(
                 content={
                     "exported_at": datetime.utcnow().isoformat(),
                     "count": len(rows),
@@ -517,15 +522,20 @@ async def export_logs(
             )
         else:  # csv
             import csv
+            import orjson
             from io import StringIO
             from fastapi.responses import StreamingResponse
-            
+
             output = StringIO()
             if rows:
                 writer = csv.DictWriter(output, fieldnames=rows[0].keys())
                 writer.writeheader()
                 for row in rows:
-                    writer.writerow(dict(row))
+                    # jsonb (metadata) chega como dict: grava JSON, não o repr do Python
+                    writer.writerow({
+                        k: orjson.dumps(v).decode() if isinstance(v, (dict, list)) else v
+                        for k, v in row.items()
+                    })
             
             output.seek(0)
             return StreamingResponse(
@@ -552,7 +562,7 @@ async def view_logs_html(
     offset: int = Query(default=0, ge=0, description="Offset para paginação"),
     level: Optional[Literal['DEBUG', 'INFO', 'WARN', 'ERROR', 'FATAL']] = Query(default=None, description="Filtrar por nível"),
     method: Optional[Literal['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS']] = Query(default=None, description="Filtrar por método HTTP"),
-    conn = Depends(get_postgres_connection)
+    conn = Depends(get_admin_connection)
 ):
     try:
         query = """
@@ -1178,7 +1188,7 @@ def generate_logs_html(rows, total: int, limit: int, offset: int, level: Optiona
 )
 async def get_log_by_id(
     log_id: int,
-    conn = Depends(get_postgres_connection)    
+    conn = Depends(get_admin_connection)    
 ):
     try:
         row = await conn.fetchrow(
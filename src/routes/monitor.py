@@ -1,7 +1,15 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from typing import Optional, Literal
 from src.services.admin_auth import AdminAPIKeyAuth
 from src.monitor import get_monitor
+from src.db import query_stats
+from src.db.listener import listener as invalidation_listener
+from src.services.password_hasher import password_hasher
+from src.services import local_cache
+from src.services import ncm_index
+from src.services import rate_limiter
+from src.services.redis_client import RedisService
+from src.services.cache_metrics import cache_metrics
 
 
 api_key_auth = AdminAPIKeyAuth()
@@ -229,6 +237,78 @@ async def get_peak_values():
     }
 
 
+@router.get(
+    "/db",
+    summary="Orçamento de Queries",
+    description="Queries por requisição, violações de orçamento e suspeitas de N+1 por rota"
+)
+async def get_db_query_stats():
+    return query_stats.metrics.snapshot()
+
+
+@router.get(
+    "/hasher",
+    summary="Pool de Hash de Senhas",
+    description="Workers argon2 ocupados, profundidade da fila e tempos médios de espera/execução"
+)
+async def get_password_hasher_stats():
+    return password_hasher.get_stats()
+
+
+@router.get(
+    "/local-cache",
+    summary="Caches em Memória",
+    description="Tamanho, hit rate, evicções e expirações de cada cache local do processo"
+)
+async def get_local_cache_stats():
+    return local_cache.get_all_stats()
+
+
+@router.get(
+    "/cache",
+    summary="Cache em Dois Níveis",
+    description="Hit rate do L1 (memória do worker) e do L2 (Redis) do get_or_set_cache, bytes e entradas do L1, e hits/misses/erros/latência da origem/tamanho por prefixo de chave"
+)
+async def get_cache_stats():
+    return RedisService.get_cache_stats()
+
+
+@router.get(
+    "/cache/hot-keys",
+    summary="Chaves Quentes do Cache",
+    description="Chaves mais acessadas do get_or_set_cache neste worker, estimadas por amostragem"
+)
+async def get_cache_hot_keys(limit: int = Query(default=20, ge=1, le=200)):
+    return cache_metrics.hot_keys(limit)
+
+
+@router.get(
+    "/cache-invalidation",
+    summary="Invalidação de Caches",
+    description="Estado do LISTEN cache_invalidation deste worker: conexão, notificações e reconexões"
+)
+async def get_cache_invalidation_stats():
+    return invalidation_listener.get_stats()
+
+
+@router.get(
+    "/ncm-index",
+    summary="Índice de NCM",
+    description="Linhas e lexemas do índice de NCM em memória, última carga, recargas e cache de buscas"
+)
+async def get_ncm_index_stats():
+    return ncm_index.get_stats()
+
+
+@router.get(
+    "/rate-limit",
+    summary="Rate Limiter",
+    description="Chaves ativas, verificações, rejeições e sincronizações com o Redis deste worker"
+)
+async def get_rate_limit_stats():
+    return rate_limiter.backend.get_stats()
+
+
 @router.post(
     "/reset",
     summary="Resetar Contadores",
@@ -238,11 +318,13 @@ async def reset_counters():
     """Reset de contadores"""
     monitor = get_monitor()
     monitor.reset_counters()
+    query_stats.metrics.reset()
+    RedisService.reset_cache_stats()
     
     return {
         "status": "success",
         "message": "Contadores resetados com sucesso",
-        "reset_items": ["request_count", "error_count", "peak_memory", "peak_cpu"]
+        "reset_items": ["request_count", "error_count", "peak_memory", "peak_cpu", "db_query_stats", "cache_stats"]
     }
 
 
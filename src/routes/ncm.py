@@ -1,10 +1,8 @@
 from fastapi import Depends, Query, APIRouter, status, Path
-from fastapi_limiter.depends import RateLimiter
-from src.security import get_postgres_connection
-from src.schemas.ncm import NcmResponse
+from src.services.rate_limiter import RateLimiter
+from src.schemas.ncm import NcmResponse, NcmLookupRequest, NcmLookupResponse
 from src.schemas.general import Pagination
 from src.services import ncm as ncm_service
-from asyncpg import Connection
 from typing import Optional
 
 
@@ -19,15 +17,23 @@ router = APIRouter(dependencies=[Depends(RateLimiter(times=32, seconds=60))])
 async def search_ncms(
     q: Optional[str] = Query(None, description="Busca por Código ou Descrição (ex: 'Cerveja' ou '2203')"),
     limit: int = Query(default=64, ge=0, le=64),
-    offset: int = Query(default=0, ge=0),
-    conn: Connection = Depends(get_postgres_connection)
+    offset: int = Query(default=0, ge=0)
 ):
-    return await ncm_service.search_ncm(q, limit, offset, conn)
+    return await ncm_service.search_ncm(q, limit, offset)
+
+
+@router.post(
+    "/lookup",
+    status_code=status.HTTP_200_OK,
+    response_model=NcmLookupResponse
+)
+async def lookup_ncms(payload: NcmLookupRequest):
+    """Alíquotas de vários NCMs de uma vez (importação de catálogo/NF-e)."""
+    return await ncm_service.lookup_ncms(payload.codes)
 
 
 @router.get("/{code}", response_model=NcmResponse)
 async def get_ncm_by_code(
-    code: str = Path(..., description="Código NCM (apenas números)"),
-    conn: Connection = Depends(get_postgres_connection)
+    code: str = Path(..., description="Código NCM (apenas números)")
 ):
-    return await ncm_service.get_ncm_by_code(code, conn)
\ No newline at end of file
+    return await ncm_service.get_ncm_by_code(code)
\ No newline at end of file
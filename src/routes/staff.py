@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, status, Query
-from fastapi_limiter.depends import RateLimiter
-from src.schemas.user import UserResponse, UserCreate, UserUpdate
+from fastapi import APIRouter, Depends, status, Query, Body, UploadFile, File
+from src.services.rate_limiter import RateLimiter
+from src.schemas.user import UserResponse, UserCreate, UserUpdate, StaffImportResult
 from src.schemas.rls import RLSConnection
+from src.schemas.token import DecodedAccessToken
 from src.schemas.general import Pagination
-from src.security import get_rls_connection
+from src.security import get_rls_connection, get_rls_read_connection, get_access_token_data
+from src.db.db import get_db_pool
+from asyncpg import Pool
+from src.db.rows import ModelResponse
 from src.model import user as user_model
 from src.services import auth as auth_service
 from src.services import staff as staff_service
@@ -24,6 +28,35 @@ async def register_user(
     return await auth_service.signup(payload, rls)
 
 
+@router.post(
+    "/users/bulk",
+    status_code=status.HTTP_200_OK,
+    response_model=StaffImportResult,
+    dependencies=[Depends(RateLimiter(times=4, minutes=1))]
+)
+async def bulk_import_users(
+    payload: list[dict] = Body(...),
+    user: DecodedAccessToken = Depends(get_access_token_data),
+    pool: Pool = Depends(get_db_pool)
+):
+    return await staff_service.bulk_import_users(payload, user, pool)
+
+
+@router.post(
+    "/users/bulk/csv",
+    status_code=status.HTTP_200_OK,
+    response_model=StaffImportResult,
+    dependencies=[Depends(RateLimiter(times=4, minutes=1))]
+)
+async def bulk_import_users_csv(
+    file: UploadFile = File(...),
+    user: DecodedAccessToken = Depends(get_access_token_data),
+    pool: Pool = Depends(get_db_pool)
+):
+    items = staff_service.parse_staff_csv(await file.read())
+    return await staff_service.bulk_import_users(items, user, pool)
+
+
 @router.patch("/users", response_model=UserResponse)
 async def update_user(
     payload: UserUpdate,
@@ -40,7 +73,7 @@ async def update_user(
 async def staff_members(
     limit: int = Query(default=64, ge=0, le=64),
     offset: int = Query(default=0, ge=0),
-    rls: RLSConnection = Depends(get_rls_connection)
+    rls: RLSConnection = Depends(get_rls_read_connection)
 ):
-    return await user_model.get_staff_members(rls.conn, limit, offset)
+    return ModelResponse(await user_model.get_staff_members(rls.conn, limit, offset))
 
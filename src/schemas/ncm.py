@@ -1,4 +1,6 @@
 from pydantic import BaseModel, Field
+from src.constants import Constants
+from typing import Dict, List
 
 class NcmResponse(BaseModel):
     
@@ -10,4 +12,20 @@ class NcmResponse(BaseModel):
     municipal_rate: float
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class NcmLookupRequest(BaseModel):
+    
+    codes: List[str] = Field(
+        ..., 
+        min_length=1, 
+        max_length=Constants.NCM_LOOKUP_MAX_CODES,
+        description="Códigos NCM (com ou sem pontos)"
+    )
+
+
+class NcmLookupResponse(BaseModel):
+    
+    results: Dict[str, NcmResponse] = Field(..., description="NCMs encontrados, pelo código como enviado")
+    missing: List[str] = Field(..., description="Códigos enviados que não existem na tabela")
@@ -14,6 +14,12 @@ class TenantPublicInfo(BaseModel):
     created_at: datetime
     
 
+class TenantSlugLookup(BaseModel):
+    """Resultado em cache da resolução de slug; tenant None = slug inexistente."""
+    
+    tenant: Optional[TenantPublicInfo] = None
+    
+
 class TenantCreate(BaseModel):
     
     tenant_name: str
@@ -13,6 +13,7 @@ class Token(BaseModel):
 class DecodedRefreshToken(BaseModel):
     
     token_id: str
+    family_id: Optional[str] = None
     
     
 class DecodedAccessToken(BaseModel):
@@ -57,4 +58,10 @@ class SessionToken(BaseModel):
     
     refresh_token: str
     refresh_token_expires_at: datetime
-    
\ No newline at end of file
+
+
+class RefreshTokenPurgeResult(BaseModel):
+    
+    deleted: int
+    batches: int
+    elapsed_ms: float
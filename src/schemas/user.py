@@ -260,4 +260,16 @@ class UserManagementContext(BaseModel):
     
     # --- Contexto do ALVO (Quem está sendo editado - Opcional se for criação) ---
     target_tenant_id: Optional[UUID] = None
-    target_privilege_level: Optional[int] = None
\ No newline at end of file
+    target_privilege_level: Optional[int] = None
+
+class StaffImportError(BaseModel):
+    
+    row: int = Field(..., description="Posição da linha no arquivo/array (1 = primeira)")
+    detail: str | list
+
+
+class StaffImportResult(BaseModel):
+    
+    total: int
+    created: List[UserResponse]
+    errors: List[StaffImportError]
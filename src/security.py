@@ -7,9 +7,12 @@ from src.constants import Constants
 from passlib.context import CryptContext
 from src.exceptions import DatabaseError
 from typing import Optional
+from contextlib import asynccontextmanager
 from asyncpg import Pool
 from src.model import user as user_model
 from src.db.db import get_db_pool
+from src.db import query_stats
+from src.services.local_cache import LocalCache
 from src import util
 import hashlib
 import uuid
@@ -18,7 +21,10 @@ import jwt
 
 pwd_context = CryptContext(
     schemes=["argon2"],     
-    deprecated="auto"
+    deprecated="auto",
+    argon2__rounds=Constants.ARGON2_TIME_COST,
+    argon2__memory_cost=Constants.ARGON2_MEMORY_COST_KIB,
+    argon2__parallelism=Constants.ARGON2_PARALLELISM
 )
 
 
@@ -60,6 +66,17 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         return pwd_context.verify(plain_password, hashed_password)
     except Exception:
         return False
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """
+    Verifica a senha e, se o hash foi gerado com parâmetros diferentes dos
+    atuais (needs_update), devolve um novo hash com os parâmetros atuais.
+    """
+    try:
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    except Exception:
+        return False, None
     
 
 def create_access_token(
@@ -87,40 +104,63 @@ def create_access_token(
     )
 
 
-def create_refresh_token(
-    user_id: uuid.UUID,
-    family_id: Optional[uuid.UUID] = None  
-) -> RefreshTokenCreate:
-    token_id = uuid.uuid4()
-    expires_at = datetime.now(timezone.utc) + timedelta(days=Constants.REFRESH_TOKEN_EXPIRE_DAYS)
-    
+def encode_refresh_token(token_id: uuid.UUID, expires_at: datetime, family_id: uuid.UUID) -> str:
     payload = {
         "sub": str(token_id),
+        "fam": str(family_id),
         "exp": expires_at,
         "type": "refresh"
     }
     
-    jwt_token: str = jwt.encode(
+    return jwt.encode(
         payload,
         Constants.SECRET_KEY,
         algorithm=Constants.ALGORITHM
     )
+
+
+def refresh_token_expiration() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(days=Constants.REFRESH_TOKEN_EXPIRE_DAYS)
+
+
+def create_refresh_token(
+    user_id: uuid.UUID,
+    family_id: Optional[uuid.UUID] = None  
+) -> RefreshTokenCreate:
+    token_id = uuid.uuid4()
+    expires_at = refresh_token_expiration()
+    family_id = family_id or uuid.uuid4()
     
     return RefreshTokenCreate(
         user_id=user_id,
         token_id=token_id,
         expires_at=expires_at,
-        family_id=uuid.uuid4() if not family_id else family_id,
+        family_id=family_id,
         revoked=False,
         replaced_by=None,
-        jwt_token=jwt_token
+        jwt_token=encode_refresh_token(token_id, expires_at, family_id)
     )
 
 
-def decode_access_token(access_token: str) -> DecodedAccessToken:
-    if not access_token:
-        raise CREDENTIALS_EXCEPTION
-        
+# Cache de tokens já verificados. A chave é um digest do token com chave
+# derivada do segredo/algoritmo atuais: após uma rotação de SECRET_KEY as
+# entradas antigas simplesmente deixam de ser encontradas.
+_access_token_cache: LocalCache[DecodedAccessToken] = LocalCache(
+    "access_tokens",
+    max_entries=Constants.ACCESS_TOKEN_CACHE_SIZE
+)
+
+
+def _access_token_cache_key(access_token: str) -> bytes:
+    signing_key = f"{Constants.ALGORITHM}:{Constants.SECRET_KEY}".encode()
+    return hashlib.blake2b(
+        access_token.encode(),
+        digest_size=16,
+        key=hashlib.blake2b(signing_key, digest_size=32).digest()
+    ).digest()
+
+
+def _decode_access_token_uncached(access_token: str) -> tuple[DecodedAccessToken, int]:
     try:
         jwt_payload = jwt.decode(
             access_token,
@@ -137,15 +177,31 @@ def decode_access_token(access_token: str) -> DecodedAccessToken:
         if not user_id or not tenant_id:
             raise CREDENTIALS_EXCEPTION
         
-        return DecodedAccessToken(
+        decoded = DecodedAccessToken(
             user_id=user_id,
             tenant_id=tenant_id
         )
+        return decoded, jwt_payload["exp"]
         
     except Exception:
         raise CREDENTIALS_EXCEPTION
 
 
+def decode_access_token(access_token: str) -> DecodedAccessToken:
+    if not access_token:
+        raise CREDENTIALS_EXCEPTION
+    
+    cache_key = _access_token_cache_key(access_token)
+    decoded = _access_token_cache.get(cache_key)
+    if decoded is not None:
+        return decoded
+    
+    # Só tokens válidos entram no cache, e expiram junto com o próprio exp
+    decoded, exp = _decode_access_token_uncached(access_token)
+    _access_token_cache.set(cache_key, decoded, expires_at=exp)
+    return decoded
+
+
 def decode_refresh_token(refresh_token: Optional[str]) -> DecodedRefreshToken:
     if not refresh_token: 
         raise CREDENTIALS_EXCEPTION
@@ -161,37 +217,94 @@ def decode_refresh_token(refresh_token: Optional[str]) -> DecodedRefreshToken:
         if not token_id or jwt_payload.get("type") != "refresh":
             raise CREDENTIALS_EXCEPTION        
         
-        return DecodedRefreshToken(token_id=token_id)
+        # "fam" só existe nos tokens emitidos com o cache de famílias no Redis
+        return DecodedRefreshToken(token_id=token_id, family_id=jwt_payload.get("fam"))
     except Exception:
         raise CREDENTIALS_EXCEPTION
     
 
+def _rls_context_sql(data: DecodedAccessToken, read_only: bool) -> str:
+    # Os ids vêm do JWT já validados como UUID, então podem ir inline sem risco
+    # de injeção. Sem parâmetros, o asyncpg envia tudo em uma única mensagem
+    # (simple query): BEGIN + set_config custam um round trip só.
+    user_id = uuid.UUID(str(data.user_id))
+    tenant_id = uuid.UUID(str(data.tenant_id))
+    begin = "BEGIN READ ONLY" if read_only else "BEGIN"
+    sql = (
+        f"{begin}; "
+        f"SELECT set_config('app.current_user_id', '{user_id}', true), "
+        f"set_config('app.current_user_tenant_id', '{tenant_id}', true)"
+    )
+    # statement_timeout da rota vai na mesma mensagem, restrito à transação
+    timeout_sql = query_stats.statement_timeout_sql()
+    if timeout_sql:
+        sql += f"; {timeout_sql}"
+    return sql
+
+
+@asynccontextmanager
+async def _open_rls_connection(pool: Pool, data: DecodedAccessToken, read_only: bool):
+    async with pool.acquire() as connection:
+        try:
+            await connection.execute(_rls_context_sql(data, read_only))
+        except Exception as e:
+            print(f"[CRITICAL] Erro ao configurar sessão RLS: {e}")
+            if connection.is_in_transaction():
+                await connection.execute("ROLLBACK")
+            raise DatabaseError(code=500, detail="Security context failure.")
+
+        # A transação é aberta manualmente, então as rotas não devem usar
+        # connection.transaction() por cima dela (o asyncpg recusa).
+        try:
+            yield RLSConnection(data, connection)
+        except BaseException:
+            if not connection.is_closed() and connection.is_in_transaction():
+                await connection.execute("ROLLBACK")
+            raise
+        else:
+            # Leitura não tem o que confirmar: ROLLBACK encerra sem custo de commit
+            await connection.execute("ROLLBACK" if read_only else "COMMIT")
+
+
+def open_rls_read_connection(pool: Pool, data: DecodedAccessToken):
+    """Para serviços que só precisam do banco em parte das chamadas (ex.: cache miss)."""
+    return _open_rls_connection(pool, data, read_only=True)
+
+
+def open_rls_write_connection(pool: Pool, data: DecodedAccessToken):
+    return _open_rls_connection(pool, data, read_only=False)
+
+
+def get_access_token_data(access_token: Optional[str] = Cookie(default=None)) -> DecodedAccessToken:
+    """Identifica o usuário pelo access token, sem adquirir conexão."""
+    return decode_access_token(access_token)
+
+
 async def get_rls_connection(
     pool: Pool = Depends(get_db_pool),
     access_token: Optional[str] = Cookie(default=None)
 ):
     data: DecodedAccessToken = decode_access_token(access_token)
-    async with pool.acquire() as connection:
-        async with connection.transaction():
-            try:
-                await connection.execute(
-                    """
-                    SELECT set_config('app.current_user_id', $1::text, true),
-                           set_config('app.current_user_tenant_id', $2::text, true)
-                    """,
-                    str(data.user_id),
-                    str(data.tenant_id)
-                )
-            except Exception as e:
-                print(f"[CRITICAL] Erro ao configurar sessão RLS: {e}")
-                raise DatabaseError(code=500, detail="Security context failure.")
-            
-            yield RLSConnection(data, connection)
+    async with _open_rls_connection(pool, data, read_only=False) as rls:
+        yield rls
+
+
+async def get_rls_read_connection(
+    pool: Pool = Depends(get_db_pool),
+    access_token: Optional[str] = Cookie(default=None)
+):
+    """
+    Variante somente leitura: mesma garantia de RLS (set_config local à
+    transação), mas em BEGIN READ ONLY, encerrada com ROLLBACK.
+    """
+    data: DecodedAccessToken = decode_access_token(access_token)
+    async with _open_rls_connection(pool, data, read_only=True) as rls:
+        yield rls
 
 
 async def get_postgres_connection(pool: Pool = Depends(get_db_pool)):
     async with pool.acquire() as connection:
-        yield connection
+        yield query_stats.with_statement_timeout(connection)
 
 
 def set_session_token_cookie(
@@ -2,17 +2,23 @@ from fastapi import status, Response
 from fastapi.exceptions import HTTPException
 from src.schemas.auth import LoginRequest
 from src.schemas.tenant import TenantPublicInfo
-from src.schemas.token import RefreshToken, AccessTokenCreate, RefreshTokenCreate, DecodedAccessToken
+from src.schemas.token import AccessTokenCreate, RefreshTokenCreate, DecodedAccessToken, DecodedRefreshToken
 from src.schemas.user import LoginData, UserResponse, UserCreate, UserManagementContext
 from src.schemas.rls import RLSConnection
 from src.model import user as user_model
 from src.model import refresh_token as refresh_token_model
-from src.db.db import db_safe_exec, db
+from src.db.db import db_safe_exec
+from src.db import rows as rows_util
+from src.db import query_stats
 from src.constants import Constants
-from datetime import datetime, timezone
 from typing import Optional
-from asyncpg import Connection
+from asyncpg import Connection, Pool
 from src import security
+from src.services import password_hasher
+from src.services import user_profile_cache
+from src.services import tenant_slug_cache
+from src.services.redis_client import RedisService
+import uuid
 
 
 INVALID_CREDENTIALS = HTTPException(
@@ -27,94 +33,31 @@ INVALID_REFRESH_TOKEN = HTTPException(
 )
 
 
-async def resolve_tenant_slug(slug: str, conn: Connection):
-    row = await conn.fetchrow(
-        "SELECT * FROM public_resolve_tenant_by_slug($1)",
-        slug
-    )
+async def resolve_tenant_slug(slug: str, pool: Pool) -> TenantPublicInfo:
+    async def fetch_tenant() -> Optional[TenantPublicInfo]:
+        # Só em cache miss: o caminho normal não adquire conexão
+        async with pool.acquire() as conn:
+            row = await query_stats.with_statement_timeout(conn).fetchrow(
+                "SELECT * FROM public_resolve_tenant_by_slug($1)",
+                slug
+            )
+        return TenantPublicInfo(**row) if row else None
     
-    if not row:
+    tenant = await tenant_slug_cache.get_tenant_by_slug(slug, fetch_tenant)
+    
+    if not tenant:
         raise HTTPException(404, "Loja não encontrada. Verifique o código.")
         
-    return TenantPublicInfo(**row)
-
-
-async def revoke_refresh_tokens(refresh_token: Optional[str], conn: Connection):
-    if refresh_token:
-        decoded = security.decode_refresh_token(refresh_token)
-        await refresh_token_model.revoke_token_family_by_token_id(
-            decoded.token_id,
-            conn
-        )
-
-async def process_login_transaction(
-    user_data: LoginData,
-    refresh_token_create: RefreshTokenCreate,
-    old_refresh_token_str: Optional[str],
-    conn: Connection
-):
-    old_token_id = None
-    if old_refresh_token_str:
-        try:
-            decoded = security.decode_refresh_token(old_refresh_token_str)
-            old_token_id = decoded.token_id
-        except Exception:
-            pass
-        
-    await conn.execute(
-        """
-        -- [Passo 1] Configura Sessão (Para RLS funcionar nos passos seguintes)
-        SELECT set_config('app.current_user_id', $1::text, true);
-        SELECT set_config('app.current_user_tenant_id', $2::text, true);
-
-        -- [Passo 2] Revoga Família de Tokens Antiga        
-        UPDATE 
-            refresh_tokens
-        SET 
-            revoked = TRUE
-        WHERE 
-            $3::uuid IS NOT NULL
-            AND family_id = (
-                SELECT 
-                    family_id 
-                FROM 
-                    refresh_tokens 
-                WHERE 
-                    id = $3::uuid
-            )
-            AND revoked = FALSE;
+    return tenant
 
-        -- [Passo 3] Atualiza Último Login
-        UPDATE 
-            users 
-        SET 
-            last_login_at = CURRENT_TIMESTAMP 
-        WHERE 
-            id = $1::uuid;
 
-        -- [Passo 4] Insere Novo Token
-        INSERT INTO refresh_tokens (
-            id,
-            user_id,
-            expires_at,
-            revoked,
-            family_id
-        ) VALUES (
-            $4::uuid, -- id do novo token
-            $1::uuid, -- user_id
-            $5,       -- expires_at
-            $6,       -- revoked
-            $7::uuid  -- family_id
-        );
-        """,
-        user_data.id,
-        user_data.tenant_id,
-        old_token_id,
-        refresh_token_create.token_id,
-        refresh_token_create.expires_at,
-        refresh_token_create.revoked,
-        refresh_token_create.family_id
-    )
+def _decode_old_refresh_token(old_refresh_token_str: Optional[str]) -> Optional[DecodedRefreshToken]:
+    if not old_refresh_token_str:
+        return None
+    try:
+        return security.decode_refresh_token(old_refresh_token_str)
+    except Exception:
+        return None
     
     
 async def login(
@@ -134,7 +77,12 @@ async def login(
             detail="Acesso não permitido."
         )
         
-    if not security.verify_password(login_req.password, data.password_hash):
+    # new_password_hash != None: hash antigo (parâmetros argon2 mudaram), regravado no register_login
+    verified, new_password_hash = await password_hasher.verify_and_update_password(
+        login_req.password, 
+        data.password_hash
+    )
+    if not verified:
         raise INVALID_CREDENTIALS
     
     access_token_create: AccessTokenCreate = security.create_access_token(
@@ -144,7 +92,22 @@ async def login(
     
     refresh_token_create: RefreshTokenCreate = security.create_refresh_token(data.id)                
     
-    await process_login_transaction(data, refresh_token_create, refresh_token, conn)
+    old_token = _decode_old_refresh_token(refresh_token)
+    
+    await db_safe_exec(refresh_token_model.register_login(
+        refresh_token_create,
+        old_token.token_id if old_token else None,
+        new_password_hash,
+        conn
+    ))
+    
+    if old_token and old_token.family_id:
+        await RedisService.revoke_token_families([old_token.family_id])
+    await RedisService.set_token_family_active(
+        data.id,
+        refresh_token_create.family_id,
+        refresh_token_create.token_id
+    )
     
     security.set_session_token_cookie(
         response, 
@@ -178,46 +141,54 @@ async def refresh(
     if not refresh_token: 
         raise INVALID_REFRESH_TOKEN
         
-    old_token: RefreshToken = await refresh_token_model.get_refresh_token_by_id(
-        security.decode_refresh_token(refresh_token).token_id,
+    decoded = security.decode_refresh_token(refresh_token)
+    
+    # Recusa pelo Redis, sem tocar no banco, famílias revogadas e tokens já rotacionados
+    if decoded.family_id:
+        state = await RedisService.get_token_family_state(decoded.family_id)
+        if state == RedisService.TOKEN_FAMILY_REVOKED:
+            raise INVALID_REFRESH_TOKEN
+        if state is not None and state != decoded.token_id:
+            # Reuso de token antigo: possível roubo, derruba a família (banco + Redis)
+            await db_safe_exec(refresh_token_model.revoke_token_family(decoded.family_id, conn))
+            await RedisService.revoke_token_families([decoded.family_id])
+            raise INVALID_REFRESH_TOKEN
+    
+    new_token_id = uuid.uuid4()
+    expires_at = security.refresh_token_expiration()
+    
+    # Busca, validação, rotação e revogação da família em uma única chamada.
+    # Mesmo com o Redis dizendo que o token é o atual, a rotação vai ao banco:
+    # o novo token precisa existir no Postgres (o Redis pode ser perdido) e a
+    # mesma chamada devolve os dados do usuário.
+    row = await db_safe_exec(refresh_token_model.rotate_refresh_token(
+        decoded.token_id,
+        new_token_id,
+        expires_at,
         conn
-    )
+    ))
     
-    if not old_token:
+    if not row or row["status"] == "INVALID":
         raise INVALID_REFRESH_TOKEN
     
-    if old_token.revoked or old_token.expires_at < datetime.now(timezone.utc):
-        if db.pool:
-            async with db.pool.acquire() as temp_conn:
-                await refresh_token_model.revoke_token_family(old_token.family_id, temp_conn)
+    if row["status"] != "OK":
+        await RedisService.revoke_token_families([row["family_id"]])
         raise INVALID_REFRESH_TOKEN
     
-    user: Optional[UserResponse] = await user_model.get_user_by_id(old_token.user_id, conn)
-    
-    if not user:
-        if db.pool:
-            async with db.pool.acquire() as temp_conn:
-                await refresh_token_model.revoke_token_family(old_token.family_id, temp_conn)
-        raise INVALID_REFRESH_TOKEN
+    user: UserResponse = rows_util.from_row(UserResponse, row)
+    await RedisService.rotate_token_family(row["family_id"], new_token_id)
     
     access_token_create: AccessTokenCreate = security.create_access_token(
         user.id,
         user.tenant_id
     )
     
-    refresh_token_create: RefreshTokenCreate = security.create_refresh_token(user.id, old_token.family_id)
-    
-    await db_safe_exec(
-        refresh_token_model.create_refresh_token(refresh_token_create, conn),
-        refresh_token_model.invalidate_token(old_token.id, refresh_token_create.token_id, conn)
-    )
-    
     security.set_session_token_cookie(
         response,
         access_token_create.jwt_token,
         access_token_create.expires_at,
-        refresh_token_create.jwt_token,
-        refresh_token_create.expires_at
+        security.encode_refresh_token(new_token_id, expires_at, row["family_id"]),
+        expires_at
     )
     
     return user
@@ -245,16 +216,19 @@ async def signup(user: UserCreate, rls: RLSConnection) -> UserResponse:
             detail=f"Você (Nível {ctx.actor_privilege_level}) não pode criar um usuário com nível superior ({ctx.proposed_roles_max_level})."
         )
         
-    password_hash = security.hash_password(user.password) if user.password else None
-    quick_access_pin_hash = security.hash_password(user.quick_access_pin_hash) if user.quick_access_pin_hash else None
+    password_hash = await password_hasher.hash_password(user.password) if user.password else None
+    quick_access_pin_hash = await password_hasher.hash_password(user.quick_access_pin_hash) if user.quick_access_pin_hash else None
     
-    return await db_safe_exec(user_model.create_user(
+    created = await db_safe_exec(user_model.create_user(
         user, 
         password_hash, 
         quick_access_pin_hash, 
         rls.user.tenant_id,
         rls.conn
     ))
+    if created:
+        await user_profile_cache.invalidate_user_profiles([created.id])
+    return created
 
 
 async def logout(data: DecodedAccessToken, response: Response, conn: Connection) -> None:
@@ -263,4 +237,5 @@ async def logout(data: DecodedAccessToken, response: Response, conn: Connection)
         data.user_id,
         conn
     )
+    await RedisService.revoke_user_token_families(data.user_id)
         
\ No newline at end of file
@@ -0,0 +1,81 @@
+from src.constants import Constants
+from pydantic import BaseModel
+from typing import NamedTuple, Type, TypeVar
+import zstandard
+import struct
+import math
+
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class CacheEntry(NamedTuple):
+    """
+    Valor em cache + metadados de frescor.
+
+    soft_expires_at: a partir daqui o valor é "stale": ainda é servido, mas
+                     dispara uma atualização em background.
+    delta:           segundos que a última busca na origem levou (XFetch).
+    tags:            tags de invalidação da chave (só no L1; não vão para o Redis).
+    A expiração "hard" é o próprio TTL da chave no Redis (ttl + stale_ttl).
+    """
+    value: BaseModel
+    soft_expires_at: float
+    delta: float
+    tags: tuple[str, ...] = ()
+
+
+# Cabeçalho binário (16 bytes):
+#   magic "VC" | versão (1 byte) | flags (1 byte) | soft_expires_at (f64) | delta (f32)
+# Corpo: JSON gerado pelo serializer do pydantic (bytes), comprimido com zstd
+# quando passa de CACHE_COMPRESSION_MIN_BYTES.
+_MAGIC = b"VC"
+_VERSION = 1
+_HEADER = struct.Struct("<2sBBdf")
+_FLAG_ZSTD = 0x01
+
+
+# Compressores zstd não são thread-safe; o event loop é single-thread,
+# então uma instância por processo basta.
+_compressor = zstandard.ZstdCompressor(level=Constants.CACHE_COMPRESSION_LEVEL)
+_decompressor = zstandard.ZstdDecompressor()
+
+
+def encode_cache_entry(value: BaseModel, soft_expires_at: float, delta: float) -> tuple[bytes, int]:
+    """Retorna (bytes para o Redis, tamanho do JSON sem compressão)."""
+    payload = value.__pydantic_serializer__.to_json(value, warnings=False)
+    raw_size = len(payload)
+    flags = 0
+    if raw_size >= Constants.CACHE_COMPRESSION_MIN_BYTES:
+        compressed = _compressor.compress(payload)
+        if len(compressed) < raw_size:
+            payload = compressed
+            flags |= _FLAG_ZSTD
+    return _HEADER.pack(_MAGIC, _VERSION, flags, soft_expires_at, delta) + payload, raw_size
+
+
+def decode_cache_entry(data: bytes, model_class: Type[T]) -> tuple[CacheEntry, int]:
+    """Retorna (entrada, tamanho do JSON sem compressão)."""
+    if data[:2] != _MAGIC:
+        return _decode_legacy_entry(data, model_class)
+
+    _, version, flags, soft_expires_at, delta = _HEADER.unpack_from(data)
+    if version != _VERSION:
+        raise ValueError(f"Versão de cache desconhecida: {version}")
+
+    payload = data[_HEADER.size:]
+    if flags & _FLAG_ZSTD:
+        payload = _decompressor.decompress(payload)
+    return CacheEntry(model_class.model_validate_json(payload), soft_expires_at, delta), len(payload)
+
+
+def _decode_legacy_entry(data: bytes, model_class: Type[T]) -> tuple[CacheEntry, int]:
+    # Formatos anteriores (texto): JSON puro ou "<soft_expires_at>:<delta>|<json>".
+    # Aceitos até expirarem pelo TTL.
+    text = data.decode()
+    if text[:1] in ("{", "["):
+        return CacheEntry(model_class.model_validate_json(text), math.inf, 0.0), len(data)
+    header, _, payload = text.partition("|")
+    soft_expires_at, _, delta = header.partition(":")
+    entry = CacheEntry(model_class.model_validate_json(payload), float(soft_expires_at), float(delta))
+    return entry, len(payload)
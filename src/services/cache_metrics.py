@@ -0,0 +1,154 @@
+from collections import Counter
+from src.constants import Constants
+from typing import Dict
+import threading
+import random
+
+
+def key_prefix(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+class PrefixStats:
+    """Contadores de um prefixo de chave (ex.: "ncm", "cnpjs")."""
+
+    __slots__ = (
+        "l1_hits",
+        "l2_hits",
+        "misses",
+        "errors",
+        "stale_served",
+        "fetches",
+        "fetch_ms_total",
+        "fetch_ms_max",
+        "bytes_total",
+        "bytes_max"
+    )
+
+    def __init__(self):
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.stale_served = 0
+        self.fetches = 0
+        self.fetch_ms_total = 0.0
+        self.fetch_ms_max = 0.0
+        self.bytes_total = 0
+        self.bytes_max = 0
+
+    def to_dict(self) -> dict:
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        return {
+            "lookups": lookups,
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.l1_hits + self.l2_hits) / lookups, 4) if lookups else 0,
+            "errors": self.errors,
+            "stale_served": self.stale_served,
+            "fetches": self.fetches,
+            "avg_fetch_ms": round(self.fetch_ms_total / self.fetches, 2) if self.fetches else 0,
+            "max_fetch_ms": round(self.fetch_ms_max, 2),
+            "avg_bytes": self.bytes_total // self.fetches if self.fetches else 0,
+            "max_bytes": self.bytes_max
+        }
+
+
+class CacheMetrics:
+    """
+    Métricas do get_or_set_cache por prefixo de chave, expostas em
+    /admin/monitor/cache.
+
+    Chaves quentes: cada lookup entra na amostra com probabilidade
+    CACHE_HOT_KEY_SAMPLE_RATE. Ao passar de CACHE_HOT_KEY_MAX_TRACKED chaves,
+    só a metade mais frequente é mantida, então a memória é limitada e as
+    chaves realmente quentes sobrevivem às podas.
+    """
+
+    def __init__(self, sample_rate: float, max_tracked: int):
+        self.sample_rate = sample_rate
+        self.max_tracked = max_tracked
+        self._lock = threading.Lock()
+        self._prefixes: Dict[str, PrefixStats] = {}
+        self._hot_keys: Counter = Counter()
+        self._sampled = 0
+
+    def _stats(self, key: str) -> PrefixStats:
+        prefix = key_prefix(key)
+        stats = self._prefixes.get(prefix)
+        if stats is None:
+            stats = self._prefixes[prefix] = PrefixStats()
+        return stats
+
+    def _sample(self, key: str):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return
+        self._sampled += 1
+        self._hot_keys[key] += 1
+        if len(self._hot_keys) > self.max_tracked:
+            self._hot_keys = Counter(dict(self._hot_keys.most_common(self.max_tracked // 2)))
+
+    def record_l1_hit(self, key: str):
+        with self._lock:
+            self._stats(key).l1_hits += 1
+            self._sample(key)
+
+    def record_l2_hit(self, key: str):
+        with self._lock:
+            self._stats(key).l2_hits += 1
+            self._sample(key)
+
+    def record_miss(self, key: str):
+        with self._lock:
+            self._stats(key).misses += 1
+            self._sample(key)
+
+    def record_error(self, key: str):
+        with self._lock:
+            self._stats(key).errors += 1
+
+    def record_stale(self, key: str):
+        with self._lock:
+            self._stats(key).stale_served += 1
+
+    def record_fetch(self, key: str, elapsed_ms: float, size: int):
+        with self._lock:
+            stats = self._stats(key)
+            stats.fetches += 1
+            stats.fetch_ms_total += elapsed_ms
+            stats.fetch_ms_max = max(stats.fetch_ms_max, elapsed_ms)
+            stats.bytes_total += size
+            stats.bytes_max = max(stats.bytes_max, size)
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {prefix: stats.to_dict() for prefix, stats in sorted(self._prefixes.items())}
+
+    def hot_keys(self, limit: int = 20) -> dict:
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "sampled_lookups": self._sampled,
+                "tracked_keys": len(self._hot_keys),
+                "keys": [
+                    {
+                        "key": key,
+                        "samples": count,
+                        "estimated_lookups": round(count / self.sample_rate) if self.sample_rate > 0 else 0
+                    }
+                    for key, count in self._hot_keys.most_common(limit)
+                ]
+            }
+
+    def reset(self):
+        with self._lock:
+            self._prefixes.clear()
+            self._hot_keys.clear()
+            self._sampled = 0
+
+
+cache_metrics = CacheMetrics(
+    sample_rate=Constants.CACHE_HOT_KEY_SAMPLE_RATE,
+    max_tracked=Constants.CACHE_HOT_KEY_MAX_TRACKED
+)
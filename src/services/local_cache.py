@@ -0,0 +1,136 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, TypeVar
+import threading
+import time
+
+
+V = TypeVar("V")
+
+
+_MISSING = object()
+
+
+class LocalCache(Generic[V]):
+    """
+    LRU em memória, limitado por número de entradas (e opcionalmente por
+    bytes), com expiração por entrada. O tamanho de cada entrada é informado
+    por quem grava (ex.: tamanho do JSON de origem), já que medir o objeto
+    Python em si seria caro e impreciso.
+    Cada instância nomeada fica registrada para o endpoint de monitoramento.
+    """
+
+    def __init__(
+        self, 
+        name: str, 
+        max_entries: int, 
+        default_ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._data: OrderedDict[Hashable, tuple[float, V, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        _registry[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> V | Any:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self._misses += 1
+                return default
+            expires_at, value, size = entry
+            if expires_at <= now:
+                del self._data[key]
+                self._bytes -= size
+                self._expirations += 1
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: V,
+        ttl: Optional[float] = None,
+        expires_at: Optional[float] = None,
+        size: int = 0
+    ):
+        """expires_at é um timestamp unix; sem ele vale ttl (ou default_ttl)."""
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        if expires_at is None:
+            ttl = self.default_ttl if ttl is None else ttl
+            expires_at = time.time() + ttl if ttl is not None else float("inf")
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._data[key] = (expires_at, value, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+
+    def delete_where(self, predicate: Callable[[Hashable, V], bool]) -> int:
+        """Remove as entradas que satisfazem predicate(key, value). O(n)."""
+        with self._lock:
+            keys = [key for key, (_, value, _) in self._data.items() if predicate(key, value)]
+            for key in keys:
+                self._bytes -= self._data.pop(key)[2]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0,
+                "evictions": self._evictions,
+                "expirations": self._expirations
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+            self._expirations = 0
+
+
+_registry: Dict[str, LocalCache] = {}
+
+
+def get_all_stats() -> Dict[str, dict]:
+    return {name: cache.get_stats() for name, cache in _registry.items()}
@@ -1,7 +1,9 @@
-from asyncpg import Connection
-from src.schemas.ncm import NcmResponse
+from src.schemas.ncm import NcmResponse, NcmLookupResponse
+from src.constants import Constants
 from src.schemas.general import Pagination
 from src.services.redis_client import RedisService
+from src.services import ncm_index
+from src.db.db import acquire_connection
 from fastapi.exceptions import HTTPException
 from typing import Optional
 from src.model import ncm as ncm_model
@@ -10,25 +12,74 @@ from src.model import ncm as ncm_model
 async def search_ncm(
     q: str,
     limit: int, 
-    offset: int, 
-    conn: Connection
+    offset: int
 ):
+    index = ncm_index.get_index()
+    if index is not None:
+        return ncm_index.search_page(index, q, limit, offset)
+    
     q_normalized = " ".join(q.strip().lower().split()) if q else "all"
     q_key = q_normalized.replace(" ", "_")
     
     key = f"ncm::{limit}:{offset}:{q_key}"
     
+    async def fetch_page() -> Pagination[NcmResponse]:
+        async with acquire_connection() as conn:
+            return await ncm_model.search_ncms(q, limit, offset, conn)
+    
     return await RedisService.get_or_set_cache(
         key, 
         Pagination[NcmResponse], 
-        lambda: ncm_model.search_ncms(q, limit, offset, conn)        
+        fetch_page,
+        tags=("ncm",)
     )
     
 
-async def get_ncm_by_code(code: str, conn: Connection) -> NcmResponse:
-    ncm: Optional[NcmResponse] = await ncm_model.get_ncm_by_code(code, conn)
+async def get_ncm_by_code(code: str) -> NcmResponse:
+    index = ncm_index.get_index()
+    if index is not None:
+        ncm: Optional[NcmResponse] = index.get(_clean_code(code))
+    else:
+        async with acquire_connection() as conn:
+            ncm = await ncm_model.get_ncm_by_code(code, conn)
 
     if not ncm:
         raise HTTPException(status_code=404, detail=f"NCM {code} não encontrado")
 
-    return ncm
\ No newline at end of file
+    return ncm
+
+
+def _clean_code(code: str) -> str:
+    return code.replace(".", "").strip()
+
+
+async def lookup_ncms(codes: list[str]) -> NcmLookupResponse:
+    clean_codes = {code: _clean_code(code) for code in codes}
+    
+    index = ncm_index.get_index()
+    if index is not None:
+        found = {clean: index.get(clean) for clean in set(clean_codes.values())}
+    else:
+        async def fetch_ncms(missing: list[str]) -> dict[str, NcmResponse]:
+            async with acquire_connection() as conn:
+                ncms = await ncm_model.get_ncms_by_codes(missing, conn)
+            return {ncm.code: ncm for ncm in ncms}
+        
+        found = await RedisService.get_many_or_set(
+            clean_codes.values(),
+            lambda code: f"ncm:code:{code}",
+            NcmResponse,
+            fetch_ncms,
+            ttl=Constants.NCM_CODE_CACHE_TTL_SECONDS,
+            tags_function=lambda _: ("ncm",)
+        )
+    
+    results = {}
+    missing = []
+    for code, clean in clean_codes.items():
+        ncm = found.get(clean)
+        if ncm is None:
+            missing.append(code)
+        else:
+            results[code] = ncm
+    return NcmLookupResponse(results=results, missing=missing)
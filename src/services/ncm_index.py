@@ -0,0 +1,331 @@
+from src.services.local_cache import LocalCache
+from src.schemas.general import Pagination
+from src.schemas.ncm import NcmResponse
+from src.constants import Constants
+from src.db.db import acquire_connection
+from src.db.listener import listener, split_tag_notification
+from typing import Optional
+import snowballstemmer
+import unicodedata
+import contextlib
+import asyncio
+import bisect
+import math
+import time
+import re
+
+
+# Stop words do dicionário 'portuguese' do Postgres (snowball). Só as sem
+# acento: o unaccent roda antes do to_tsvector/to_tsquery, então as acentuadas
+# da lista original nunca coincidem.
+_STOPWORDS = frozenset("""
+    de a o que e do da em um para com uma os no se na por mais as dos como mas
+    ao ele das seu sua ou quando muito nos eu pelo pela isso ela entre depois
+    sem mesmo aos seus quem nas me esse eles essa num nem suas meu minha numa
+    pelos elas qual lhe deles essas esses pelas este dele tu te vos lhes meus
+    minhas teu tua teus tuas nosso nossa nossos nossas dela delas esta estes
+    estas aquele aquela aqueles aquelas isto aquilo estou estamos estive esteve
+    estivemos estiveram estava estavam estivera esteja estejamos estejam
+    estivesse estivessem estiver estivermos estiverem hei havemos houve
+    houvemos houveram houvera haja hajamos hajam houvesse houvessem houver
+    houvermos houverem houverei houveremos houveria houveriam sou somos era
+    eram fui foi fomos foram fora seja sejamos sejam fosse fossem for formos
+    forem serei seremos seria seriam tenho tem temos tinha tinham tive teve
+    tivemos tiveram tivera tenha tenhamos tenham tivesse tivessem tiver
+    tivermos tiverem terei teremos teria teriam
+""".split())
+
+
+_STEMMER = snowballstemmer.stemmer("portuguese")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_TSVECTOR_RE = re.compile(r"'((?:[^']|'')+)':([0-9A-D,]+)")
+_LAST_CHAR = chr(0x10FFFF)
+
+
+# ts_rank sem setweight: toda posição tem o peso D
+_RANK_WEIGHT = 0.1
+_PI2_6 = 1.64493406685
+
+
+def fold(text: str) -> str:
+    """Equivalente ao immutable_unaccent + lower do to_tsvector."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def query_lexemes(clean_term: str) -> list[str]:
+    """Termos do to_tsquery('portuguese', ...) já com stem, sem repetição e ordenados."""
+    words = [w for w in _TOKEN_RE.findall(clean_term) if w not in _STOPWORDS]
+    return sorted(set(_STEMMER.stemWords(words)))
+
+
+# Documento = entradas (lexema, posições) na ordem do tsvector (lexemas ordenados)
+Document = tuple[tuple[str, tuple[int, ...]], ...]
+
+
+def _parse_tsvector(text: str) -> Document:
+    return tuple(sorted(
+        (lexeme.replace("''", "'"), tuple(int(p.rstrip("ABCD")) for p in positions.split(",")))
+        for lexeme, positions in _TSVECTOR_RE.findall(text)
+    ))
+
+
+def _matching_entries(document: Document, prefix: str) -> list[tuple[int, ...]]:
+    return [positions for lexeme, positions in document if lexeme.startswith(prefix)]
+
+
+def _word_distance(distance: int) -> float:
+    if distance > 100:
+        return 1e-30
+    return 1.0 / (1.005 + 0.05 * math.exp(distance / 1.5 - 2))
+
+
+# Contribuição de um lexema com n posições no calc_rank_or: sum(w / i^2) / (pi^2 / 6)
+_OR_SCORES = [0.0]
+for _j in range(1, 257):
+    _OR_SCORES.append(_OR_SCORES[-1] + _RANK_WEIGHT / (_j * _j) / _PI2_6)
+
+
+def _rank_and(document: Document, items: list[str]) -> float:
+    # calc_rank_and (tsrank.c): proximidade entre as posições dos termos
+    rank = -1.0
+    matched: list[Optional[tuple[int, ...]]] = [None] * len(items)
+    for i, item in enumerate(items):
+        for positions in _matching_entries(document, item):
+            matched[i] = positions
+            for previous in matched[:i]:
+                if previous is None:
+                    continue
+                for position in positions:
+                    for other in previous:
+                        distance = abs(position - other)
+                        if not distance:
+                            continue
+                        weight = math.sqrt(_RANK_WEIGHT * _RANK_WEIGHT * _word_distance(distance))
+                        rank = weight if rank < 0 else 1.0 - (1.0 - rank) * (1.0 - weight)
+    return rank if rank >= 0 else 1e-20
+
+
+class NcmIndex:
+    """
+    fiscal_ncms inteira em memória, imutável depois de montada.
+
+    - códigos ordenados + bisect: busca exata por código;
+    - índice invertido dos lexemas do próprio fts_vector (stem/unaccent feitos
+      pelo Postgres), com busca por prefixo como o ':*' do to_tsquery;
+    - mesmo resultado e ranking do search_ncms_optimized (o fallback em SQL):
+      código exato primeiro, depois ts_rank.
+    """
+
+    def __init__(self, rows: list):
+        self.items: list[NcmResponse] = []
+        self.codes: list[str] = []
+        self.documents: list[Document] = []
+        postings: dict[str, list[int]] = {}
+        for doc, row in enumerate(rows):
+            self.items.append(NcmResponse(
+                code=row["code"],
+                description=row["description"],
+                federal_national_rate=row["federal_national_rate"],
+                federal_import_rate=row["federal_import_rate"],
+                state_rate=row["state_rate"],
+                municipal_rate=row["municipal_rate"]
+            ))
+            self.codes.append(row["code"])
+            document = _parse_tsvector(row["fts"] or "")
+            self.documents.append(document)
+            for lexeme, positions in document:
+                postings.setdefault(lexeme, []).append((doc, _OR_SCORES[min(len(positions), 256)]))
+        self.lexemes: list[str] = sorted(postings)
+        self.postings = postings
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def get(self, code: str) -> Optional[NcmResponse]:
+        i = bisect.bisect_left(self.codes, code)
+        if i < len(self.codes) and self.codes[i] == code:
+            return self.items[i]
+        return None
+
+    def _prefix_scores(self, prefix: str) -> dict[int, float]:
+        """Documentos com algum lexema começando com prefix -> calc_rank_or do termo."""
+        start = bisect.bisect_left(self.lexemes, prefix)
+        end = bisect.bisect_left(self.lexemes, prefix + _LAST_CHAR)
+        scores: dict[int, float] = {}
+        for lexeme in self.lexemes[start:end]:
+            for doc, score in self.postings[lexeme]:
+                scores[doc] = scores.get(doc, 0.0) + score
+        return scores
+
+    def search(self, term: Optional[str]) -> list[int]:
+        """Índices dos documentos na ordem do resultado."""
+        clean_term = fold((term or "").strip())
+        if not clean_term:
+            return list(range(len(self.items)))
+
+        ranked: list[int] = []
+        seen: set[int] = set()
+        exact = bisect.bisect_left(self.codes, term)
+        if exact < len(self.codes) and self.codes[exact] == term:
+            ranked.append(exact)
+            seen.add(exact)
+
+        items = query_lexemes(clean_term)
+        if len(items) == 1:
+            scores = self._prefix_scores(items[0])
+        elif items:
+            docs = set(self._prefix_scores(items[0]))
+            for item in items[1:]:
+                if not docs:
+                    break
+                docs &= self._prefix_scores(item).keys()
+            scores = {doc: _rank_and(self.documents[doc], items) for doc in docs}
+        else:
+            scores = {}
+        for doc in seen:
+            scores.pop(doc, None)
+        ranked.extend(sorted(scores, key=lambda doc: (-scores[doc], self.codes[doc])))
+        return ranked
+
+
+# Cada entrada guarda o resultado inteiro (até a tabela toda em termos
+# amplos), então o limite em bytes é o que segura a memória.
+_query_cache: LocalCache[tuple[int, ...]] = LocalCache(
+    "ncm_index_queries",
+    max_entries=Constants.NCM_INDEX_QUERY_CACHE_SIZE,
+    max_bytes=Constants.NCM_INDEX_QUERY_CACHE_MAX_BYTES
+)
+
+
+_index: Optional[NcmIndex] = None
+_loaded_at: Optional[float] = None
+_load_ms = 0.0
+_reloads = 0
+_errors = 0
+_last_error_at: Optional[float] = None
+_reload_task: Optional[asyncio.Task] = None
+_reload_pending = False
+
+
+def get_index() -> Optional[NcmIndex]:
+    return _index
+
+
+def _query_key(index: NcmIndex, q: Optional[str]) -> str:
+    # Variações de caixa/espaços dão o mesmo resultado e a mesma chave. A busca
+    # exata usa o termo cru, então um termo que é código tem chave própria.
+    if q and index.get(q) is not None:
+        return f"={q}"
+    return "~" + " ".join(fold(q or "").split())
+
+
+def search_page(index: NcmIndex, q: Optional[str], limit: int, offset: int) -> Pagination[NcmResponse]:
+    key = _query_key(index, q)
+    ranked = _query_cache.get(key)
+    if ranked is None:
+        ranked = tuple(index.search(q))
+        # ~8 bytes por id na tupla
+        _query_cache.set(key, ranked, size=len(ranked) * 8)
+    return Pagination(
+        total=len(ranked),
+        limit=limit,
+        offset=offset,
+        results=[index.items[doc] for doc in ranked[offset:offset + limit]]
+    )
+
+
+async def load_index() -> bool:
+    global _index, _loaded_at, _load_ms, _reloads, _errors, _last_error_at
+    started = time.perf_counter()
+    try:
+        async with acquire_connection() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT
+                    code,
+                    description,
+                    federal_national_rate,
+                    federal_import_rate,
+                    state_rate,
+                    municipal_rate,
+                    fts_vector::TEXT AS fts
+                FROM
+                    fiscal_ncms
+                ORDER BY
+                    code
+                """
+            )
+        index = NcmIndex(rows)
+    except Exception as e:
+        _errors += 1
+        _last_error_at = time.time()
+        print(f"[NCM INDEX] [ERROR] [{e}]")
+        return False
+
+    if _index is not None:
+        _reloads += 1
+    _index = index
+    _query_cache.clear()
+    _loaded_at = time.time()
+    _load_ms = (time.perf_counter() - started) * 1000
+    print("[NCM INDEX] [INFO]", f"[{len(index)} NCMs CARREGADOS EM {_load_ms:.0f} ms]")
+    return True
+
+
+async def _reload_loop():
+    global _reload_pending
+    while _reload_pending:
+        _reload_pending = False
+        if not await load_index():
+            # Sem índice a busca fica no SQL; com índice, ele é de uma versão
+            # que o NOTIFY já invalidou no Redis. Nos dois casos tenta de novo
+            # sem esperar outra escrita em fiscal_ncms.
+            _reload_pending = True
+            await asyncio.sleep(Constants.NCM_INDEX_RETRY_SECONDS)
+
+
+def schedule_reload():
+    # Um COPY gera um NOTIFY, mas várias escritas seguidas geram vários:
+    # no máximo uma recarga rodando e uma pendente.
+    global _reload_task, _reload_pending
+    _reload_pending = True
+    if _reload_task is None or _reload_task.done():
+        _reload_task = asyncio.get_running_loop().create_task(_reload_loop())
+
+
+async def stop():
+    if _reload_task is not None and not _reload_task.done():
+        _reload_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _reload_task
+
+
+def _on_tag_notification(key: Optional[str]):
+    # None = reconexão do listener: um NOTIFY de nova versão pode ter sido perdido.
+    # Sem índice carregado, qualquer notificação serve de nova tentativa.
+    if not Constants.NCM_INDEX_ENABLED:
+        return
+    if _index is None or key is None or split_tag_notification(key)[0] == "ncm":
+        schedule_reload()
+
+
+def get_stats() -> dict:
+    return {
+        "enabled": Constants.NCM_INDEX_ENABLED,
+        "loaded": _index is not None,
+        "rows": len(_index) if _index is not None else 0,
+        "lexemes": len(_index.lexemes) if _index is not None else 0,
+        "loaded_at": _loaded_at,
+        "load_ms": round(_load_ms, 2),
+        "reloads": _reloads,
+        "errors": _errors,
+        "last_error_at": _last_error_at,
+        "reload_in_progress": _reload_task is not None and not _reload_task.done(),
+        # Recarga pendente/em retry: o índice em uso pode estar desatualizado
+        "reload_pending": _reload_pending,
+        "query_cache": _query_cache.get_stats()
+    }
+
+
+listener.register("tag", _on_tag_notification)
@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.exceptions import HTTPException
+from fastapi import status
+from src.constants import Constants
+from src import security
+from typing import Callable, Optional, TypeVar
+import asyncio
+import threading
+import time
+
+
+R = TypeVar("R")
+
+
+class PasswordHasher:
+    """
+    Executa hash/verificação argon2 fora do event loop.
+
+    O argon2-cffi libera o GIL durante o cálculo, então threads rodam em
+    paralelo de verdade. A concorrência é limitada ao número de workers e a
+    fila de espera tem teto: acima dele a requisição recebe 503 em vez de
+    acumular memória e latência indefinidamente.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        self._peak_waiting = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait_ms = 0.0
+        self._total_run_ms = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="argon2"
+            )
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        return self._executor
+
+    async def _run(self, fn: Callable[..., R], *args) -> R:
+        executor = self._get_executor()
+
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                self._rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Servidor ocupado, tente novamente em instantes.",
+                    headers={"Retry-After": "1"}
+                )
+            self._submitted += 1
+            self._waiting += 1
+            self._peak_waiting = max(self._peak_waiting, self._waiting)
+
+        queued_at = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        started_at = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            self._total_wait_ms += (started_at - queued_at) * 1000
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            self._semaphore.release()
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._total_run_ms += (time.perf_counter() - started_at) * 1000
+
+    async def hash(self, password: str) -> str:
+        return await self._run(security.hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(security.verify_password, plain_password, hashed_password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+        return await self._run(security.verify_and_update_password, plain_password, hashed_password)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queue_depth": self._waiting,
+                "peak_queue_depth": self._peak_waiting,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._total_wait_ms / self._completed, 2) if self._completed else 0,
+                "avg_run_ms": round(self._total_run_ms / self._completed, 2) if self._completed else 0
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._semaphore = None
+
+
+password_hasher = PasswordHasher(
+    max_workers=Constants.PASSWORD_HASH_WORKERS,
+    max_queue=Constants.PASSWORD_HASH_MAX_QUEUE
+)
+
+
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    return await password_hasher.verify_and_update(plain_password, hashed_password)
@@ -0,0 +1,169 @@
+from fastapi.exceptions import HTTPException
+from fastapi import Request, Response, status
+from src.services.redis_client import RedisService
+from src import security
+from typing import Dict, Optional
+from math import ceil
+import contextlib
+import asyncio
+import time
+
+
+class _Bucket:
+    """Contador de uma chave (rota + limitador + cliente) na janela atual."""
+
+    __slots__ = ("window", "pending", "global_count", "limit", "window_ms")
+
+    def __init__(self, window: int, limit: int, window_ms: int):
+        self.window = window
+        self.pending = 0          # hits locais ainda não enviados ao Redis
+        self.global_count = 0     # total da janela (todos os workers) na última sincronização
+        self.limit = limit
+        self.window_ms = window_ms
+
+
+class RateLimitBackend:
+    """
+    Limitador em duas camadas. A decisão é tomada em memória, sem I/O, com
+    base no último total global conhecido + hits locais pendentes. Uma tarefa
+    de fundo envia os pendentes ao Redis (INCRBY em pipeline, uma ida por
+    intervalo) e traz de volta o total somado de todos os workers.
+
+    O limite global é aproximado: entre duas sincronizações cada worker pode
+    ultrapassar o limite em no máximo o que recebeu nesse intervalo.
+    Sem Redis, os limites continuam valendo por processo.
+    """
+
+    def __init__(self, sync_interval: float = 1.0, prefix: str = "ratelimit"):
+        self.sync_interval = sync_interval
+        self.prefix = prefix
+        self._buckets: Dict[str, _Bucket] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._checks = 0
+        self._rejected = 0
+        self._syncs = 0
+        self._sync_errors = 0
+
+    def hit(self, key: str, limit: int, window_ms: int) -> int:
+        """Registra um hit. Retorna 0 se permitido, ou ms até a janela reabrir."""
+        now_ms = int(time.time() * 1000)
+        window = now_ms // window_ms
+        self._checks += 1
+
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.window != window:
+            bucket = _Bucket(window, limit, window_ms)
+            self._buckets[key] = bucket
+
+        if bucket.global_count + bucket.pending >= limit:
+            self._rejected += 1
+            return (window + 1) * window_ms - now_ms
+
+        bucket.pending += 1
+        return 0
+
+    async def sync(self):
+        now_ms = int(time.time() * 1000)
+        dirty = []
+        for key, bucket in list(self._buckets.items()):
+            if (bucket.window + 1) * bucket.window_ms <= now_ms:
+                # Janela encerrada: o total dela não limita mais nada, então os
+                # pendentes são descartados (senão, com o Redis fora, acumulam)
+                del self._buckets[key]
+            elif bucket.pending:
+                dirty.append((key, bucket, bucket.pending))
+
+        if not dirty:
+            return
+
+        try:
+            async with RedisService.get_client().pipeline(transaction=False) as pipe:
+                for key, bucket, pending in dirty:
+                    redis_key = f"{self.prefix}:{key}:{bucket.window}"
+                    pipe.incrby(redis_key, pending)
+                    pipe.pexpire(redis_key, bucket.window_ms)
+                results = await pipe.execute()
+        except Exception as e:
+            self._sync_errors += 1
+            print(f"[RATE LIMIT] [ERROR] [SYNC] {e}")
+            return
+
+        self._syncs += 1
+        for i, (key, bucket, pending) in enumerate(dirty):
+            bucket.pending -= pending
+            bucket.global_count = int(results[i * 2])
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            await self.sync()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        # Envia o que sobrou para não "perdoar" hits no shutdown
+        await self.sync()
+
+    def get_stats(self) -> dict:
+        return {
+            "keys": len(self._buckets),
+            "checks": self._checks,
+            "rejected": self._rejected,
+            "syncs": self._syncs,
+            "sync_errors": self._sync_errors,
+            "sync_interval_s": self.sync_interval
+        }
+
+
+backend = RateLimitBackend()
+
+
+def client_key(request: Request) -> str:
+    # Terminais autenticados: por tenant + usuário (vários caixas atrás do mesmo NAT)
+    access_token = request.cookies.get("access_token")
+    if access_token:
+        try:
+            data = security.decode_access_token(access_token)
+            return f"t:{data.tenant_id}:u:{data.user_id}"
+        except Exception:
+            pass
+
+    forwarded = request.headers.get("x-forwarded-for")
+    ip = forwarded.split(",")[0].strip() if forwarded else request.client.host
+    return f"ip:{ip}"
+
+
+class RateLimiter:
+    """Dependência com a mesma assinatura do fastapi_limiter (times, seconds...)."""
+
+    def __init__(
+        self,
+        times: int = 1,
+        milliseconds: int = 0,
+        seconds: int = 0,
+        minutes: int = 0,
+        hours: int = 0
+    ):
+        self.times = times
+        self.milliseconds = milliseconds + 1000 * seconds + 60000 * minutes + 3600000 * hours
+
+    async def __call__(self, request: Request, response: Response):
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", request.url.path)
+        # times/ms no bucket: limitadores empilhados (router + rota) contam separados
+        key = f"{request.method}:{route_path}:{self.times}/{self.milliseconds}:{client_key(request)}"
+
+        retry_ms = backend.hit(key, self.times, self.milliseconds)
+        if retry_ms:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too Many Requests",
+                headers={"Retry-After": str(ceil(retry_ms / 1000))}
+            )
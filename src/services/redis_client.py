@@ -1,31 +1,140 @@
-from typing import TypeVar, Type, Callable, Awaitable
+from typing import TypeVar, Type, Callable, Awaitable, Hashable
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Iterable
+from src.constants import Constants
+from src.services.local_cache import LocalCache
+from src.services.cache_codec import CacheEntry, encode_cache_entry, decode_cache_entry
+from src.services.cache_metrics import cache_metrics, key_prefix
+from src.db.listener import listener, split_tag_notification
 import asyncio
+import contextlib
 import redis.asyncio as redis
+import random
+import math
+import time
 import os
 
 
 T = TypeVar("T", bound=BaseModel)
+K = TypeVar("K", bound=Hashable)
 
 
-async def set_cache_background(redis_client: redis.Redis, key: str, value: Type[T], ttl: int):
+# Instâncias já validadas, compartilhadas entre requisições: quem recebe o
+# resultado do get_or_set_cache não deve alterá-lo.
+_l1_cache: LocalCache[CacheEntry] = LocalCache(
+    "redis_l1",
+    max_entries=Constants.CACHE_L1_MAX_ENTRIES,
+    max_bytes=Constants.CACHE_L1_MAX_BYTES
+)
+
+
+def l1_ttl(key: str, redis_ttl: int) -> int:
+    # O L1 nunca guarda por mais tempo que o próprio Redis
+    return min(Constants.CACHE_L1_TTLS.get(key_prefix(key), Constants.CACHE_L1_DEFAULT_TTL_SECONDS), redis_ttl)
+
+
+def resolve_ttl(ttl: int | Callable[[BaseModel], int], value: BaseModel) -> int:
+    return ttl(value) if callable(ttl) else ttl
+
+
+def should_refresh_early(entry: CacheEntry, now: float) -> bool:
+    """
+    XFetch (Vattani et al.): a chance de atualizar antes do soft TTL cresce
+    perto do vencimento e com o custo da busca, então chaves quentes são
+    renovadas por uma única requisição antes de ficarem stale.
+    """
+    beta = Constants.CACHE_EARLY_REFRESH_BETA
+    if beta <= 0 or entry.delta <= 0 or entry.soft_expires_at == math.inf:
+        return False
+    return now - entry.delta * beta * math.log(1.0 - random.random()) >= entry.soft_expires_at
+
+
+async def set_cache(redis_client: redis.Redis, key: str, data: bytes, ttl: int):
     try:
-        payload = value.model_dump_json()
-        await redis_client.set(key, payload, ex=ttl)
+        await redis_client.set(key, data, ex=ttl)
     except Exception as e:
-        print(f"[ERROR] Falha ao salvar cache em background para {key}: {e}")
+        print(f"[ERROR] Falha ao salvar cache para {key}: {e}")
+
+
+# Libera o lock de preenchimento só se ainda for o dono (o lease pode ter expirado)
+_RELEASE_LOCK_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+# Apaga as chaves registradas em cada tag (SET tag:<tag>) e a própria tag.
+# DEL em blocos: unpack tem limite de argumentos.
+_INVALIDATE_TAGS_LUA = """
+local deleted = 0
+for _, tag_key in ipairs(KEYS) do
+    local keys = redis.call('smembers', tag_key)
+    for i = 1, #keys, 500 do
+        deleted = deleted + redis.call('del', unpack(keys, i, math.min(i + 499, #keys)))
+    end
+    redis.call('del', tag_key)
+end
+return deleted
+"""
+
+
+class _FlightAborted(Exception):
+    """O dono do single-flight foi cancelado: quem esperava tenta de novo."""
             
             
 class RedisService:
     
     _client: Optional[redis.Redis] = None
+    # Cliente sem decode_responses para o cache de respostas (codec binário)
+    _binary_client: Optional[redis.Redis] = None
+    
+    # Métricas do segundo nível (o L1 tem as próprias, em _l1_cache)
+    _l2_hits = 0
+    _l2_misses = 0
+    _l2_errors = 0
+    
+    # Single-flight: uma carga por chave neste worker; as demais esperam o Future
+    _inflight: dict[str, asyncio.Future] = {}
+    _singleflight_shared = 0
+    
+    # Lock de preenchimento entre workers (SET NX com lease)
+    _lock_acquired = 0
+    _lock_wait_hits = 0
+    _lock_timeouts = 0
+    _lock_errors = 0
+    
+    # Codec: bytes de JSON antes e depois da compressão (entradas gravadas)
+    _encoded_raw_bytes = 0
+    _encoded_stored_bytes = 0
+    
+    # Invalidação por tag. _tag_generation muda a cada invalidação: uma busca
+    # iniciada antes dela não grava o resultado no cache.
+    _tag_generation = 0
+    _tag_invalidations = 0
+    _tag_keys_deleted = 0
+    _tag_errors = 0
+    _tag_notifications_skipped = 0
+    
+    # Stale-while-revalidate / refresh-ahead
+    _refreshing: dict[str, asyncio.Task] = {}
+    _stale_served = 0
+    _refreshes = 0
+    _early_refreshes = 0
+    _refresh_errors = 0
 
     @classmethod
     def get_client(cls) -> redis.Redis:
         if cls._client is None:
             cls._connect()
         return cls._client
+    
+    @classmethod
+    def get_binary_client(cls) -> redis.Redis:
+        if cls._binary_client is None:
+            cls._connect()
+        return cls._binary_client
 
     @classmethod
     def _connect(cls):
@@ -33,11 +142,14 @@ class RedisService:
         if not redis_url:
             raise ValueError("A variável de ambiente REDIS_URL não está configurada.")
         
-        cls._client = redis.from_url(
-            redis_url, 
-            decode_responses=True,
-            encoding="utf-8",            
-        )
+        if cls._client is None:
+            cls._client = redis.from_url(
+                redis_url, 
+                decode_responses=True,
+                encoding="utf-8",            
+            )
+        if cls._binary_client is None:
+            cls._binary_client = redis.from_url(redis_url, decode_responses=False)
 
     @classmethod
     async def check_connection(cls):
@@ -55,6 +167,9 @@ class RedisService:
             await cls._client.close()
             print("[REDIS] [CONEXÃO FECHADA]")
             cls._client = None
+        if cls._binary_client:
+            await cls._binary_client.close()
+            cls._binary_client = None
             
     @classmethod
     async def get_or_set_cache(
@@ -62,20 +177,760 @@ class RedisService:
         key: str,
         model_class: Type[T],
         fetch_function: Callable[[], Awaitable[T]],
-        ttl: int = 3600
+        ttl: int | Callable[[T], int] = 3600,
+        stale_ttl: Optional[int] = None,
+        tags: Iterable[str] = ()
     ) -> T:
-        redis_client = cls.get_client()
-                
+        """
+        ttl:       tempo em que o valor é considerado fresco (soft TTL), ou
+                   função do valor (ex.: TTL curto para resultados negativos).
+        stale_ttl: por quanto tempo depois disso o valor ainda pode ser servido
+                   enquanto uma única atualização roda em background.
+        tags:      grupos de invalidação da chave (ex.: "ncm", "cnpj:<cnpj>");
+                   ver invalidate_tags.
+
+        fetch_function pode ser chamada depois que a requisição terminar
+        (atualização em background), então deve abrir a própria conexão em
+        vez de usar a da rota.
+        """
+        stale_ttl = Constants.CACHE_STALE_TTL_SECONDS if stale_ttl is None else stale_ttl
+        tags = tuple(tags)
+        
+        entry = _l1_cache.get(key)
+        if entry is not None:
+            cache_metrics.record_l1_hit(key)
+        else:
+            entry = await cls._single_flight_load(key, model_class, fetch_function, ttl, stale_ttl, tags)
+            if entry is None:
+                return None
+        
+        now = time.time()
+        if now >= entry.soft_expires_at:
+            cls._stale_served += 1
+            cache_metrics.record_stale(key)
+            cls._schedule_refresh(key, model_class, fetch_function, ttl, stale_ttl, tags, entry.soft_expires_at)
+        elif should_refresh_early(entry, now):
+            cls._early_refreshes += 1
+            cls._schedule_refresh(key, model_class, fetch_function, ttl, stale_ttl, tags, entry.soft_expires_at)
+        
+        return entry.value
+    
+    @classmethod
+    async def _single_flight_load(
+        cls,
+        key: str,
+        model_class: Type[T],
+        fetch_function: Callable[[], Awaitable[T]],
+        ttl: int | Callable[[T], int],
+        stale_ttl: int,
+        tags: tuple[str, ...]
+    ) -> Optional[CacheEntry]:
+        while (flight := cls._inflight.get(key)) is not None:
+            cls._singleflight_shared += 1
+            try:
+                return await asyncio.shield(flight)
+            except _FlightAborted:
+                continue
+        
+        flight = asyncio.get_running_loop().create_future()
+        # Sem ninguém esperando, a exceção não deve virar aviso de "never retrieved"
+        flight.add_done_callback(lambda f: f.cancelled() or f.exception())
+        cls._inflight[key] = flight
+        try:
+            entry = await cls._load(key, model_class, fetch_function, ttl, stale_ttl, tags)
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        except BaseException:
+            flight.set_exception(_FlightAborted())
+            raise
+        else:
+            flight.set_result(entry)
+            return entry
+        finally:
+            cls._inflight.pop(key, None)
+    
+    @classmethod
+    def _store_l1(cls, key: str, entry: CacheEntry, size: int, ttl: int | Callable[[T], int], stale_ttl: int, tags: tuple[str, ...]):
+        ttl = resolve_ttl(ttl, entry.value)
+        if tags:
+            entry = entry._replace(tags=tags)
+        hard_remaining = entry.soft_expires_at + stale_ttl - time.time() if entry.soft_expires_at != math.inf else ttl
+        l1_seconds = min(l1_ttl(key, ttl + stale_ttl), hard_remaining)
+        if l1_seconds > 0:
+            _l1_cache.set(key, entry, ttl=l1_seconds, size=size)
+    
+    @classmethod
+    def _decode_l2(cls, key: str, cached_data: bytes, model_class: Type[T]) -> Optional[tuple[CacheEntry, int]]:
+        # Valor que não decodifica mais (modelo mudou no deploy, versão do codec
+        # desconhecida, frame zstd corrompido) vira miss: a busca na origem o regrava
+        try:
+            return decode_cache_entry(cached_data, model_class)
+        except Exception as e:
+            cls._l2_errors += 1
+            cache_metrics.record_error(key)
+            print(f"[CACHE DECODE ERROR] {key}: {e}")
+            return None
+    
+    @classmethod
+    async def _read_l2(
+        cls, 
+        redis_client: redis.Redis, 
+        key: str, 
+        model_class: Type[T], 
+        ttl: int | Callable[[T], int], 
+        stale_ttl: int,
+        tags: tuple[str, ...]
+    ) -> Optional[CacheEntry]:
         try:
             cached_data = await redis_client.get(key)
-            if cached_data:
-                return model_class.model_validate_json(cached_data)
         except Exception as e:
+            cls._l2_errors += 1
+            cache_metrics.record_error(key)
             print(f"[CACHE READ ERROR] {e}")
+            return None
+        if not cached_data:
+            cls._l2_misses += 1
+            return None
+        decoded = cls._decode_l2(key, cached_data, model_class)
+        if decoded is None:
+            cls._l2_misses += 1
+            return None
+        cls._l2_hits += 1
+        entry, size = decoded
+        cls._store_l1(key, entry, size, ttl, stale_ttl, tags)
+        return entry
+    
+    @classmethod
+    async def _fetch_and_store(
+        cls,
+        redis_client: redis.Redis,
+        key: str,
+        fetch_function: Callable[[], Awaitable[T]],
+        ttl: int | Callable[[T], int],
+        stale_ttl: int,
+        tags: tuple[str, ...]
+    ) -> Optional[CacheEntry]:
+        generation = cls._tag_generation
+        started = time.perf_counter()
+        try:
+            result = await fetch_function()
+        except Exception:
+            cache_metrics.record_error(key)
+            raise
+        if result is None:
+            return None
+        delta = time.perf_counter() - started
+        ttl = resolve_ttl(ttl, result)
+        
+        if tags and generation != cls._tag_generation:
+            # Houve invalidação durante a busca: o resultado pode ser anterior
+            # à escrita, então é servido mas não vai para o cache
+            return CacheEntry(result, time.time() + ttl, delta, tags)
+        
+        entry = CacheEntry(result, time.time() + ttl, delta)
+        data, size = encode_cache_entry(result, entry.soft_expires_at, delta)
+        cls._encoded_raw_bytes += size
+        cache_metrics.record_fetch(key, delta * 1000, size)
+        cls._encoded_stored_bytes += len(data)
+        # No L1 o custo é o do objeto, não o do valor comprimido
+        cls._store_l1(key, entry, size, ttl, stale_ttl, tags)
+        # Gravação aguardada: o lock só é liberado com o valor já no Redis
+        if tags:
+            await cls._set_tagged_cache(redis_client, key, data, ttl + stale_ttl, tags)
+        else:
+            await set_cache(redis_client, key, data, ttl + stale_ttl)
+        return entry
+    
+    @classmethod
+    async def _load(
+        cls,
+        key: str,
+        model_class: Type[T],
+        fetch_function: Callable[[], Awaitable[T]],
+        ttl: int | Callable[[T], int],
+        stale_ttl: int,
+        tags: tuple[str, ...]
+    ) -> Optional[CacheEntry]:
+        redis_client = cls.get_binary_client()
+        
+        entry = await cls._read_l2(redis_client, key, model_class, ttl, stale_ttl, tags)
+        if entry is not None:
+            # Pode estar stale: get_or_set_cache serve e agenda a atualização
+            cache_metrics.record_l2_hit(key)
+            return entry
+        cache_metrics.record_miss(key)
+        
+        lock_token = None
+        if Constants.CACHE_FILL_LOCK_ENABLED:
+            lock_token = await cls._acquire_fill_lock(redis_client, key)
+            if lock_token is None:
+                # Outro worker está buscando: espera o valor aparecer no Redis
+                entry = await cls._wait_for_fill(redis_client, key, model_class, ttl, stale_ttl, tags)
+                if entry is not None:
+                    return entry
+        
+        try:
+            return await cls._fetch_and_store(redis_client, key, fetch_function, ttl, stale_ttl, tags)
+        finally:
+            if lock_token is not None:
+                await cls._release_fill_lock(redis_client, key, lock_token)
+    
+    @classmethod
+    def _schedule_refresh(
+        cls,
+        key: str,
+        model_class: Type[T],
+        fetch_function: Callable[[], Awaitable[T]],
+        ttl: int | Callable[[T], int],
+        stale_ttl: int,
+        tags: tuple[str, ...],
+        seen_soft_expires_at: float
+    ):
+        if key in cls._refreshing:
+            return
+        task = asyncio.create_task(
+            cls._refresh(key, model_class, fetch_function, ttl, stale_ttl, tags, seen_soft_expires_at)
+        )
+        cls._refreshing[key] = task
+        task.add_done_callback(lambda _: cls._refreshing.pop(key, None))
+    
+    @classmethod
+    async def _refresh(
+        cls,
+        key: str,
+        model_class: Type[T],
+        fetch_function: Callable[[], Awaitable[T]],
+        ttl: int | Callable[[T], int],
+        stale_ttl: int,
+        tags: tuple[str, ...],
+        seen_soft_expires_at: float
+    ):
+        try:
+            redis_client = cls.get_binary_client()
+            
+            # Outro worker pode já ter atualizado: _read_l2 traz a versão nova para o L1
+            entry = await cls._read_l2(redis_client, key, model_class, ttl, stale_ttl, tags)
+            if entry is not None and entry.soft_expires_at > seen_soft_expires_at:
+                return
+            
+            lock_token = ""
+            if Constants.CACHE_FILL_LOCK_ENABLED:
+                lock_token = await cls._acquire_fill_lock(redis_client, key)
+                if lock_token is None:
+                    # Atualização em andamento em outro worker
+                    return
+            try:
+                cls._refreshes += 1
+                await cls._fetch_and_store(redis_client, key, fetch_function, ttl, stale_ttl, tags)
+            finally:
+                await cls._release_fill_lock(redis_client, key, lock_token)
+        except Exception as e:
+            cls._refresh_errors += 1
+            print(f"[CACHE] [ERROR] [REFRESH {key}] {e}")
+    
+    @staticmethod
+    def _fill_lock_key(key: str) -> str:
+        return f"lock:fill:{key}"
+    
+    @classmethod
+    async def _acquire_fill_lock(cls, redis_client: redis.Redis, key: str) -> Optional[str]:
+        token = os.urandom(8).hex()
+        try:
+            acquired = await redis_client.set(
+                cls._fill_lock_key(key),
+                token,
+                nx=True,
+                px=Constants.CACHE_FILL_LOCK_LEASE_MS
+            )
+        except Exception as e:
+            # Sem Redis não há o que coordenar: segue buscando normalmente
+            cls._lock_errors += 1
+            print(f"[REDIS] [ERROR] [FILL LOCK] {e}")
+            return ""
+        if acquired:
+            cls._lock_acquired += 1
+            return token
+        return None
+    
+    @classmethod
+    async def _release_fill_lock(cls, redis_client: redis.Redis, key: str, token: str):
+        if not token:
+            return
+        try:
+            await redis_client.eval(_RELEASE_LOCK_LUA, 1, cls._fill_lock_key(key), token)
+        except Exception as e:
+            cls._lock_errors += 1
+            print(f"[REDIS] [ERROR] [FILL LOCK RELEASE] {e}")
+    
+    @classmethod
+    async def _wait_for_fill(
+        cls, 
+        redis_client: redis.Redis, 
+        key: str, 
+        model_class: Type[T], 
+        ttl: int | Callable[[T], int], 
+        stale_ttl: int,
+        tags: tuple[str, ...]
+    ) -> Optional[CacheEntry]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + Constants.CACHE_FILL_LOCK_WAIT_MS / 1000
+        while loop.time() < deadline:
+            await asyncio.sleep(Constants.CACHE_FILL_LOCK_POLL_MS / 1000)
+            try:
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    pipe.get(key)
+                    pipe.exists(cls._fill_lock_key(key))
+                    cached_data, locked = await pipe.execute()
+            except Exception as e:
+                cls._lock_errors += 1
+                print(f"[REDIS] [ERROR] [FILL LOCK WAIT] {e}")
+                return None
+            if cached_data:
+                decoded = cls._decode_l2(key, cached_data, model_class)
+                if decoded is None:
+                    return None
+                cls._lock_wait_hits += 1
+                entry, size = decoded
+                cls._store_l1(key, entry, size, ttl, stale_ttl, tags)
+                return entry
+            if not locked:
+                # O dono terminou sem gravar (erro/None): busca por conta própria
+                return None
+        cls._lock_timeouts += 1
+        return None
+    
+    # ------------------------------------------------------------------
+    # Lote: get_many_or_set
+    # ------------------------------------------------------------------
+    
+    @classmethod
+    async def get_many_or_set(
+        cls,
+        ids: Iterable[K],
+        key_function: Callable[[K], str],
+        model_class: Type[T],
+        fetch_function: Callable[[list[K]], Awaitable[dict[K, T]]],
+        ttl: int | Callable[[K], int] = 3600,
+        stale_ttl: Optional[int] = None,
+        tags_function: Optional[Callable[[K], Iterable[str]]] = None
+    ) -> dict[K, T]:
+        """
+        Versão em lote do get_or_set_cache: L1, um MGET para o restante, uma
+        única chamada fetch_function(ids_faltando) e um pipeline de SET com o
+        TTL de cada chave (MSET não aceita expiração).
 
-        result = await fetch_function()
+        fetch_function retorna {id: valor}; ids ausentes no resultado não vão
+        para o cache e ficam fora do retorno. Entradas stale são servidas e
+        atualizadas em background num único lote. Sem single-flight/lock de
+        preenchimento: o custo de um lote duplicado entre workers é uma query.
+        """
+        stale_ttl = Constants.CACHE_STALE_TTL_SECONDS if stale_ttl is None else stale_ttl
+        ttl_function = ttl if callable(ttl) else (lambda _: ttl)
+        keys: dict[K, str] = {i: key_function(i) for i in dict.fromkeys(ids)}
+        tags: dict[K, tuple[str, ...]] = {
+            i: tuple(tags_function(i)) if tags_function else () for i in keys
+        }
+        
+        found: dict[K, T] = {}
+        stale: list[K] = []
+        pending: list[K] = []
+        now = time.time()
+        for i, key in keys.items():
+            entry = _l1_cache.get(key)
+            if entry is None:
+                pending.append(i)
+                continue
+            cache_metrics.record_l1_hit(key)
+            found[i] = entry.value
+            if now >= entry.soft_expires_at:
+                stale.append(i)
+        
+        redis_client = cls.get_binary_client()
+        missing = await cls._read_many_l2(redis_client, pending, keys, model_class, ttl_function, stale_ttl, tags, found, stale)
+        
+        if missing:
+            fetched = await cls._fetch_and_store_many(
+                redis_client, missing, keys, fetch_function, ttl_function, stale_ttl, tags
+            )
+            found.update(fetched)
+        
+        if stale:
+            cls._schedule_refresh_many(stale, keys, fetch_function, ttl_function, stale_ttl, tags)
         
-        asyncio.create_task(set_cache_background(redis_client, key, result, ttl))
+        return {i: found[i] for i in keys if i in found}
+    
+    @classmethod
+    async def _read_many_l2(
+        cls,
+        redis_client: redis.Redis,
+        pending: list[K],
+        keys: dict[K, str],
+        model_class: Type[T],
+        ttl_function: Callable[[K], int],
+        stale_ttl: int,
+        tags: dict[K, tuple[str, ...]],
+        found: dict[K, T],
+        stale: list[K]
+    ) -> list[K]:
+        if not pending:
+            return []
+        try:
+            values = await redis_client.mget([keys[i] for i in pending])
+        except Exception as e:
+            cls._l2_errors += 1
+            print(f"[CACHE READ ERROR] {e}")
+            values = [None] * len(pending)
+        
+        missing = []
+        now = time.time()
+        for i, cached_data in zip(pending, values):
+            key = keys[i]
+            decoded = cls._decode_l2(key, cached_data, model_class) if cached_data else None
+            if decoded is None:
+                cls._l2_misses += 1
+                cache_metrics.record_miss(key)
+                missing.append(i)
+                continue
+            cls._l2_hits += 1
+            cache_metrics.record_l2_hit(key)
+            entry, size = decoded
+            cls._store_l1(key, entry, size, ttl_function(i), stale_ttl, tags[i])
+            found[i] = entry.value
+            if now >= entry.soft_expires_at:
+                stale.append(i)
+        return missing
+    
+    @classmethod
+    async def _fetch_and_store_many(
+        cls,
+        redis_client: redis.Redis,
+        ids: list[K],
+        keys: dict[K, str],
+        fetch_function: Callable[[list[K]], Awaitable[dict[K, T]]],
+        ttl_function: Callable[[K], int],
+        stale_ttl: int,
+        tags: dict[K, tuple[str, ...]]
+    ) -> dict[K, T]:
+        generation = cls._tag_generation
+        started = time.perf_counter()
+        try:
+            results = await fetch_function(ids)
+        except Exception:
+            for i in ids:
+                cache_metrics.record_error(keys[i])
+            raise
+        delta = time.perf_counter() - started
+        
+        fetched = {i: results[i] for i in ids if results.get(i) is not None}
+        if not fetched:
+            return fetched
+        if generation != cls._tag_generation and any(tags[i] for i in fetched):
+            # Invalidação durante a busca: serve sem gravar (ver _fetch_and_store)
+            return fetched
+        
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for i, value in fetched.items():
+                    key = keys[i]
+                    ttl = ttl_function(i)
+                    entry = CacheEntry(value, time.time() + ttl, delta)
+                    data, size = encode_cache_entry(value, entry.soft_expires_at, delta)
+                    cls._encoded_raw_bytes += size
+                    cls._encoded_stored_bytes += len(data)
+                    cache_metrics.record_fetch(key, delta * 1000, size)
+                    cls._store_l1(key, entry, size, ttl, stale_ttl, tags[i])
+                    cls._queue_set(pipe, key, data, ttl + stale_ttl, tags[i])
+                await pipe.execute()
+        except Exception as e:
+            print(f"[ERROR] Falha ao salvar cache em lote ({len(fetched)} chaves): {e}")
+        return fetched
+    
+    @classmethod
+    def _schedule_refresh_many(
+        cls,
+        ids: list[K],
+        keys: dict[K, str],
+        fetch_function: Callable[[list[K]], Awaitable[dict[K, T]]],
+        ttl_function: Callable[[K], int],
+        stale_ttl: int,
+        tags: dict[K, tuple[str, ...]]
+    ):
+        ids = [i for i in ids if keys[i] not in cls._refreshing]
+        if not ids:
+            return
+        cls._stale_served += len(ids)
+        for i in ids:
+            cache_metrics.record_stale(keys[i])
+        
+        async def refresh():
+            try:
+                cls._refreshes += 1
+                await cls._fetch_and_store_many(
+                    cls.get_binary_client(), ids, keys, fetch_function, ttl_function, stale_ttl, tags
+                )
+            except Exception as e:
+                cls._refresh_errors += 1
+                print(f"[CACHE] [ERROR] [REFRESH {len(ids)} chaves] {e}")
+        
+        task = asyncio.create_task(refresh())
+        for i in ids:
+            key = keys[i]
+            cls._refreshing[key] = task
+            task.add_done_callback(lambda _, key=key: cls._refreshing.pop(key, None))
+    
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"tag:{tag}"
+    
+    @classmethod
+    async def _set_tagged_cache(
+        cls, 
+        redis_client: redis.Redis, 
+        key: str, 
+        data: bytes, 
+        ttl: int, 
+        tags: tuple[str, ...]
+    ):
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                cls._queue_set(pipe, key, data, ttl, tags)
+                await pipe.execute()
+        except Exception as e:
+            cls._tag_errors += 1
+            print(f"[ERROR] Falha ao salvar cache para {key}: {e}")
+    
+    @classmethod
+    def _queue_set(cls, pipe, key: str, data: bytes, ttl: int, tags: tuple[str, ...]):
+        pipe.set(key, data, ex=ttl)
+        for tag in tags:
+            tag_key = cls._tag_key(tag)
+            pipe.sadd(tag_key, key)
+            # A tag vive tanto quanto a chave mais longa registrada nela
+            pipe.expire(tag_key, ttl, nx=True)
+            pipe.expire(tag_key, ttl, gt=True)
+    
+    @classmethod
+    def invalidate_local_tags(cls, tags: Optional[Iterable[str]]) -> int:
+        """Remove do L1 deste worker as entradas das tags (None = todas)."""
+        cls._tag_generation += 1
+        if tags is None:
+            removed = len(_l1_cache)
+            _l1_cache.clear()
+            return removed
+        tags = set(tags)
+        return _l1_cache.delete_where(lambda _, entry: not tags.isdisjoint(entry.tags))
+    
+    @classmethod
+    async def invalidate_tags(cls, tags: Iterable[str]) -> int:
+        """
+        Invalida as tags neste worker e no Redis. Os demais workers limpam o
+        próprio L1 ao receber o NOTIFY (triggers ou notify_cache_tags).
+        """
+        tags = list(dict.fromkeys(tags))
+        if not tags:
+            return 0
+        cls.invalidate_local_tags(tags)
+        return await cls._delete_tagged_keys(tags)
+    
+    @classmethod
+    async def _delete_tagged_keys(cls, tags: list[str]) -> int:
+        cls._tag_invalidations += 1
+        try:
+            deleted = await cls.get_binary_client().eval(
+                _INVALIDATE_TAGS_LUA, 
+                len(tags), 
+                *(cls._tag_key(tag) for tag in tags)
+            )
+        except Exception as e:
+            cls._tag_errors += 1
+            print(f"[REDIS] [ERROR] [TAG INVALIDATION] {e}")
+            return 0
+        cls._tag_keys_deleted += deleted
+        return deleted
+    
+    @classmethod
+    def _on_tag_notification(cls, key: Optional[str]):
+        # Callback síncrono do listener. Todo worker limpa o próprio L1; as
+        # chaves no Redis são apagadas uma única vez por notificação, pelo
+        # primeiro worker a recebê-la (SET NX no id). Assim N workers não
+        # repetem o DEL, e um worker atrasado não apaga o que outro já
+        # repreencheu depois do COMMIT.
+        # None = reconexão: só o L1 (as tags no Redis não mudaram por causa da queda).
+        if key is None:
+            cls.invalidate_local_tags(None)
+            return
+        tag, notification_id = split_tag_notification(key)
+        cls.invalidate_local_tags([tag])
+        asyncio.get_running_loop().create_task(cls._invalidate_notified_tag(tag, notification_id))
+    
+    @classmethod
+    async def _invalidate_notified_tag(cls, tag: str, notification_id: Optional[str]):
+        if notification_id is not None:
+            try:
+                claimed = await cls.get_binary_client().set(
+                    f"lock:tag:{tag}@{notification_id}",
+                    b"1",
+                    nx=True,
+                    ex=Constants.CACHE_TAG_NOTIFY_GUARD_SECONDS
+                )
+            except Exception as e:
+                cls._tag_errors += 1
+                print(f"[REDIS] [ERROR] [TAG INVALIDATION] {e}")
+                return
+            if not claimed:
+                cls._tag_notifications_skipped += 1
+                return
+        await cls._delete_tagged_keys([tag])
+    
+    @classmethod
+    def get_cache_stats(cls) -> dict:
+        lookups = cls._l2_hits + cls._l2_misses
+        return {
+            "l1": _l1_cache.get_stats(),
+            "l2": {
+                "hits": cls._l2_hits,
+                "misses": cls._l2_misses,
+                "errors": cls._l2_errors,
+                "hit_rate": round(cls._l2_hits / lookups, 4) if lookups else 0
+            },
+            "single_flight": {
+                "inflight": len(cls._inflight),
+                "shared": cls._singleflight_shared
+            },
+            "fill_lock": {
+                "enabled": Constants.CACHE_FILL_LOCK_ENABLED,
+                "acquired": cls._lock_acquired,
+                "wait_hits": cls._lock_wait_hits,
+                "timeouts": cls._lock_timeouts,
+                "errors": cls._lock_errors
+            },
+            "refresh": {
+                "stale_served": cls._stale_served,
+                "early_refreshes": cls._early_refreshes,
+                "refreshes": cls._refreshes,
+                "in_progress": len(cls._refreshing),
+                "errors": cls._refresh_errors,
+                "stale_ttl_default": Constants.CACHE_STALE_TTL_SECONDS,
+                "early_refresh_beta": Constants.CACHE_EARLY_REFRESH_BETA
+            },
+            "by_prefix": cache_metrics.snapshot(),
+            "tags": {
+                "invalidations": cls._tag_invalidations,
+                "keys_deleted": cls._tag_keys_deleted,
+                "notifications_handled_elsewhere": cls._tag_notifications_skipped,
+                "errors": cls._tag_errors
+            },
+            "codec": {
+                "compression_min_bytes": Constants.CACHE_COMPRESSION_MIN_BYTES,
+                "compression_level": Constants.CACHE_COMPRESSION_LEVEL,
+                "raw_bytes": cls._encoded_raw_bytes,
+                "stored_bytes": cls._encoded_stored_bytes,
+                "ratio": round(cls._encoded_stored_bytes / cls._encoded_raw_bytes, 4) if cls._encoded_raw_bytes else 0
+            },
+            "l1_ttls": Constants.CACHE_L1_TTLS,
+            "l1_default_ttl": Constants.CACHE_L1_DEFAULT_TTL_SECONDS
+        }
+    
+    @classmethod
+    def reset_cache_stats(cls):
+        _l1_cache.reset_stats()
+        cls._l2_hits = 0
+        cls._l2_misses = 0
+        cls._l2_errors = 0
+        cls._singleflight_shared = 0
+        cls._lock_acquired = 0
+        cls._lock_wait_hits = 0
+        cls._lock_timeouts = 0
+        cls._lock_errors = 0
+        cls._stale_served = 0
+        cls._early_refreshes = 0
+        cls._refreshes = 0
+        cls._refresh_errors = 0
+        cls._encoded_raw_bytes = 0
+        cls._encoded_stored_bytes = 0
+        cls._tag_invalidations = 0
+        cls._tag_keys_deleted = 0
+        cls._tag_errors = 0
+        cls._tag_notifications_skipped = 0
+        cache_metrics.reset()
+    
+    # ------------------------------------------------------------------
+    # Famílias de refresh token
+    #
+    # auth:family:{family_id}          -> id do token ativo da família, ou REVOKED
+    # auth:user:{user_id}:families     -> famílias emitidas para o usuário (logout)
+    #
+    # O Postgres continua sendo a fonte da verdade (write-through): o Redis só
+    # serve para recusar tokens revogados/reusados sem tocar no banco. Se o
+    # Redis falhar, o fluxo segue apenas pelo banco.
+    # ------------------------------------------------------------------
+    
+    TOKEN_FAMILY_REVOKED = "REVOKED"
+    TOKEN_FAMILY_TTL = Constants.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+    
+    @staticmethod
+    def _token_family_key(family_id) -> str:
+        return f"auth:family:{family_id}"
+    
+    @staticmethod
+    def _user_families_key(user_id) -> str:
+        return f"auth:user:{user_id}:families"
+
+    @classmethod
+    async def get_token_family_state(cls, family_id) -> Optional[str]:
+        try:
+            return await cls.get_client().get(cls._token_family_key(family_id))
+        except Exception as e:
+            print(f"[REDIS] [ERROR] [TOKEN FAMILY READ] {e}")
+            return None
+
+    @classmethod
+    async def set_token_family_active(cls, user_id, family_id, token_id):
+        try:
+            user_key = cls._user_families_key(user_id)
+            async with cls.get_client().pipeline(transaction=False) as pipe:
+                pipe.set(cls._token_family_key(family_id), str(token_id), ex=cls.TOKEN_FAMILY_TTL)
+                pipe.sadd(user_key, str(family_id))
+                pipe.expire(user_key, cls.TOKEN_FAMILY_TTL)
+                await pipe.execute()
+        except Exception as e:
+            print(f"[REDIS] [ERROR] [TOKEN FAMILY WRITE] {e}")
+            # Estado antigo faria o próximo refresh parecer reuso: melhor não ter estado
+            with contextlib.suppress(Exception):
+                await cls.get_client().delete(cls._token_family_key(family_id))
+
+    @classmethod
+    async def rotate_token_family(cls, family_id, token_id):
+        # Refresh: a família já está no conjunto do usuário desde o login, basta um SET
+        try:
+            await cls.get_client().set(cls._token_family_key(family_id), str(token_id), ex=cls.TOKEN_FAMILY_TTL)
+        except Exception as e:
+            print(f"[REDIS] [ERROR] [TOKEN FAMILY WRITE] {e}")
+            with contextlib.suppress(Exception):
+                await cls.get_client().delete(cls._token_family_key(family_id))
+
+    @classmethod
+    async def revoke_token_families(cls, family_ids: Iterable):
+        try:
+            async with cls.get_client().pipeline(transaction=False) as pipe:
+                for family_id in family_ids:
+                    pipe.set(cls._token_family_key(family_id), cls.TOKEN_FAMILY_REVOKED, ex=cls.TOKEN_FAMILY_TTL)
+                await pipe.execute()
+        except Exception as e:
+            print(f"[REDIS] [ERROR] [TOKEN FAMILY REVOKE] {e}")
+
+    @classmethod
+    async def revoke_user_token_families(cls, user_id):
+        try:
+            client = cls.get_client()
+            user_key = cls._user_families_key(user_id)
+            family_ids = await client.smembers(user_key)
+            if family_ids:
+                await cls.revoke_token_families(family_ids)
+            await client.delete(user_key)
+        except Exception as e:
+            print(f"[REDIS] [ERROR] [TOKEN FAMILY REVOKE] {e}")
+
 
-        return result
-    
\ No newline at end of file
+listener.register("tag", RedisService._on_tag_notification)
@@ -1,10 +1,31 @@
-from src.schemas.user import UserCompleteResponse, UserUpdate, UserManagementContext
+from src.schemas.user import (
+    UserCompleteResponse, 
+    UserUpdate, 
+    UserManagementContext, 
+    UserCreate, 
+    UserResponse, 
+    StaffImportError, 
+    StaffImportResult
+)
 from typing import Optional
 from src.services import staff as staff_service
 from fastapi.exceptions import HTTPException
+from fastapi import status
+from pydantic import ValidationError
 from src.schemas.rls import RLSConnection
+from src.schemas.token import DecodedAccessToken
 from src.model import user as user_model
+from src.services import password_hasher
+from src.services import user_profile_cache
+from src.db.db import ERROR_MAP, db_safe_exec, to_database_error
+from src.db import rows as rows_util
+from src.constants import Constants
 from src import security
+from asyncpg import Pool, Connection
+import asyncio
+import uuid
+import csv
+import io
 
 
 SELF_EDITABLE_FIELDS = {
@@ -54,11 +75,11 @@ async def update_user(
 
     # 3. Tratamento de Senhas (Hashing)
     if 'password' in update_data:
-        update_data['password_hash'] = security.hash_password(update_data.pop('password'))
+        update_data['password_hash'] = await password_hasher.hash_password(update_data.pop('password'))
     
     if 'quick_access_pin' in update_data:
         # Supondo que você tenha um hash específico para PIN ou use o mesmo
-        update_data['quick_access_pin_hash'] = security.hash_password(update_data.pop('quick_access_pin'))
+        update_data['quick_access_pin_hash'] = await password_hasher.hash_password(update_data.pop('quick_access_pin'))
 
     # Se não sobrou nada para atualizar
     if not update_data:
@@ -76,4 +97,186 @@ async def update_user(
         set_clauses.append(f"{key} = ${i}")
         values.append(value)
     
-    return await staff_service.update_user(values, set_clauses, rls.conn)
\ No newline at end of file
+    user = await staff_service.update_user(values, set_clauses, rls.conn)
+    await user_profile_cache.invalidate_user_profiles([payload.id])
+    return user
+
+
+def parse_staff_csv(content: bytes) -> list[dict]:
+    """
+    CSV com cabeçalho (vírgula ou ponto e vírgula). Colunas: name, nickname,
+    email, notes, roles (separadas por |), state_tax_indicator, password,
+    quick_access_pin, phone, cpf. Células vazias viram null.
+    """
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="O arquivo CSV deve estar em UTF-8.")
+    
+    try:
+        dialect = csv.Sniffer().sniff(text.split("\n", 1)[0], delimiters=",;")
+    except csv.Error:
+        dialect = csv.excel
+    
+    items = []
+    for raw in csv.DictReader(io.StringIO(text), dialect=dialect):
+        item = {
+            key.strip(): value.strip() if value and value.strip() else None
+            for key, value in raw.items() 
+            if key
+        }
+        if item.get("roles"):
+            item["roles"] = [role.strip().upper() for role in item["roles"].split("|") if role.strip()]
+        if "quick_access_pin" in item:
+            item["quick_access_pin_hash"] = item.pop("quick_access_pin")
+        items.append(item)
+    return items
+
+
+async def _hash_credentials(
+    user: UserCreate, 
+    semaphore: asyncio.Semaphore
+) -> tuple[Optional[str], Optional[str]]:
+    async with semaphore:
+        password_hash = await password_hasher.hash_password(user.password) if user.password else None
+        quick_access_pin_hash = await password_hasher.hash_password(user.quick_access_pin_hash) if user.quick_access_pin_hash else None
+    return password_hash, quick_access_pin_hash
+
+
+async def bulk_import_users(
+    items: list[dict], 
+    data: DecodedAccessToken, 
+    pool: Pool
+) -> StaffImportResult:
+    """
+    Cria vários funcionários de uma vez. Linhas inválidas não impedem as
+    demais: cada uma volta em `errors` com a mensagem do ERROR_MAP.
+
+    A requisição só segura conexão para o que precisa do banco: a checagem
+    de privilégios (uma vez para o lote) e a inserção. Os hashes argon2
+    rodam entre as duas, sem transação aberta.
+    """
+    if len(items) > Constants.STAFF_IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Máximo de {Constants.STAFF_IMPORT_MAX_ROWS} usuários por importação."
+        )
+    
+    errors: dict[int, str | list] = {}
+    users: dict[int, UserCreate] = {}
+    
+    # 1. Validação (sem banco). Nunca devolve o input: pode conter senhas.
+    for row_no, item in enumerate(items, start=1):
+        try:
+            users[row_no] = UserCreate.model_validate(item)
+        except ValidationError as e:
+            errors[row_no] = e.errors(include_url=False, include_context=False, include_input=False)
+    
+    # 2. Privilégios: uma consulta para o ator e uma para os pesos das funções
+    async with security.open_rls_read_connection(pool, data) as rls:
+        ctx: Optional[UserManagementContext] = await db_safe_exec(
+            user_model.get_user_management_context(
+                actor_id=data.user_id,
+                proposed_roles=[],
+                conn=rls.conn
+            )
+        )
+        role_levels = await db_safe_exec(user_model.get_role_levels(rls.conn))
+    
+    if not ctx:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado.")
+    
+    if not ctx.actor_has_management_role:
+        raise HTTPException(
+            status_code=403, 
+            detail=f"Apenas {', '.join(Constants.MANAGEMENT_ROLES)} podem criar novos usuários."
+        )
+    
+    for row_no, user in list(users.items()):
+        level = max(role_levels.get(role.value, 0) for role in user.roles)
+        if ctx.actor_privilege_level < level:
+            errors[row_no] = f"Você (Nível {ctx.actor_privilege_level}) não pode criar um usuário com nível superior ({level})."
+            del users[row_no]
+    
+    # 3. Hashes em paralelo no pool argon2. O lote nunca ocupa mais que os
+    # workers do pool, então logins concorrentes continuam sendo atendidos.
+    semaphore = asyncio.Semaphore(password_hasher.password_hasher.max_workers)
+    hashes = await asyncio.gather(
+        *(_hash_credentials(user, semaphore) for user in users.values()),
+        return_exceptions=True
+    )
+    
+    records = []
+    for (row_no, user), result in zip(users.items(), hashes):
+        if isinstance(result, HTTPException):
+            errors[row_no] = result.detail
+            continue
+        if isinstance(result, BaseException):
+            raise result
+        password_hash, quick_access_pin_hash = result
+        records.append((
+            row_no,
+            uuid.uuid4(),
+            user.name,
+            user.nickname,
+            user.email,
+            user.notes,
+            user.state_tax_indicator,
+            password_hash,
+            quick_access_pin_hash,
+            user.phone,
+            user.cpf,
+            [role.value for role in user.roles]
+        ))
+    
+    # 4. COPY para a tabela temporária + um INSERT ... SELECT, na mesma transação
+    created = []
+    if records:
+        async with security.open_rls_write_connection(pool, data) as rls:
+            created = await _insert_staged(records, data, errors, rls.conn)
+    
+    return StaffImportResult(
+        total=len(items),
+        created=rows_util.from_rows(UserResponse, created),
+        errors=[StaffImportError(row=row_no, detail=errors[row_no]) for row_no in sorted(errors)]
+    )
+
+
+async def _insert_staged(
+    records: list[tuple], 
+    data: DecodedAccessToken, 
+    errors: dict, 
+    conn: Connection
+) -> list:
+    await db_safe_exec(user_model.stage_staff_import(records, conn))
+    
+    # Duplicidades conhecidas saem antes do INSERT em lote
+    for row in await db_safe_exec(user_model.get_staff_import_conflicts(data.tenant_id, conn)):
+        errors.setdefault(row["row_no"], ERROR_MAP[row["constraint_name"]])
+    
+    staged = [record[0] for record in records if record[0] not in errors]
+    if not staged:
+        return []
+    
+    # A transação é manual (RLS), então savepoints também: se o lote violar
+    # alguma constraint, volta ao savepoint e insere linha a linha para
+    # descobrir quais falharam.
+    await conn.execute("SAVEPOINT staff_import")
+    try:
+        rows = await user_model.insert_staged_users(data.tenant_id, data.user_id, list(errors), conn)
+        await conn.execute("RELEASE SAVEPOINT staff_import")
+        return rows
+    except Exception as e:
+        print(f"[STAFF IMPORT] [WARN] [LOTE FALHOU, INSERINDO LINHA A LINHA] {e}")
+        await conn.execute("ROLLBACK TO SAVEPOINT staff_import")
+    
+    rows = []
+    for row_no in staged:
+        await conn.execute("SAVEPOINT staff_import_row")
+        try:
+            rows.append(await user_model.insert_staged_user(data.tenant_id, data.user_id, row_no, conn))
+            await conn.execute("RELEASE SAVEPOINT staff_import_row")
+        except Exception as e:
+            await conn.execute("ROLLBACK TO SAVEPOINT staff_import_row")
+            errors[row_no] = to_database_error(e).detail
+    return rows
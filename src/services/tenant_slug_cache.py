@@ -0,0 +1,35 @@
+from src.services.redis_client import RedisService
+from src.schemas.tenant import TenantPublicInfo, TenantSlugLookup
+from src.constants import Constants
+from typing import Awaitable, Callable, Optional
+
+
+# slug -> TenantSlugLookup no get_or_set_cache, com a tag "tenant_slug:<slug>".
+# Slugs inexistentes também vão para o cache (tenant None), com TTL curto: os
+# slugs são códigos numéricos curtos e tentativas aleatórias não podem chegar
+# ao banco. Invalidação pelo trigger em tenants -> NOTIFY 'tag:tenant_slug:<slug>'
+# (INSERT incluso, por causa do cache negativo).
+
+
+def _ttl(lookup: TenantSlugLookup) -> int:
+    if lookup.tenant is None:
+        return Constants.TENANT_SLUG_NEGATIVE_TTL_SECONDS
+    return Constants.TENANT_SLUG_REDIS_TTL_SECONDS
+
+
+async def get_tenant_by_slug(
+    slug: str,
+    fetch_function: Callable[[], Awaitable[Optional[TenantPublicInfo]]]
+) -> Optional[TenantPublicInfo]:
+    async def fetch_lookup() -> TenantSlugLookup:
+        return TenantSlugLookup(tenant=await fetch_function())
+
+    lookup = await RedisService.get_or_set_cache(
+        f"tenant:slug:{slug}",
+        TenantSlugLookup,
+        fetch_lookup,
+        ttl=_ttl,
+        stale_ttl=0,
+        tags=[f"tenant_slug:{slug}"]
+    )
+    return lookup.tenant
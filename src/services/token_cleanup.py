@@ -0,0 +1,53 @@
+from src.schemas.token import RefreshTokenPurgeResult
+from src.model import refresh_token as refresh_token_model
+from src.constants import Constants
+from src.db.db import db
+from datetime import timedelta
+import asyncpg
+import asyncio
+import time
+
+
+async def purge_refresh_tokens(
+    pool: asyncpg.Pool,
+    batch_size: int = Constants.REFRESH_TOKEN_PURGE_BATCH_SIZE,
+    revoked_grace: timedelta = timedelta(hours=Constants.REFRESH_TOKEN_REVOKED_GRACE_HOURS),
+    pause_ms: int = Constants.REFRESH_TOKEN_PURGE_PAUSE_MS,
+    max_batches: int = 1000
+) -> RefreshTokenPurgeResult:
+    """
+    Apaga tokens expirados/revogados em lotes curtos. Cada lote é uma
+    transação própria (autocommit) e a conexão volta ao pool entre lotes,
+    então a limpeza nunca segura locks nem slots do pool por muito tempo.
+    """
+    start = time.perf_counter()
+    deleted = 0
+    batches = 0
+    
+    while batches < max_batches:
+        async with pool.acquire() as conn:
+            batch_deleted = await refresh_token_model.purge_refresh_tokens_batch(batch_size, revoked_grace, conn)
+        deleted += batch_deleted
+        batches += 1
+        if batch_deleted == 0:
+            break
+        await asyncio.sleep(pause_ms / 1000)
+    
+    return RefreshTokenPurgeResult(
+        deleted=deleted,
+        batches=batches,
+        elapsed_ms=round((time.perf_counter() - start) * 1000, 2)
+    )
+
+
+async def periodic_token_cleanup():
+    interval = Constants.REFRESH_TOKEN_PURGE_INTERVAL_MINUTES * 60
+    while True:
+        await asyncio.sleep(interval)
+        if db.admin_pool is None:
+            continue
+        try:
+            result = await purge_refresh_tokens(db.admin_pool)
+            print("[DB] [INFO]", f"[REFRESH TOKENS REMOVIDOS: {result.deleted} em {result.batches} lotes, {result.elapsed_ms}ms]")
+        except Exception as e:
+            print("[DB] [ERROR]", f"[FALHA NA LIMPEZA DE REFRESH TOKENS: {e}]")
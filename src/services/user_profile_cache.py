@@ -0,0 +1,42 @@
+from src.services.redis_client import RedisService
+from src.schemas.token import DecodedAccessToken
+from src.schemas.user import UserResponse
+from src.model import user as user_model
+from src.constants import Constants
+from src.db.db import get_db_pool
+from src import security
+from typing import Iterable, Optional
+from uuid import UUID
+
+
+# Perfil servido pelo /auth/me, no get_or_set_cache com a tag "user:<id>".
+# Invalidação:
+#   - escritas da API (signup, staff.update_user) limpam local + Redis na hora;
+#   - o trigger users -> NOTIFY 'tag:user:<id>' limpa em todos os workers
+#     após o COMMIT, inclusive mudanças feitas direto no banco (role_configs
+#     recalcula max_privilege_level dos usuários).
+# Sem stale: permissões desatualizadas não são servidas depois do TTL.
+
+
+def _tag(user_id: UUID | str) -> str:
+    return f"user:{user_id}"
+
+
+async def get_user_profile(data: DecodedAccessToken) -> Optional[UserResponse]:
+    async def fetch_profile() -> Optional[UserResponse]:
+        # Só em cache miss a requisição ocupa uma conexão do pool
+        async with security.open_rls_read_connection(await get_db_pool(), data) as rls:
+            return await user_model.get_user_by_id(data.user_id, rls.conn)
+
+    return await RedisService.get_or_set_cache(
+        f"user:profile:{data.user_id}",
+        UserResponse,
+        fetch_profile,
+        ttl=Constants.USER_PROFILE_REDIS_TTL_SECONDS,
+        stale_ttl=0,
+        tags=[_tag(data.user_id)]
+    )
+
+
+async def invalidate_user_profiles(user_ids: Iterable[UUID | str]):
+    await RedisService.invalidate_tags(_tag(i) for i in user_ids if i is not None)